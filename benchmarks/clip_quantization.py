@@ -0,0 +1,186 @@
+"""CPU encode throughput and embedding agreement of fp32 and int8 CLIP inference.
+
+Both precisions are loaded on the CPU with load_clip_model. For each
+intra-op thread count, image encoding throughput (batched, as during
+ingest) and single text query latency are measured. Agreement with fp32 is
+measured on the same inputs: the cosine similarity between the fp32 and
+int8 embedding of every image and text, and the overlap of the top-k images
+retrieved for every text query (both when the images are re-embedded in
+int8 and when int8 queries search an index embedded in fp32, as happens
+after switching CLIP_PRECISION without re-embedding the gallery):
+
+    python benchmarks/clip_quantization.py --images conversational_photo_gallery/images --threads 1 2 4
+    python benchmarks/clip_quantization.py --text-queries queries.txt --k 10 --min-overlap 0.9
+
+Without --images, synthetic images are used; agreement on real photos is
+more representative. Text queries default to the tag vocabulary phrased
+with TAG_PROMPT_TEMPLATE.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Add the repository root to the Python path (same approach as main.py)
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import numpy as np
+import torch
+from PIL import Image
+
+from benchmarks.stubs import synthetic_image
+
+from conversational_photo_gallery.config import INGEST_EMBED_BATCH_SIZE, INGEST_EMBED_IMAGE_SIZE, TAG_PROMPT_TEMPLATE
+from conversational_photo_gallery.constants import TAG_VOCABULARY
+from conversational_photo_gallery.services.embedding_generator import CLIP_PRECISIONS, load_clip_model
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# File extensions read from --images
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_images(directory: Path, count: int) -> List[Image.Image]:
+    """Decode up to `count` images from a directory (synthetic ones if none is given), downscaled as for ingest."""
+    if directory:
+        paths = sorted(path for path in directory.iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS)[:count]
+        images = [Image.open(path).convert("RGB") for path in paths]
+    else:
+        images = [synthetic_image(seed) for seed in range(count)]
+    for image in images:
+        image.thumbnail((INGEST_EMBED_IMAGE_SIZE, INGEST_EMBED_IMAGE_SIZE))
+    return images
+
+
+def encode(model, inputs: List, batch_size: int) -> np.ndarray:
+    """Encode images or texts into unit-length embeddings."""
+    return model.encode(inputs, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def measure_throughput(model, images: List[Image.Image], query: str, batch_size: int, repeat: int) -> Dict[str, float]:
+    """Return images encoded per second and single text query latency percentiles in ms."""
+    encode(model, images[:batch_size], batch_size)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(model, images, batch_size)
+    images_per_s = repeat * len(images) / (time.perf_counter() - start)
+
+    model.encode(query)
+    latencies = []
+    for _ in range(max(20, repeat * 10)):
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "images_per_s": images_per_s,
+        "text_p50_ms": latencies[len(latencies) // 2],
+        "text_p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def top_k(queries: np.ndarray, index: np.ndarray, k: int) -> List[set]:
+    """Exact top-k cosine neighbours (row positions) of each query."""
+    k = min(k, len(index))
+    similarities = queries @ index.T
+    return [set(row) for row in np.argpartition(-similarities, k - 1, axis=1)[:, :k]]
+
+
+def agreement(
+    reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray], k: int
+) -> Dict[str, float]:
+    """Compare candidate embeddings with the fp32 reference.
+
+    Args:
+        reference: fp32 'images' and 'texts' embeddings.
+        candidate: The same inputs embedded at another precision.
+        k: Images retrieved per text query.
+
+    Returns:
+        Dict[str, float]: Mean and 1st-percentile cosine per input kind, and the mean top-k
+        overlap of every query with the fp32 results, with the images re-embedded
+        ('topk_overlap') or kept in fp32 ('topk_overlap_fp32_index').
+    """
+    results = {}
+    for kind in ("images", "texts"):
+        cosines = (reference[kind] * candidate[kind]).sum(axis=1)
+        results[f"{kind}_cosine_mean"] = float(cosines.mean())
+        results[f"{kind}_cosine_p1"] = float(np.percentile(cosines, 1))
+    truth = top_k(reference["texts"], reference["images"], k)
+    for name, index in (("topk_overlap", candidate["images"]), ("topk_overlap_fp32_index", reference["images"])):
+        found = top_k(candidate["texts"], index, k)
+        results[name] = float(np.mean([len(a & b) / len(a) for a, b in zip(truth, found)]))
+    return results
+
+
+def recommend(results: List[Dict], min_cosine: float, min_overlap: float) -> Dict:
+    """Pick the highest image throughput setting whose embeddings agree closely enough with fp32."""
+    passing = [
+        row for row in results
+        if row["precision"] == "fp32"
+        or (row["images_cosine_p1"] >= min_cosine and row["topk_overlap_fp32_index"] >= min_overlap)
+    ]
+    return max(passing, key=lambda row: row["images_per_s"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fp32 and int8 CLIP inference on the CPU.")
+    parser.add_argument("--images", type=Path, default=None, help="directory of photos (default: synthetic)")
+    parser.add_argument("--count", type=int, default=128, help="images to encode")
+    parser.add_argument("--text-queries", type=Path, default=None, help="file of text queries, one per line")
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, torch.get_num_threads()}),
+                        help="intra-op thread counts to measure")
+    parser.add_argument("--batch-size", type=int, default=INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the images")
+    parser.add_argument("--k", type=int, default=10, help="images retrieved per text query (top-k overlap)")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="required 1st-percentile image cosine")
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="required top-k overlap")
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    if args.text_queries:
+        texts = [line.strip() for line in args.text_queries.read_text().splitlines() if line.strip()]
+    else:
+        texts = [TAG_PROMPT_TEMPLATE.format(tag) for tag in TAG_VOCABULARY]
+    print(f"{len(images)} images, {len(texts)} text queries")
+
+    models = {precision: load_clip_model(precision, device="cpu") for precision in CLIP_PRECISIONS}
+    embeddings = {
+        precision: {"images": encode(model, images, args.batch_size), "texts": encode(model, texts, 256)}
+        for precision, model in models.items()
+    }
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for precision, model in models.items():
+            row = {"precision": precision, "threads": threads}
+            row.update(measure_throughput(model, images, texts[0], args.batch_size, args.repeat))
+            row.update(agreement(embeddings["fp32"], embeddings[precision], args.k))
+            results.append(row)
+            print(
+                f"{precision:5} threads={threads:<3} {row['images_per_s']:7.1f} images/s "
+                f"text p50={row['text_p50_ms']:.1f}ms p95={row['text_p95_ms']:.1f}ms "
+                f"image cosine mean={row['images_cosine_mean']:.4f} p1={row['images_cosine_p1']:.4f} "
+                f"text cosine mean={row['texts_cosine_mean']:.4f} top-{args.k} overlap={row['topk_overlap']:.3f} "
+                f"(fp32 index {row['topk_overlap_fp32_index']:.3f})"
+            )
+    best = recommend(results, args.min_cosine, args.min_overlap)
+    print(f"\nRecommended:\nCLIP_PRECISION = {best['precision']!r}\nCLIP_INTRA_OP_THREADS = {best['threads']}")
+
+    output = args.output or RESULTS_DIR / f"clip_quantization_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(
+        {"images": len(images), "texts": len(texts), "k": args.k, "batch_size": args.batch_size,
+         "results": results, "recommended": best},
+        indent=2,
+    ))
+    print(f"Report written to {output}")
@@ -0,0 +1,241 @@
+"""Local stand-in for the Gemini REST API, used to load-test the app without spending quota.
+
+It answers `POST /v1beta/models/<model>:generateContent` with the canned
+answers of the offline fake model, after a latency drawn from a configurable
+distribution, and can inject rate-limit and server errors. Point the app at
+it with GEMINI_API_ENDPOINT:
+
+    python benchmarks/gemini_stub.py --port 8765 --latency lognormal --mean 0.8 --sigma 0.5
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 uvicorn main:app --workers 4
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+# Add the repository root to the Python path (same approach as main.py)
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from conversational_photo_gallery.services.fake_llm import FakeGenerativeModel
+
+
+class LatencyModel:
+    """Draws simulated Gemini latencies (in seconds) from a distribution with an optional slow tail."""
+
+    DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+    def __init__(
+        self,
+        distribution: str = "lognormal",
+        mean: float = 0.5,
+        sigma: float = 0.5,
+        slow_rate: float = 0.0,
+        slow_latency: float = 5.0,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the latency model.
+
+        Args:
+            distribution: One of 'constant', 'uniform' (0 to 2 * mean), 'exponential' or
+                'lognormal' (with the given mean and shape sigma).
+            mean: Mean latency in seconds.
+            sigma: Shape of the lognormal distribution (ignored by the others).
+            slow_rate: Probability that a call takes slow_latency instead.
+            slow_latency: Latency of the slow tail, in seconds.
+            seed: Seed of the random draws.
+
+        Raises:
+            ValueError: If the distribution is unknown.
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}, expected one of {self.DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.mean = mean
+        self.sigma = sigma
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Return the latency of one call."""
+        with self._lock:
+            if self._random.random() < self.slow_rate:
+                return self.slow_latency
+            if self.mean <= 0 or self.distribution == "constant":
+                return max(self.mean, 0.0)
+            if self.distribution == "uniform":
+                return self._random.uniform(0, 2 * self.mean)
+            if self.distribution == "exponential":
+                return self._random.expovariate(1 / self.mean)
+            # choose mu so the lognormal mean equals self.mean
+            return self._random.lognormvariate(math.log(self.mean) - self.sigma ** 2 / 2, self.sigma)
+
+
+def request_contents(body: Dict[str, Any]) -> List[Union[str, Dict[str, Any]]]:
+    """Flatten a generateContent request into the contents list the fake model answers.
+
+    Text parts become strings and inline images become {'mime_type', 'data'} dicts,
+    as in the Python SDK's own calls.
+    """
+    contents: List[Union[str, Dict[str, Any]]] = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                contents.append(part["text"])
+            inline = part.get("inlineData") or part.get("inline_data")
+            if inline:
+                contents.append(
+                    {
+                        "mime_type": inline.get("mimeType") or inline.get("mime_type"),
+                        "data": base64.b64decode(inline.get("data", "")),
+                    }
+                )
+    return contents
+
+
+def generate_content_response(text: str, prompt_chars: int) -> Dict[str, Any]:
+    """Wrap an answer in the JSON shape of a Gemini generateContent response."""
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": prompt_chars // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (prompt_chars + len(text)) // 4,
+        },
+    }
+
+
+class GeminiStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the stub's latency model and fault injection settings."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: LatencyModel,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            address: (host, port) to listen on.
+            latency: Latency model applied to every generateContent call.
+            error_rate: Probability of answering 503 UNAVAILABLE.
+            rate_limit_rate: Probability of answering 429 RESOURCE_EXHAUSTED.
+            seed: Seed of the fault injection.
+        """
+        super().__init__(address, GeminiStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw_fault(self) -> int:
+        """Return the HTTP status the next call fails with, or 0 if it succeeds."""
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503
+        return 0
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    """Serves generateContent calls for any model name."""
+
+    server: GeminiStubServer
+
+    # Status names used by Google APIs in error bodies
+    STATUS_NAMES = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED", 503: "UNAVAILABLE"}
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(
+            status, {"error": {"code": status, "message": message, "status": self.STATUS_NAMES.get(status, "UNKNOWN")}}
+        )
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if not path.endswith(":generateContent"):
+            self._send_error(404, f"Method not found: {path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_error(400, f"Invalid JSON payload: {e}")
+            return
+
+        time.sleep(self.server.latency.sample())
+        fault = self.server.draw_fault()
+        if fault:
+            self._send_error(fault, "Simulated Gemini failure")
+            return
+
+        contents = request_contents(body)
+        prompt_chars = sum(len(part) for part in contents if isinstance(part, str))
+        self._send_json(200, generate_content_response(FakeGenerativeModel.answer(contents), prompt_chars))
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # One log line per call would dominate a load test's CPU time
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local Gemini generateContent stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=LatencyModel.DISTRIBUTIONS, default="lognormal",
+                        help="latency distribution of every call")
+    parser.add_argument("--mean", type=float, default=0.5, help="mean latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="shape of the lognormal distribution")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="probability of a slow-tail call")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="latency of slow-tail calls in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 503 response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="probability of a 429 response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = GeminiStubServer(
+        (args.host, args.port),
+        LatencyModel(args.latency, args.mean, args.sigma, args.slow_rate, args.slow_latency, args.seed),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    print(f"Gemini stub listening on http://{args.host}:{args.port} ({args.latency}, mean {args.mean}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,272 @@
+"""Async end-to-end load generator for a running gallery server.
+
+Replays a mix of text, image and multimodal chat turns plus uploads against
+`/chat/` and `/upload/`, and reports throughput, p50/p95/p99 latency and
+error rates per route. Run the server against the Gemini stub so no quota is
+spent:
+
+    python benchmarks/gemini_stub.py --mean 0.8 &
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 uvicorn main:app --workers 4   # from conversational_photo_gallery/
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 32 --duration 60
+
+Each virtual user keeps its own session cookie, like a browser tab. Without
+--rate the users send their next request as soon as the previous one
+returns (closed loop); with --rate requests arrive as a Poisson process at
+that many per second, with at most --users in flight (open loop).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Add the repository root to the Python path (same approach as main.py)
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from benchmarks.stubs import jpeg_bytes
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Chat queries replayed by the text and multimodal scenarios
+CHAT_QUERIES = [
+    "show me some cake photos",
+    "cake pics",
+    "photos of a birthday party",
+    "blue photos from last summer",
+    "#beach",
+    "pictures of my dog in the park",
+    "what did I photograph in 2021?",
+    "thanks, that's great!",
+]
+
+
+@dataclass
+class RouteStats:
+    """Latencies and outcomes of the requests sent to one route."""
+
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, latency: float, status: str, ok: bool) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        """Return throughput, latency percentiles (ms) and error rate."""
+        samples = sorted(self.latencies)
+        count = len(samples)
+
+        def percentile(p: float) -> float:
+            return samples[min(count - 1, int(count * p))] * 1000 if samples else 0.0
+
+        return {
+            "requests": count,
+            "throughput_rps": count / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": samples[-1] * 1000 if samples else 0.0,
+            "error_rate": self.errors / count if count else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class LoadTest:
+    """Sends a weighted mix of chat and upload requests and collects per-route statistics."""
+
+    def __init__(
+        self,
+        url: str,
+        mix: Dict[str, float],
+        users: int,
+        duration: float,
+        rate: Optional[float] = None,
+        upload_batch: int = 4,
+        image_pool: int = 16,
+        timeout: float = 120.0,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the load test.
+
+        Args:
+            url: Base URL of the running server.
+            mix: Relative weights of the 'chat_text', 'chat_image', 'chat_multimodal' and 'upload' scenarios.
+            users: Virtual users (closed loop) or maximum requests in flight (open loop).
+            duration: Seconds to generate load for.
+            rate: Arrivals per second for an open-loop test (optional).
+            upload_batch: Images per upload request.
+            image_pool: Distinct synthetic images to draw request payloads from.
+            timeout: Seconds before a request counts as failed.
+            seed: Seed of the scenario and payload choices.
+        """
+        self.url = url.rstrip("/")
+        self.scenarios = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.scenarios]
+        if not self.scenarios:
+            raise ValueError("The traffic mix has no scenario with a positive weight")
+        self.users = users
+        self.duration = duration
+        self.rate = rate
+        self.upload_batch = upload_batch
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        # Pre-encode payloads so the generator's own CPU time does not skew latencies
+        self.images = [jpeg_bytes(seed, size=(800, 600)) for seed in range(image_pool)]
+        self.stats: Dict[str, RouteStats] = {}
+        self.upload_counter = 0
+
+    def _image(self) -> bytes:
+        return self.random.choice(self.images)
+
+    def _request(self, scenario: str) -> Tuple[str, Dict]:
+        """Build the endpoint and httpx keyword arguments of one request."""
+        if scenario == "chat_text":
+            return "/chat/", {"data": {"query": self.random.choice(CHAT_QUERIES)}}
+        if scenario == "chat_image":
+            return "/chat/", {"files": {"image": ("query.jpg", self._image(), "image/jpeg")}}
+        if scenario == "chat_multimodal":
+            return "/chat/", {
+                "data": {"query": self.random.choice(CHAT_QUERIES)},
+                "files": {"image": ("query.jpg", self._image(), "image/jpeg")},
+            }
+        if scenario == "upload":
+            files = []
+            for _ in range(self.upload_batch):
+                self.upload_counter += 1
+                files.append(("files", (f"load_{self.upload_counter:06d}.jpg", self._image(), "image/jpeg")))
+            return "/upload/", {"files": files}
+        raise ValueError(f"Unknown scenario {scenario!r}")
+
+    async def _send(self, client: httpx.AsyncClient, scenario: str) -> None:
+        """Send one request and record its latency and outcome under the scenario's route label."""
+        path, kwargs = self._request(scenario)
+        start = time.perf_counter()
+        try:
+            response = await client.post(self.url + path, **kwargs)
+            status, ok = str(response.status_code), response.status_code < 400
+        except httpx.TimeoutException:
+            status, ok = "timeout", False
+        except httpx.HTTPError as e:
+            status, ok = type(e).__name__, False
+        route = f"POST {path} ({scenario})"
+        self.stats.setdefault(route, RouteStats()).record(time.perf_counter() - start, status, ok)
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=self.timeout)
+
+    async def _closed_loop_user(self, deadline: float) -> None:
+        # One client per user keeps one session cookie, like a browser tab
+        async with self._client() as client:
+            while time.perf_counter() < deadline:
+                await self._send(client, self.random.choices(self.scenarios, self.weights)[0])
+
+    async def _open_loop(self, deadline: float) -> None:
+        clients = [self._client() for _ in range(self.users)]
+        idle = asyncio.Queue()
+        for client in clients:
+            idle.put_nowait(client)
+        tasks = set()
+
+        async def send(scenario: str) -> None:
+            client = await idle.get()
+            try:
+                await self._send(client, scenario)
+            finally:
+                idle.put_nowait(client)
+
+        try:
+            while time.perf_counter() < deadline:
+                task = asyncio.create_task(send(self.random.choices(self.scenarios, self.weights)[0]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await asyncio.sleep(self.random.expovariate(self.rate))
+            await asyncio.gather(*tasks)
+        finally:
+            for client in clients:
+                await client.aclose()
+
+    async def run(self) -> Dict:
+        """Generate load for the configured duration and return the report."""
+        self.stats = {}
+        start = time.perf_counter()
+        deadline = start + self.duration
+        if self.rate:
+            await self._open_loop(deadline)
+        else:
+            await asyncio.gather(*(self._closed_loop_user(deadline) for _ in range(self.users)))
+        elapsed = time.perf_counter() - start
+
+        routes = {route: stats.summary(elapsed) for route, stats in sorted(self.stats.items())}
+        total = RouteStats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+        return {
+            "url": self.url,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "users": self.users,
+            "rate": self.rate,
+            "duration_s": elapsed,
+            "mix": dict(zip(self.scenarios, self.weights)),
+            "routes": routes,
+            "total": total.summary(elapsed),
+        }
+
+
+def print_report(report: Dict) -> None:
+    """Print one line per route."""
+    print(f"{'route':<40} {'req':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route, row in list(report["routes"].items()) + [("total", report["total"])]:
+        print(
+            f"{route:<40} {row['requests']:>6} {row['throughput_rps']:>7.2f} {row['p50_ms']:>8.1f} "
+            f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>7.1%}"
+        )
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'chat_text=6,chat_image=1,chat_multimodal=1,upload=2' into weights."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running gallery server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the server")
+    parser.add_argument("--users", type=int, default=16, help="virtual users, or max in-flight requests with --rate")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to generate load for")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrival rate in requests per second")
+    parser.add_argument("--mix", type=parse_mix, default="chat_text=6,chat_image=1,chat_multimodal=1,upload=2",
+                        help="relative weights of the scenarios")
+    parser.add_argument("--upload-batch", type=int, default=4, help="images per upload request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    load_test = LoadTest(
+        args.url, args.mix, args.users, args.duration, args.rate, args.upload_batch,
+        timeout=args.timeout, seed=args.seed,
+    )
+    report = asyncio.run(load_test.run())
+    print_report(report)
+
+    output = args.output or RESULTS_DIR / f"load_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
@@ -0,0 +1,277 @@
+"""Offline micro-benchmarks for the photo gallery components.
+
+Gemini is replaced by the offline fake model (LLM_BACKEND=fake) and all data is synthetic, so the suite
+needs no network access (the CLIP model must already be in the local
+Hugging Face cache). Results are written as JSON and can be compared with a
+previous run:
+
+    python benchmarks/run_benchmarks.py --output benchmarks/results/new.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add the repository root to the Python path (same approach as main.py)
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+import chromadb
+import numpy as np
+from fastapi import UploadFile
+
+from benchmarks.stubs import jpeg_bytes, write_synthetic_images
+
+from conversational_photo_gallery.services.chat_handler import ChatHandler
+from conversational_photo_gallery.services.database_manager import DatabaseManager
+from conversational_photo_gallery.services.embedding_generator import EmbeddingGenerator
+from conversational_photo_gallery.services.file_manager import FileManager
+from conversational_photo_gallery.services.image_uploader import ImageUploader
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+from conversational_photo_gallery.services.sharding import ShardedCollection, hnsw_metadata
+from conversational_photo_gallery.services.vector_search import rank_candidates
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+EMBEDDING_DIM = 512
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Time fn `repeat` times after `warmup` untimed calls; return latency stats in ms."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "n": repeat,
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+        "max_ms": samples[-1],
+    }
+
+
+def random_embeddings(count: int, seed: int = 0) -> np.ndarray:
+    """Unit-norm random vectors shaped like CLIP embeddings."""
+    vectors = np.random.default_rng(seed).standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_embeddings(image_paths: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Single text, single image and batched image CLIP encoding."""
+    generator = EmbeddingGenerator()
+    results = {
+        "embedding.text": measure(lambda: generator.generate_text_embedding("photos of a birthday cake"), repeat),
+        "embedding.image_single": measure(lambda: generator.generate_embedding(image_paths[0]), repeat),
+    }
+    for batch_size in (8, 32):
+        batch = image_paths[:batch_size]
+        stats = measure(lambda: generator.generate_embeddings(batch, batch_size=batch_size), max(1, repeat // 4))
+        stats["per_image_ms"] = stats["mean_ms"] / len(batch)
+        results[f"embedding.image_batch_{batch_size}"] = stats
+    return results
+
+
+def bench_vector_query(workdir: Path, sizes: List[int], repeat: int) -> Dict[str, Dict[str, float]]:
+    """HNSW query latency (one and four shards) and exact pushdown ranking, per collection size."""
+    results = {}
+    queries = random_embeddings(repeat + 1, seed=1).tolist()
+    for size in sizes:
+        client = chromadb.PersistentClient(path=str(workdir / f"chroma_{size}"))
+        collection = client.get_or_create_collection(name="bench", metadata=hnsw_metadata())
+        embeddings = random_embeddings(size)
+        ids = [f"img_{i}" for i in range(size)]
+        batch = 5000
+        for start in range(0, size, batch):
+            collection.add(
+                ids=ids[start:start + batch],
+                embeddings=embeddings[start:start + batch].tolist(),
+                metadatas=[{"description": f"image {i}"} for i in range(start, min(size, start + batch))],
+            )
+
+        query_iter = iter(queries * 2)
+        results[f"vector_query.hnsw_{size}"] = measure(
+            lambda: collection.query(query_embeddings=[next(query_iter)], n_results=5), repeat
+        )
+        candidates = ids[: min(500, size)]
+        results[f"vector_query.pushdown_500_of_{size}"] = measure(
+            lambda: rank_candidates(collection, queries[0], candidates, 5), repeat
+        )
+
+        # Same data spread over 4 shards, queried in parallel and merged
+        sharded = ShardedCollection(str(workdir / f"chroma_{size}"), "bench", client=client)
+        for _ in range(3):
+            sharded.add_shard()
+        sharded.rebalance()
+        results[f"vector_query.sharded_4_{size}"] = measure(
+            lambda: sharded.query(query_embeddings=[next(query_iter)], n_results=5), repeat
+        )
+    return results
+
+
+def bench_metadata(workdir: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    """DatabaseManager metadata writes and reads (ChromaDB plus the SQLite side index)."""
+    db_manager = DatabaseManager(
+        db_path=str(workdir / "chroma_metadata"),
+        collection_name="bench_metadata",
+        metadata_index=MetadataIndex(str(workdir / "metadata_index.sqlite3")),
+    )
+    embeddings = random_embeddings(repeat + 1, seed=2).tolist()
+    metadata = {
+        "description": "A chocolate birthday cake with candles on a wooden table.",
+        "tags": "cake,party,candles",
+        "date": "2023:07:14 18:32:05",
+        "user_tags": "",
+        "dominant_color": "brown",
+    }
+    counter = iter(range(10 * repeat + 10))
+
+    def add():
+        i = next(counter)
+        db_manager.add_image(f"/bench/{i}.jpg", embeddings[i % len(embeddings)], dict(metadata))
+
+    results = {"metadata.add_image": measure(add, repeat)}
+    results["metadata.get_metadata"] = measure(lambda: db_manager.get_metadata("/bench/1.jpg"), repeat)
+    results["metadata.update_user_tags"] = measure(
+        lambda: db_manager.update_metadata("/bench/1.jpg", user_tags=["family", "birthday"]), repeat
+    )
+    return results
+
+
+def bench_prompt(repeat: int) -> Dict[str, Dict[str, float]]:
+    """ChatHandler.build_prompt over growing conversation histories."""
+    # build_prompt only reads the history, so skip the model-loading constructor
+    handler = ChatHandler.__new__(ChatHandler)
+    results = {}
+    for turns in (10, 100, 1000):
+        handler.conversation_history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "lorem ipsum " * 20}
+            for i in range(turns)
+        ]
+        results[f"prompt.build_{turns}_turns"] = measure(handler.build_prompt, repeat)
+    return results
+
+
+def bench_ingest(workdir: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    """ImageUploader.upload per image and upload_many per batch of 8: save, embed, stubbed annotation, write."""
+    uploader = ImageUploader(
+        db_manager=DatabaseManager(
+            db_path=str(workdir / "chroma_ingest"),
+            collection_name="bench_ingest",
+            metadata_index=MetadataIndex(str(workdir / "ingest_index.sqlite3")),
+        ),
+        file_manager=FileManager(str(workdir / "uploads")),
+    )
+    (workdir / "uploads").mkdir(exist_ok=True)
+    payloads = [jpeg_bytes(seed) for seed in range(repeat + 1)]
+    payload_iter = iter(payloads)
+
+    def upload():
+        upload_file = UploadFile(file=io.BytesIO(next(payload_iter)), filename="synthetic.jpg")
+        uploader.upload(upload_file)
+
+    results = {"ingest.upload_per_image": measure(upload, repeat)}
+
+    batch_payloads = iter([[jpeg_bytes(seed + 1000 * batch) for seed in range(8)] for batch in range(repeat + 1)])
+
+    def upload_many():
+        uploader.upload_many([
+            UploadFile(file=io.BytesIO(payload), filename="synthetic.jpg") for payload in next(batch_payloads)
+        ])
+
+    stats = measure(upload_many, repeat)
+    stats["per_image_ms"] = stats["mean_ms"] / 8
+    results["ingest.upload_many_8"] = stats
+    return results
+
+
+def environment() -> Dict[str, str]:
+    """Describe the machine so results from different hosts are not compared blindly."""
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": str(os.cpu_count()),
+        "torch": torch.__version__,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "chromadb": chromadb.__version__,
+    }
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline_path: Path) -> None:
+    """Print the p50 change of every benchmark relative to a previous results file."""
+    baseline = json.loads(baseline_path.read_text())["results"]
+    print(f"\n{'benchmark':45} {'baseline p50':>14} {'current p50':>14} {'change':>9}")
+    for name, stats in sorted(current.items()):
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_ms"], stats["p50_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:45} {before:12.2f}ms {after:12.2f}ms {change:+8.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the offline component benchmarks.")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="previous results file to compare against")
+    parser.add_argument("--repeat", type=int, default=20, help="timed iterations per benchmark")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated collection sizes")
+    parser.add_argument(
+        "--only",
+        default="embedding,vector_query,metadata,prompt,ingest",
+        help="comma-separated benchmark groups to run",
+    )
+    args = parser.parse_args()
+
+    groups = set(args.only.split(","))
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results: Dict[str, Dict[str, float]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="gallery-bench-") as tmp:
+        workdir = Path(tmp)
+        image_paths = write_synthetic_images(workdir / "images", 32)
+        if "embedding" in groups:
+            results.update(bench_embeddings(image_paths, args.repeat))
+        if "vector_query" in groups:
+            results.update(bench_vector_query(workdir, sizes, args.repeat))
+        if "metadata" in groups:
+            results.update(bench_metadata(workdir, args.repeat))
+        if "prompt" in groups:
+            results.update(bench_prompt(args.repeat))
+        if "ingest" in groups:
+            results.update(bench_ingest(workdir, args.repeat))
+
+    for name, stats in sorted(results.items()):
+        print(f"{name:45} p50 {stats['p50_ms']:10.2f}ms  p95 {stats['p95_ms']:10.2f}ms")
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(
+        {"created_at": datetime.now().isoformat(), "environment": environment(), "results": results},
+        indent=2,
+    ))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
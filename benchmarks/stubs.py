@@ -0,0 +1,41 @@
+"""Synthetic images used by the offline benchmarks (Gemini is faked via LLM_BACKEND=fake)."""
+import io
+import random
+from pathlib import Path
+from typing import List
+
+from PIL import Image, ImageDraw
+
+
+def synthetic_image(seed: int, size=(1024, 768)) -> Image.Image:
+    """Draw a deterministic image with random shapes so JPEG sizes are realistic."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randrange(20, 300), y0 + rng.randrange(20, 300)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+    return image
+
+
+def write_synthetic_images(directory: Path, count: int, size=(1024, 768)) -> List[str]:
+    """Write `count` synthetic JPEGs into directory and return their paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for seed in range(count):
+        path = directory / f"synthetic_{seed:05d}.jpg"
+        synthetic_image(seed, size).save(path, format="JPEG", quality=90)
+        paths.append(str(path))
+    return paths
+
+
+def jpeg_bytes(seed: int, size=(1024, 768)) -> bytes:
+    """Return a synthetic image encoded as JPEG bytes (e.g., for upload payloads)."""
+    buffer = io.BytesIO()
+    synthetic_image(seed, size).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
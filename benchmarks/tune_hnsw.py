@@ -0,0 +1,222 @@
+"""Recall/latency tuning of the HNSW index parameters on the real collection.
+
+The stored image embeddings are copied into temporary collections built
+with each (M, construction_ef) pair of the grid. Held-out embeddings (and,
+optionally, CLIP embeddings of sample text queries) are searched at each
+search_ef, and recall@k is measured against exact cosine search together
+with query latency and build time. The fastest setting that reaches the
+target recall is recommended as HNSW_* values for config.py:
+
+    python benchmarks/tune_hnsw.py --target-recall 0.95 --k 50
+    python benchmarks/tune_hnsw.py --m 8 16 32 --search-ef 20 50 100 200 --text-queries queries.txt
+
+The live collection is only read. M and construction_ef apply to shards
+created afterwards (existing ones have to be rebuilt); search_ef applies to
+every shard the next time the app starts.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add the repository root to the Python path (same approach as main.py)
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from conversational_photo_gallery.config import (
+    COLLECTION_NAME,
+    DATABASE_PATH,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_M,
+    HNSW_SEARCH_EF,
+    RERANK_CANDIDATES,
+)
+from conversational_photo_gallery.services.sharding import ShardedCollection, hnsw_metadata, set_search_ef
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Records read per page when loading the collection, and written per add() into the test indexes
+PAGE_SIZE = 1000
+
+
+def load_embeddings(db_path: str, collection_name: str) -> Tuple[List[str], np.ndarray]:
+    """Read every stored embedding of the (sharded) collection, normalized to unit length."""
+    collection = ShardedCollection(db_path, collection_name)
+    ids: List[str] = []
+    vectors: List[List[float]] = []
+    while True:
+        page = collection.get(include=["embeddings"], limit=PAGE_SIZE, offset=len(ids))
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return ids, matrix / np.where(norms == 0, 1, norms)
+
+
+def exact_neighbours(index_vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """Exact top-k cosine neighbours (row positions) of each query."""
+    similarities = queries @ index_vectors.T
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def build_index(client, name: str, vectors: np.ndarray, m: int, construction_ef: int) -> Tuple[object, float]:
+    """Build a temporary collection with the given construction parameters; return it and the build seconds."""
+    collection = client.create_collection(
+        name=name, metadata=hnsw_metadata(m=m, construction_ef=construction_ef, search_ef=HNSW_SEARCH_EF)
+    )
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), PAGE_SIZE):
+        collection.add(ids=ids[offset:offset + PAGE_SIZE], embeddings=vectors[offset:offset + PAGE_SIZE].tolist())
+    return collection, time.perf_counter() - start
+
+
+def measure_search(collection, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, float]:
+    """Query one vector at a time and return recall@k and latency percentiles in ms."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries.tolist(), truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected.intersection(int(i) for i in result["ids"][0]))
+    latencies.sort()
+    return {
+        "recall": hits / (k * len(truth)),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "mean_ms": sum(latencies) / len(latencies),
+    }
+
+
+def recommend(results: List[Dict], target_recall: float) -> Dict:
+    """Pick the lowest p95 latency setting that reaches the target recall (else the best recall)."""
+    passing = [row for row in results if row["recall"] >= target_recall]
+    if passing:
+        return min(passing, key=lambda row: (row["p95_ms"], row["build_s"]))
+    return max(results, key=lambda row: (row["recall"], -row["p95_ms"]))
+
+
+def tune(
+    vectors: np.ndarray,
+    m_values: List[int],
+    construction_efs: List[int],
+    search_efs: List[int],
+    k: int,
+    n_queries: int,
+    text_queries: Optional[np.ndarray] = None,
+    seed: int = 0,
+) -> List[Dict]:
+    """Measure every grid point on a temporary copy of the embeddings.
+
+    Args:
+        vectors: Unit-length embeddings of the collection.
+        m_values: HNSW M values to try.
+        construction_efs: construction_ef values to try.
+        search_efs: search_ef values to try on each built index.
+        k: Neighbours per query (recall@k).
+        n_queries: Stored embeddings held out of the index and used as queries.
+        text_queries: Unit-length CLIP text embeddings used as extra queries (optional).
+        seed: Seed of the held-out sample.
+
+    Returns:
+        List[Dict]: One row per (M, construction_ef, search_ef) with recall, latency and build time.
+
+    Raises:
+        ValueError: If the collection is too small for the requested queries and k.
+    """
+    n_queries = min(n_queries, len(vectors) // 10)
+    if len(vectors) - n_queries < k or n_queries + (0 if text_queries is None else len(text_queries)) == 0:
+        raise ValueError(f"{len(vectors)} embeddings are too few to measure recall@{k}")
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    queries, index_vectors = vectors[order[:n_queries]], vectors[order[n_queries:]]
+    if text_queries is not None and len(text_queries):
+        queries = np.vstack([queries, text_queries])
+    truth = exact_neighbours(index_vectors, queries, k)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="hnsw_tune_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        for m in m_values:
+            for construction_ef in construction_efs:
+                name = f"tune_m{m}_c{construction_ef}"
+                collection, build_seconds = build_index(client, name, index_vectors, m, construction_ef)
+                # search_ef has to be at least k for HNSW to return k results
+                for search_ef in sorted({max(search_ef, k) for search_ef in search_efs}):
+                    set_search_ef(collection, search_ef)
+                    # ChromaDB only applies a new search_ef when the index is loaded again
+                    SharedSystemClient.clear_system_cache()
+                    client = chromadb.PersistentClient(path=workdir)
+                    collection = client.get_collection(name)
+                    row = {"M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                           "build_s": build_seconds}
+                    row.update(measure_search(collection, queries, truth, k))
+                    results.append(row)
+                    print(
+                        f"M={m:<3} construction_ef={construction_ef:<4} search_ef={row['search_ef']:<4} "
+                        f"recall@{k}={row['recall']:.3f} p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms "
+                        f"build={build_seconds:.1f}s"
+                    )
+                client.delete_collection(collection.name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def embed_text_queries(path: Path) -> np.ndarray:
+    """CLIP-embed one query per line of a text file."""
+    from conversational_photo_gallery.services.embedding_generator import EmbeddingGenerator
+
+    generator = EmbeddingGenerator()
+    lines = [line.strip() for line in path.read_text().splitlines() if line.strip()]
+    matrix = np.asarray([generator.generate_text_embedding(line) for line in lines], dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the HNSW parameters on the image collection.")
+    parser.add_argument("--db-path", default=str(DATABASE_PATH), help="ChromaDB storage directory")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="name of the (first shard) collection")
+    parser.add_argument("--m", type=int, nargs="+", default=sorted({8, HNSW_M, 32}))
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=sorted({HNSW_CONSTRUCTION_EF, 200}))
+    parser.add_argument("--search-ef", type=int, nargs="+", default=sorted({10, 25, 50, HNSW_SEARCH_EF, 200}))
+    parser.add_argument("--k", type=int, default=RERANK_CANDIDATES, help="neighbours per query (recall@k)")
+    parser.add_argument("--queries", type=int, default=200, help="stored embeddings held out as queries")
+    parser.add_argument("--text-queries", type=Path, default=None, help="file of text queries, one per line")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    _, vectors = load_embeddings(args.db_path, args.collection)
+    print(f"Loaded {len(vectors)} embeddings")
+    text_vectors = embed_text_queries(args.text_queries) if args.text_queries else None
+    results = tune(vectors, args.m, args.construction_ef, args.search_ef, args.k, args.queries, text_vectors)
+    best = recommend(results, args.target_recall)
+
+    status = "reaches" if best["recall"] >= args.target_recall else "is the closest to"
+    print(f"\nRecommended ({status} recall@{args.k} >= {args.target_recall}):")
+    print(f"HNSW_M = {best['M']}\nHNSW_CONSTRUCTION_EF = {best['construction_ef']}\nHNSW_SEARCH_EF = {best['search_ef']}")
+
+    output = args.output or RESULTS_DIR / f"hnsw_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(
+        {"collection_size": len(vectors), "k": args.k, "target_recall": args.target_recall,
+         "results": results, "recommended": best},
+        indent=2,
+    ))
+    print(f"Report written to {output}")
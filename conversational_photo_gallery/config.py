@@ -1,3 +1,5 @@
+import os
+import tempfile
 from pathlib import Path
 
 from fastapi.templating import Jinja2Templates
@@ -6,12 +8,234 @@ from fastapi.templating import Jinja2Templates
 # Image storage directory, one level up from this file (e.g., conversational_photo_gallery/images/)
 IMAGE_DIR = Path(__file__).resolve().parent / "images"
 
+# Thumbnail cache directory, one level up from this file (e.g., conversational_photo_gallery/thumbnails/)
+THUMBNAIL_DIR = Path(__file__).resolve().parent / "thumbnails"
+
+# Bounding box (width, height) of generated thumbnails
+THUMBNAIL_SIZE = (480, 480)
+
+# Cache policy for content-addressed media URLs, which never change once issued
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 # Database storage directory (e.g., conversational_photo_gallery/database/chromadb/)
 DATABASE_PATH = Path(__file__).resolve().parent / "database" / "chromadb"
 
 # ChromaDB collection name for image embeddings
 COLLECTION_NAME = "image_embeddings"
 
+# HNSW index of every shard: distance, links per node (M) and candidate list size while building. These are
+# fixed when a collection is created; benchmarks/tune_hnsw.py measures recall and latency to choose them
+HNSW_SPACE = "cosine"
+HNSW_M = 16
+HNSW_CONSTRUCTION_EF = 100
+
+# Candidate list size while searching (higher finds more true neighbours but is slower); also applied to
+# existing collections when they are opened
+HNSW_SEARCH_EF = 100
+
+# Images are sharded across collections by this metadata field (e.g., one owner per gallery), or by
+# file name when it is missing; COLLECTION_NAME is the first shard (see services/sharding.py)
+SHARD_KEY_FIELD = "owner"
+
+# Threads used to query the shards in parallel
+SHARD_QUERY_WORKERS = 8
+
+# SQLite side index for structured metadata (e.g., conversational_photo_gallery/database/metadata_index.sqlite3)
+METADATA_INDEX_PATH = Path(__file__).resolve().parent / "database" / "metadata_index.sqlite3"
+
+# SQLite store of chat sessions shared by all worker processes (e.g., conversational_photo_gallery/database/sessions.sqlite3);
+# set the SESSION_STORE_URL environment variable to a redis:// URL to share sessions across hosts instead
+SESSION_STORE_PATH = Path(__file__).resolve().parent / "database" / "sessions.sqlite3"
+
+# Cookie holding the chat session ID
+SESSION_COOKIE_NAME = "chat_session"
+
+# Seconds a chat turn waits for the session lock held by another turn of the same chat
+# (SESSION_LOCK_TTL, the time a turn may hold it, follows the Gemini settings below)
+SESSION_LOCK_WAIT = 30.0
+
+# Idle sessions are deleted after this many seconds (30 days)
+SESSION_TTL = 30 * 24 * 3600
+
+# Messages kept per session; older ones (except the greeting) are dropped
+SESSION_MAX_MESSAGES = 200
+
+# Filtered searches with at most this many candidates are ranked exactly over the candidate IDs
+MAX_PUSHDOWN_CANDIDATES = 5000
+
+# Over-fetch factor for the vector query when a filter matches too many candidates to rank exactly
+FILTER_OVERFETCH_FACTOR = 10
+
+# Chat query images are decoded in memory; uploads larger than this many bytes spill to a
+# temporary file in CHAT_IMAGE_SPILL_DIR (outside IMAGE_DIR) while being decoded
+CHAT_IMAGE_SPILL_THRESHOLD = 8 * 1024 * 1024
+CHAT_IMAGE_SPILL_DIR = Path(tempfile.gettempdir())
+
+# CLIP model used for text and image embeddings
+CLIP_MODEL_NAME = "clip-ViT-B-32"
+
+# Shortest side (in pixels) CLIP resizes images to before its center crop; the embedding server's clients
+# downscale larger images to it before sending their pixels
+CLIP_IMAGE_SIZE = 224
+
+# Precision of CLIP inference on the CPU: "fp32" runs the published weights, "int8" stores the weights of
+# every linear layer as int8 (dynamic quantization), which encodes faster with embeddings close to but not
+# identical to fp32 (benchmarks/clip_quantization.py measures both). The CLIP_PRECISION environment
+# variable overrides it; on a GPU the model always runs in fp32
+CLIP_PRECISION = "fp32"
+
+# PyTorch CPU threads used inside one operator and across independent operators (0 keeps PyTorch's
+# defaults); with several worker processes per host, keep their total intra-op threads within the core count
+CLIP_INTRA_OP_THREADS = 0
+CLIP_INTER_OP_THREADS = 0
+
+# Unix socket of the shared embedding server, used by workers started with EMBEDDING_BACKEND=server
+EMBEDDING_SOCKET_PATH = Path(tempfile.gettempdir()) / "conversational_photo_gallery_embeddings.sock"
+
+# Embedding server micro-batching: inputs per forward pass, and seconds a request waits for others to join
+EMBEDDING_MAX_BATCH_SIZE = 32
+EMBEDDING_MAX_WAIT = 0.005
+
+# Number of images annotated together in one Gemini request during bulk uploads
+ANNOTATION_BATCH_SIZE = 8
+
+# Longest side (in pixels) of the downscaled copies sent to Gemini for batched annotation
+ANNOTATION_IMAGE_SIZE = 768
+
+# Dominant colours and palettes are computed locally from a copy of each image whose longest side is this
+# many pixels; colours covering less than COLOR_MIN_SHARE of the copy are left out of the palette
+COLOR_SAMPLE_SIZE = 64
+COLOR_MIN_SHARE = 0.02
+
+# Characters of the geohash stored with each geotagged image (9 characters is a cell of about 5 m),
+# and the most geohash cells a bounding-box query is split into
+GEOHASH_PRECISION = 9
+GEO_MAX_CELLS = 16
+
+# Radius in km of a location filter such as "near 48.85,2.35" or a saved place without its own radius
+GEO_DEFAULT_RADIUS_KM = 1.0
+
+# Tags are assigned locally by scoring each image's CLIP embedding against the embeddings of the
+# TAG_VOCABULARY entries, each phrased as TAG_PROMPT_TEMPLATE; an image gets up to TAG_TOP_K tags
+# whose cosine similarity is at least TAG_MIN_SIMILARITY
+TAG_PROMPT_TEMPLATE = "a photo of {}"
+TAG_TOP_K = 5
+TAG_MIN_SIMILARITY = 0.24
+
+# Cached text embeddings of the tag vocabulary, recomputed when the vocabulary, template or CLIP model/precision changes
+TAG_MATRIX_PATH = Path(__file__).resolve().parent / "database" / "tag_matrix.npz"
+
+# Multi-image uploads run through a staged pipeline (save -> decode -> embed -> annotate -> write);
+# threads saving uploads, decode worker processes (0 decodes in a thread) and concurrent Gemini requests
+INGEST_SAVE_WORKERS = 4
+INGEST_DECODE_WORKERS = min(4, os.cpu_count() or 1)
+INGEST_ANNOTATE_WORKERS = 4
+
+# Capacity of each queue between ingest stages; a full queue blocks the stage feeding it
+INGEST_QUEUE_SIZE = 32
+
+# Images per CLIP forward pass and per database write, and seconds a batch waits to fill up
+INGEST_EMBED_BATCH_SIZE = 32
+INGEST_WRITE_BATCH_SIZE = 64
+INGEST_BATCH_WAIT = 0.05
+
+# Longest side (in pixels) of the decoded copy passed to CLIP, which works at 224x224 internally
+INGEST_EMBED_IMAGE_SIZE = 448
+
+# Candidates retrieved per chat query before local re-ranking
+RERANK_CANDIDATES = 50
+
+# Weights of the fractions of query words found in an image's description and tags, added to CLIP cosine
+RERANK_KEYWORD_WEIGHT = 0.1
+RERANK_TAG_WEIGHT = 0.15
+
+# Re-ranked images must score at least RERANK_MIN_SCORE and be within RERANK_RELATIVE_MARGIN of the best one
+RERANK_MIN_SCORE = 0.2
+RERANK_RELATIVE_MARGIN = 0.15
+
+# Images scoring within this margin of the cut-off are ambiguous; up to RERANK_MAX_AMBIGUOUS of them
+# are confirmed with the LLM when RERANK_LLM_CONFIRMATION is enabled (otherwise they are kept)
+RERANK_AMBIGUITY_MARGIN = 0.02
+RERANK_MAX_AMBIGUOUS = 3
+RERANK_LLM_CONFIRMATION = True
+
+# Chat searches whose CLIP text embedding has at least this cosine similarity to a cached query (with the
+# same tag/colour/date filters) reuse its selected images and response until the collection changes
+SEMANTIC_CACHE_THRESHOLD = 0.93
+
+# Most recently used queries kept in the semantic response cache (0 disables it)
+SEMANTIC_CACHE_SIZE = 1024
+
+# Random-hyperplane LSH over cached query embeddings: hash tables and hyperplanes (bits) per table
+SEMANTIC_CACHE_LSH_TABLES = 8
+SEMANTIC_CACHE_LSH_BITS = 8
+
+# Seconds before a Gemini attempt is abandoned
+LLM_TIMEOUT = 30.0
+
+# Attempts per Gemini call, retried with exponential backoff and full jitter (base and cap in seconds)
+LLM_MAX_ATTEMPTS = 3
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 8.0
+
+# Seconds a chat turn may hold its session lock: enough for the Gemini calls of one turn (up to
+# CHAT_MAX_LLM_CALLS, each with every attempt timing out and the longest backoff between them) plus
+# SESSION_LOCK_MARGIN for retrieval; a turn still running after that fails instead of saving its history
+CHAT_MAX_LLM_CALLS = 3
+SESSION_LOCK_MARGIN = 30.0
+SESSION_LOCK_TTL = (
+    CHAT_MAX_LLM_CALLS * (LLM_MAX_ATTEMPTS * LLM_TIMEOUT + (LLM_MAX_ATTEMPTS - 1) * LLM_BACKOFF_MAX)
+    + SESSION_LOCK_MARGIN
+)
+
+# A duplicate Gemini request is sent when the first is slower than this percentile of recent latencies;
+# LLM_HEDGE_DELAY seconds is used until enough samples exist (0 disables hedging)
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_DELAY = 10.0
+
+# Consecutive Gemini failures that open the circuit, and seconds before a probe call is allowed
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_TIMEOUT = 30.0
+
+# Seconds between background retries of uploads whose annotation was deferred
+ANNOTATION_RETRY_INTERVAL = 60.0
+
+# Retries after which an image Gemini keeps failing to annotate (while reachable) is marked 'failed'
+ANNOTATION_MAX_ATTEMPTS = 5
+
+# Seconds between background consistency scans of IMAGE_DIR against the collection (0 disables them)
+CONSISTENCY_SCAN_INTERVAL = 3600.0
+
+# Files modified less than this many seconds ago are left alone, since an upload may still be processing them
+CONSISTENCY_GRACE_PERIOD = 600.0
+
+# What the consistency scan does with image files missing from the collection: "requeue" or "quarantine"
+CONSISTENCY_ORPHAN_ACTION = "requeue"
+
+# Fingerprints (mtime, size) of the files seen by the last consistency scan
+CONSISTENCY_STATE_PATH = Path(__file__).resolve().parent / "database" / "consistency.sqlite3"
+
+# SQLite file of the leases that let only one worker process run each background job
+# (deferred annotation retries, consistency scans) on this host
+JOB_LEASE_PATH = Path(__file__).resolve().parent / "database" / "job_leases.sqlite3"
+
+# Orphaned files are moved here, outside IMAGE_DIR so they are no longer served
+QUARANTINE_DIR = Path(__file__).resolve().parent / "quarantine"
+
+# Snapshots written by `snapshot --export`, one directory per snapshot; a delta snapshot finds its
+# base in a sibling directory named after the base's snapshot ID
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "snapshots"
+
+# Side indexes built for snapshots served with SNAPSHOT_PATH, one SQLite file per snapshot ID
+SNAPSHOT_INDEX_DIR = Path(__file__).resolve().parent / "database" / "snapshot_indexes"
+
+# Attempts at a consistent export (no write landing while it reads) before giving up
+SNAPSHOT_EXPORT_ATTEMPTS = 5
+
+# Rows converted from float16 at a time when a snapshot is searched
+SNAPSHOT_QUERY_CHUNK = 65536
+
 # Jinja2 templates configuration
 try:
     TEMPLATES = Jinja2Templates(directory="templates")
@@ -24,6 +248,11 @@ try:
 except OSError as e:
     print(f"Error creating image directory {IMAGE_DIR}: {e}")
 
+try:
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+except OSError as e:
+    print(f"Error creating thumbnail directory {THUMBNAIL_DIR}: {e}")
+
 try:
     DATABASE_PATH.mkdir(parents=True, exist_ok=True)
 except OSError as e:
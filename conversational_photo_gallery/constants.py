@@ -21,6 +21,12 @@ PROMPT_TEMPLATES = {
     "NO_SELECTION_RESPONSE": (
         "I found some images related to '{query}', but none seemed relevant enough to show. Would you like me to try something else?"
     ),
+    "LLM_UNAVAILABLE_RESPONSE": (
+        "The assistant is temporarily unavailable, so here are the closest matches from your gallery:\n"
+    ),
+    "LLM_UNAVAILABLE_NO_RESULT_RESPONSE": (
+        "The assistant is temporarily unavailable and no matching photos were found. Please try again shortly."
+    ),
     "IMAGE_DESCRIPTION_PROMPT": (
         "Provide a concise, detailed description of this image in 2-3 sentences, "
         "focusing on key objects, actions, colors, the overall scene, texture (e.g., smooth, rough), "
@@ -56,5 +62,89 @@ PROMPT_TEMPLATES = {
     "RESPONSE_TEXT_WITH_IMAGES_MULTIMODAL": (
         "Here are some relevant images based on your query and uploaded image:"
     ),
+    "BATCH_ANNOTATION_PROMPT": (
+        "You are given {count} images for a photo gallery, each preceded by its label "
+        "('Image 0' to 'Image {last}'). For every image, provide:\n"
+        "- description: a concise, detailed description in 2-3 sentences, focusing on key objects, "
+        "actions, colors and the overall scene, highlighting people, animals or landscapes.\n"
+        "Respond with only a JSON array of {count} objects, one per image, each with the keys "
+        "\"index\" (the image number) and \"description\"."
+    ),
+
+}
+
+# Base colour names used to normalize dominant colours and to parse colour filters from queries
+COLOR_VOCABULARY = [
+    "red", "orange", "yellow", "green", "blue", "purple", "pink",
+    "brown", "black", "white", "gray", "beige", "gold", "silver",
+]
 
+# Reference sRGB shades of each COLOR_VOCABULARY entry; pixels take the name of the nearest shade (in CIELAB)
+COLOR_ANCHORS = {
+    "red": [(200, 30, 40), (140, 20, 30), (230, 80, 70)],
+    "orange": [(240, 140, 30), (210, 100, 20), (250, 180, 110)],
+    "yellow": [(245, 220, 50), (250, 240, 140), (200, 180, 30)],
+    "green": [(60, 150, 60), (30, 80, 40), (140, 200, 110), (100, 120, 60)],
+    "blue": [(40, 90, 200), (20, 40, 100), (130, 180, 230), (60, 140, 170)],
+    "purple": [(120, 60, 160), (70, 30, 90), (180, 140, 210)],
+    "pink": [(240, 150, 190), (220, 80, 140), (250, 200, 210)],
+    "brown": [(120, 75, 40), (70, 45, 25), (160, 110, 70)],
+    "black": [(15, 15, 15), (30, 30, 35)],
+    "white": [(245, 245, 245), (225, 230, 235)],
+    "gray": [(128, 128, 128), (90, 90, 95), (170, 170, 170)],
+    "beige": [(220, 200, 160), (200, 180, 150)],
+    "gold": [(212, 175, 55), (180, 140, 40)],
+    "silver": [(192, 192, 200)],
 }
+
+# Spelling variants mapped onto COLOR_VOCABULARY entries
+COLOR_SYNONYMS = {
+    "grey": "gray",
+    "violet": "purple",
+    "cyan": "blue",
+    "navy": "blue",
+    "turquoise": "blue",
+    "teal": "green",
+    "tan": "beige",
+    "cream": "beige",
+    "golden": "gold",
+}
+
+# Words ignored when matching query keywords against descriptions and tags
+QUERY_STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "by", "can", "do", "find", "for", "from", "give", "have",
+    "i", "image", "images", "in", "is", "it", "me", "my", "of", "on", "or", "photo", "photos",
+    "picture", "pictures", "please", "show", "some", "that", "the", "their", "there", "these",
+    "this", "to", "was", "were", "what", "where", "which", "with", "you", "your",
+}
+
+# Controlled tag vocabulary of the local zero-shot tagger; edit it and re-tag the gallery with
+# `python -m conversational_photo_gallery.services.database_manager --retag`
+TAG_VOCABULARY = [
+    # people and animals
+    "person", "portrait", "selfie", "group photo", "baby", "child", "family", "couple", "crowd",
+    "dog", "cat", "bird", "horse", "cow", "fish", "insect", "wildlife", "pet",
+    # events and activities
+    "birthday", "wedding", "party", "celebration", "concert", "graduation", "holiday", "christmas",
+    "halloween", "festival", "sports", "football", "basketball", "tennis", "swimming", "running",
+    "cycling", "hiking", "skiing", "surfing", "camping", "fishing", "dancing", "cooking", "travel",
+    "shopping", "picnic", "game", "reading", "working",
+    # food and drink
+    "food", "cake", "dessert", "pizza", "burger", "sushi", "salad", "fruit", "bread", "breakfast",
+    "dinner", "coffee", "tea", "wine", "beer", "cocktail", "ice cream", "candles",
+    # places and scenes
+    "beach", "ocean", "lake", "river", "waterfall", "mountain", "forest", "desert", "snow", "field",
+    "garden", "park", "city", "street", "skyline", "building", "architecture", "bridge", "church",
+    "castle", "museum", "restaurant", "kitchen", "living room", "bedroom", "office", "classroom",
+    "stadium", "airport", "train station", "road", "countryside", "farm", "island", "cave",
+    # nature and weather
+    "sunset", "sunrise", "night", "sky", "clouds", "rain", "fog", "storm", "rainbow", "stars",
+    "flower", "tree", "leaves", "autumn", "spring", "summer", "winter", "landscape",
+    # objects and vehicles
+    "car", "bicycle", "motorcycle", "bus", "train", "boat", "airplane", "table", "chair", "sofa",
+    "book", "phone", "computer", "toy", "gift", "balloons", "clothing", "shoes", "jewelry",
+    "painting", "sculpture", "musical instrument", "guitar", "piano", "sign", "text", "document",
+    "screenshot", "drawing",
+    # style
+    "indoor", "outdoor", "close-up", "aerial view", "black and white", "underwater",
+]
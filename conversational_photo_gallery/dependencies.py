@@ -1,17 +1,69 @@
+import os
+from functools import lru_cache
+from typing import Union
+
 import chromadb
 
 from conversational_photo_gallery.config import DATABASE_PATH, COLLECTION_NAME
+from conversational_photo_gallery.services.color_palette import ColorIndex
 from conversational_photo_gallery.services.embedding_generator import EmbeddingGenerator
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+from conversational_photo_gallery.services.semantic_cache import SemanticCache
+from conversational_photo_gallery.services.sharding import ShardedCollection
+from conversational_photo_gallery.services.snapshot import SnapshotCollection
+from conversational_photo_gallery.services.session_store import RedisSessionStore, SessionStore, SQLiteSessionStore
+from conversational_photo_gallery.services.zero_shot_tagger import ZeroShotTagger
+
 
+@lru_cache(maxsize=1)
+def get_collection() -> Union[ShardedCollection, SnapshotCollection]:
+    """Initialize and return the (sharded) ChromaDB collection for image embeddings.
 
-def get_collection():
-    """Initialize and return the ChromaDB collection for image embeddings.
+    With SNAPSHOT_PATH set, reads are served from that memory-mapped snapshot instead.
 
     Returns:
-        chromadb.Collection: The configured collection instance.
+        Union[ShardedCollection, SnapshotCollection]: The configured collection, spread over its shards,
+        or the read-only snapshot.
     """
+    snapshot_path = os.getenv("SNAPSHOT_PATH")
+    if snapshot_path:
+        return SnapshotCollection(snapshot_path)
     client = chromadb.PersistentClient(path=str(DATABASE_PATH))
-    return client.get_or_create_collection(name=COLLECTION_NAME)
+    return ShardedCollection(str(DATABASE_PATH), COLLECTION_NAME, client=client)
 
 def get_embeddings_generator():
     return EmbeddingGenerator()
+
+@lru_cache(maxsize=1)
+def get_metadata_index() -> MetadataIndex:
+    """Return the process-wide SQLite metadata side index (the snapshot's own index with SNAPSHOT_PATH set)."""
+    if os.getenv("SNAPSHOT_PATH"):
+        return get_collection().build_metadata_index()
+    return MetadataIndex()
+
+
+@lru_cache(maxsize=1)
+def get_color_index() -> ColorIndex:
+    """Return the process-wide in-memory colour palette index."""
+    return ColorIndex(get_metadata_index())
+
+
+@lru_cache(maxsize=1)
+def get_tagger() -> ZeroShotTagger:
+    """Return the process-wide zero-shot tagger (its vocabulary matrix is loaded on first use)."""
+    return ZeroShotTagger()
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic chat response cache, invalidated by metadata index changes."""
+    return SemanticCache(get_metadata_index().version)
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    """Return the process-wide chat session store (Redis if SESSION_STORE_URL is set, else SQLite)."""
+    url = os.getenv("SESSION_STORE_URL")
+    if url:
+        return RedisSessionStore(url)
+    return SQLiteSessionStore()
@@ -1,26 +1,153 @@
+import asyncio
+import os
 import sys
+import time
+import uuid
 from pathlib import Path
+from typing import Callable
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 
 # Add the parent directory of the conversational_photo_gallery directory to the Python path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
-from routes import homepage, gallery, image_viewer, chat, upload
+from routes import homepage, gallery, image_viewer, chat, upload, timeline, media, metrics, facets, colors, locations
+from conversational_photo_gallery.config import ANNOTATION_RETRY_INTERVAL, CONSISTENCY_SCAN_INTERVAL
+from conversational_photo_gallery.services.consistency_scanner import ConsistencyScanner
+from conversational_photo_gallery.services.image_uploader import ImageUploader
+from conversational_photo_gallery.services.job_lease import JobLeases
+from conversational_photo_gallery.services.metrics import (
+    HTTP_LATENCY,
+    server_timing_header,
+    start_request_timing,
+)
 
 
 app = FastAPI()
 
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Record request latency and report per-stage timings in a Server-Timing header."""
+    timings = start_request_timing()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    timings.append(("total", elapsed))
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+async def run_leased(name: str, interval: float, job: Callable[[], None]) -> None:
+    """Run `job` in a thread every `interval` seconds in only one of the worker processes.
+
+    Every worker calls this; the one holding the job's lease (see JobLeases) runs
+    the passes and renews the lease while a pass runs. It keeps the lease for two
+    intervals after each pass, so another worker only takes over once it stops.
+
+    Args:
+        name: Name of the job's lease.
+        interval: Seconds between passes.
+        job: Runs one pass (and reports its own errors).
+    """
+    owner = uuid.uuid4().hex
+    leases = None
+
+    async def renew() -> bool:
+        try:
+            return await asyncio.to_thread(leases.acquire, name, owner, 2 * interval)
+        except Exception as e:
+            print(f"Renewing the {name} lease failed: {e}")
+            return False
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                leases = leases or await asyncio.to_thread(JobLeases)
+            except Exception as e:
+                print(f"Opening the {name} lease failed: {e}")
+                continue
+            if not await renew():
+                continue
+            run = asyncio.ensure_future(asyncio.to_thread(job))
+            while not run.done():
+                await asyncio.wait({run}, timeout=interval / 2)
+                await renew()
+    finally:
+        # On shutdown, let another worker (or the next start) take the job over right away
+        if leases is not None:
+            leases.release(name, owner)
+
+
+async def retry_deferred_annotations() -> None:
+    """Periodically annotate uploads stored while Gemini was unavailable (in one worker process)."""
+    uploader = None
+
+    def annotate() -> None:
+        nonlocal uploader
+        try:
+            # Created once (on the first run, so a failing database only delays it) and reused
+            uploader = uploader or ImageUploader()
+            uploader.annotate_pending()
+        except Exception as e:
+            print(f"Deferred annotation retry failed: {e}")
+
+    await run_leased("deferred_annotations", ANNOTATION_RETRY_INTERVAL, annotate)
+
+
+async def run_consistency_scans() -> None:
+    """Periodically reconcile the image directory with the vector database (in one worker process)."""
+    scanner = None
+
+    def scan() -> None:
+        nonlocal scanner
+        try:
+            # Created once (on the first run, so a failing database only delays it) and reused
+            scanner = scanner or ConsistencyScanner()
+            print(f"Consistency scan: {scanner.scan().as_dict()}")
+        except Exception as e:
+            print(f"Consistency scan failed: {e}")
+
+    await run_leased("consistency_scan", CONSISTENCY_SCAN_INTERVAL, scan)
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    """Start the deferred annotation retry loop and the consistency scanner."""
+    if os.getenv("SNAPSHOT_PATH"):
+        # A replica serving a snapshot is read-only: there is nothing to annotate, and scanning IMAGE_DIR
+        # against the empty local database would wipe the snapshot's side index and requeue every file
+        print("Serving a snapshot; deferred annotation and consistency scans are disabled")
+        return
+    app.state.annotation_retry_task = asyncio.create_task(retry_deferred_annotations())
+    if CONSISTENCY_SCAN_INTERVAL > 0:
+        app.state.consistency_scan_task = asyncio.create_task(run_consistency_scans())
+
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/images", StaticFiles(directory="images"), name="images")
 
 
 app.include_router(homepage.router, prefix="")
 app.include_router(gallery.router, prefix="/gallery")
+app.include_router(timeline.router, prefix="/timeline")
+app.include_router(facets.router, prefix="/facets")
+app.include_router(colors.router, prefix="/colors")
+app.include_router(locations.router, prefix="/locations")
+app.include_router(media.router, prefix="/media")
+app.include_router(metrics.router, prefix="/metrics")
 app.include_router(upload.router, prefix="/upload")
 app.include_router(image_viewer.router, prefix="/gallery")
 app.include_router(chat.router, prefix="/chat")
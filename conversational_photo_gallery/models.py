@@ -1,7 +1,9 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
+from conversational_photo_gallery.config import GEO_DEFAULT_RADIUS_KM
+
 
 # Model for image metadata (used in image_viewer.py and chat_handler.py)
 class ImageMetadata(BaseModel):
@@ -23,3 +25,64 @@ class UploadResponse(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     images: Optional[List[str]] = None
+
+
+# Models for timeline browsing (used in timeline.py)
+class TimelineImage(BaseModel):
+    id: str
+    url: str
+    timestamp: float
+
+
+class TimelineBucket(BaseModel):
+    month: str
+    count: int
+
+
+class TimelineResponse(BaseModel):
+    images: List[TimelineImage] = []
+    buckets: List[TimelineBucket] = []
+    next_cursor: Optional[str] = None
+
+
+# Models for gallery facets (used in facets.py)
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class FacetsResponse(BaseModel):
+    tags: List[FacetCount] = []
+    colors: List[FacetCount] = []
+
+
+# Models for colour-similarity search (used in colors.py)
+class ColorMatch(BaseModel):
+    id: str
+    url: str
+    similarity: float
+
+
+class ColorSearchResponse(BaseModel):
+    palette: Dict[str, float] = {}
+    images: List[ColorMatch] = []
+
+
+# Models for location search and saved places (used in locations.py)
+class LocationMatch(BaseModel):
+    id: str
+    url: str
+    latitude: float
+    longitude: float
+    distance_km: Optional[float] = None
+
+
+class LocationSearchResponse(BaseModel):
+    images: List[LocationMatch] = []
+
+
+class Place(BaseModel):
+    name: str
+    latitude: float
+    longitude: float
+    radius_km: float = GEO_DEFAULT_RADIUS_KM
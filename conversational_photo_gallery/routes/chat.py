@@ -1,3 +1,5 @@
+import uuid
+
 from fastapi import (
     APIRouter,
     Depends,
@@ -5,13 +7,15 @@ from fastapi import (
     Form,
     HTTPException,
     Request,
+    Response,
     UploadFile,
 )
 from fastapi.responses import HTMLResponse
 
-from conversational_photo_gallery.config import TEMPLATES
-from conversational_photo_gallery.dependencies import get_collection
+from conversational_photo_gallery.config import SESSION_COOKIE_NAME, SESSION_TTL, TEMPLATES
+from conversational_photo_gallery.dependencies import get_collection, get_session_store
 from conversational_photo_gallery.services.chat_handler import ChatHandler
+from conversational_photo_gallery.services.session_store import SessionLeaseLost, SessionLockTimeout, SessionStore
 from conversational_photo_gallery.models import ChatResponse
 
 router = APIRouter()
@@ -24,23 +28,58 @@ async def chat(request: Request):
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat(
+def chat(
     request: Request,
+    response: Response,
     query: str = Form(None),
     image: UploadFile = File(None),
     collection=Depends(get_collection),
+    session_store: SessionStore = Depends(get_session_store),
 ) -> ChatResponse:
-    """Handle chat queries with text, image, or both."""
+    """Handle chat queries with text, image, or both.
+
+    The conversation history is kept in the shared session store under the
+    ID in the session cookie, so every worker sees the same history and turns
+    of one session run one at a time. The route is synchronous so waiting
+    for the session lock and the model calls run in the threadpool.
+    """
     if not query and not image:
         raise HTTPException(
             status_code=400, detail="Please provide a text query and/or an image."
         )
 
-    chat_handler = ChatHandler(collection)
+    session_id = request.cookies.get(SESSION_COOKIE_NAME) or uuid.uuid4().hex
+    response.set_cookie(SESSION_COOKIE_NAME, session_id, httponly=True, samesite="lax", max_age=SESSION_TTL)
+
+    try:
+        with session_store.session(session_id, ChatHandler.INITIAL_HISTORY) as history:
+            chat_handler = ChatHandler(collection, history)
+
+            if query and not image:
+                return chat_handler.handle_text_query(query)
+            elif image and not query:
+                return chat_handler.handle_image_query(image)
+            else:
+                return chat_handler.handle_multimodal_query(query, image)
+    except SessionLockTimeout:
+        raise HTTPException(
+            status_code=409, detail="A previous message in this chat is still being processed."
+        )
+    except SessionLeaseLost:
+        raise HTTPException(
+            status_code=503, detail="This message took too long to process. Please send it again."
+        )
+
 
-    if query and not image:
-        return chat_handler.handle_text_query(query)
-    elif image and not query:
-        return chat_handler.handle_image_query(image)
-    elif query and image:
-        return chat_handler.handle_multimodal_query(query, image)
+@router.post("/reset")
+def reset_chat(
+    request: Request,
+    response: Response,
+    session_store: SessionStore = Depends(get_session_store),
+) -> dict:
+    """Start a new chat by forgetting the current session's history."""
+    session_id = request.cookies.get(SESSION_COOKIE_NAME)
+    if session_id:
+        session_store.delete(session_id)
+    response.delete_cookie(SESSION_COOKIE_NAME)
+    return {"message": "Chat reset"}
@@ -0,0 +1,73 @@
+from os.path import basename, join
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from conversational_photo_gallery.config import IMAGE_DIR
+from conversational_photo_gallery.dependencies import get_color_index
+from conversational_photo_gallery.models import ColorMatch, ColorSearchResponse
+from conversational_photo_gallery.services.color_palette import ColorIndex
+from conversational_photo_gallery.services.content_store import ContentStore
+from conversational_photo_gallery.services.metadata_index import normalize_color, parse_palette
+from conversational_photo_gallery.services.metrics import timed_stage
+
+router = APIRouter()
+
+
+@router.get("/similar", response_model=ColorSearchResponse)
+def similar_colors(
+    image_id: Optional[str] = Query(None, description="Filename of an image whose palette to match"),
+    palette: Optional[str] = Query(None, description="Colour shares to match, e.g. 'blue:0.6,white:0.4'"),
+    color: Optional[str] = Query(None, description="A single colour to match, e.g. 'blue'"),
+    limit: int = Query(20, ge=1, le=200),
+    color_index: ColorIndex = Depends(get_color_index),
+) -> ColorSearchResponse:
+    """Return the photos whose colour palette is closest to an image's, a palette or a colour.
+
+    Args:
+        image_id: Filename of the image whose stored palette to match.
+        palette: Comma-separated colour:share pairs to match.
+        color: Single colour to match (the photos where it covers the most area come first).
+        limit: Maximum number of photos to return.
+        color_index: In-memory palette index dependency.
+
+    Returns:
+        ColorSearchResponse: The palette that was matched and the closest photos.
+
+    Raises:
+        HTTPException: If no usable palette is given, the image has none, or the index fails.
+    """
+    exclude = set()
+    try:
+        if image_id:
+            full_image_path = join(IMAGE_DIR, image_id)
+            query = color_index.palette_of(full_image_path)
+            if not query:
+                raise HTTPException(status_code=404, detail="No colour palette stored for this image")
+            exclude.add(full_image_path)
+        elif palette:
+            query = parse_palette(palette)
+        elif color:
+            query = parse_palette(f"{normalize_color(color)}:1")
+        else:
+            raise HTTPException(status_code=400, detail="Provide image_id, palette or color.")
+        if not query:
+            raise HTTPException(status_code=400, detail="No known colour in the request.")
+
+        with timed_stage("colors", "similarity"):
+            matches = color_index.similar(query, limit, exclude)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Colour search failed: {e}")
+
+    content_store = ContentStore()
+    return ColorSearchResponse(
+        palette=query,
+        images=[
+            ColorMatch(
+                id=basename(match_id),
+                url=content_store.url_for(match_id, thumbnail=True),
+                similarity=round(similarity, 4),
+            )
+            for match_id, similarity in matches
+        ],
+    )
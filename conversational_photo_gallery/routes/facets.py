@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from conversational_photo_gallery.dependencies import get_metadata_index
+from conversational_photo_gallery.models import FacetCount, FacetsResponse
+
+router = APIRouter()
+
+
+@router.get("", response_model=FacetsResponse)
+async def facets(
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of tags and of colours"),
+    metadata_index=Depends(get_metadata_index),
+) -> FacetsResponse:
+    """Return the most common tags and colours in the gallery with their image counts.
+
+    Args:
+        limit: Maximum number of tags and of colours to return.
+        metadata_index: SQLite side index dependency.
+
+    Returns:
+        FacetsResponse: Tag and colour counts, most common first.
+
+    Raises:
+        HTTPException: If the index query fails.
+    """
+    try:
+        counts = metadata_index.facets(limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load facets: {e}")
+    return FacetsResponse(
+        tags=[FacetCount(value=tag, count=count) for tag, count in counts["tags"]],
+        colors=[FacetCount(value=color, count=count) for color, count in counts["colors"]],
+    )
@@ -1,22 +1,37 @@
 from os.path import basename
+from typing import Optional
 
 from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import HTMLResponse
 
 from conversational_photo_gallery.config import TEMPLATES
-from conversational_photo_gallery.dependencies import get_collection
+from conversational_photo_gallery.dependencies import get_collection, get_metadata_index
+from conversational_photo_gallery.services.content_store import ContentStore
+from conversational_photo_gallery.services.metadata_index import normalize_color, split_tags
+from conversational_photo_gallery.services.query_filters import QueryFilters
 
 
 router = APIRouter()
 
 
 @router.get("", response_class=HTMLResponse)
-async def gallery(request: Request, collection=Depends(get_collection)) -> HTMLResponse:
+async def gallery(
+    request: Request,
+    sort: str = "added",
+    tag: Optional[str] = None,
+    color: Optional[str] = None,
+    collection=Depends(get_collection),
+    metadata_index=Depends(get_metadata_index),
+) -> HTMLResponse:
     """Retrieve all image file paths and metadata from ChromaDB.
 
     Args:
         request (Request): FastAPI request object.
+        sort (str): 'added' for upload order, 'date' for newest capture date first.
+        tag (Optional[str]): Only show images with this tag.
+        color (Optional[str]): Only show images with this dominant colour.
         collection: ChromaDB collection dependency.
+        metadata_index: SQLite side index dependency, used for date sorting, filters and facets.
 
     Returns:
         HTMLResponse: Rendered gallery template with image data.
@@ -25,21 +40,49 @@ async def gallery(request: Request, collection=Depends(get_collection)) -> HTMLR
         HTTPException: If retrieving image data fails.
     """
     try:
-        # Fetch all data from ChromaDB
-        results = collection.get(include=["metadatas"])
+        filters = QueryFilters(
+            tags=split_tags(tag or "")[:1],
+            colors=[normalize_color(color)] if color else [],
+        )
+        if filters.is_empty():
+            # Fetch all data from ChromaDB
+            results = collection.get(include=["metadatas"])
+        else:
+            # Resolve the facet filters in the side index, then fetch only the matches
+            matching_ids = metadata_index.candidate_ids(filters, limit=-1)
+            results = collection.get(ids=matching_ids, include=["metadatas"]) if matching_ids else {}
+        image_ids = results.get("ids", [])
+        metadatas = dict(zip(image_ids, results.get("metadatas") or []))
+
+        if sort == "date":
+            # Read the order from the date index; undated images go last
+            dated_ids = [image_id for image_id, _, _ in metadata_index.timeline(limit=-1)]
+            known_ids = set(image_ids)
+            dated_ids = [image_id for image_id in dated_ids if image_id in known_ids]
+            dated_set = set(dated_ids)
+            image_ids = dated_ids + [image_id for image_id in image_ids if image_id not in dated_set]
 
         # Extract image paths (IDs) and prepare data for template
+        content_store = ContentStore()
         images_data = [
             {
-                "url": f"/images/{basename(image_id)}",  # Relative URL from absolute path
+                # Content-addressed thumbnail URL, cacheable forever
+                "url": content_store.url_for(image_id, metadatas.get(image_id), thumbnail=True),
                 "id": basename(image_id)  # Use filename as ID for routing
             }
-            for image_id in results.get("ids", [])
+            for image_id in image_ids
         ]
 
         return TEMPLATES.TemplateResponse(
             "gallery.html",
-            {"request": request, "images": images_data}
+            {
+                "request": request,
+                "images": images_data,
+                "sort": sort,
+                "tag": filters.tags[0] if filters.tags else "",
+                "color": filters.colors[0] if filters.colors else "",
+                "facets": metadata_index.facets(),
+            }
         )
     except Exception as e:
         raise HTTPException(
@@ -5,6 +5,7 @@ from fastapi.responses import HTMLResponse
 from conversational_photo_gallery.config import IMAGE_DIR, TEMPLATES
 from conversational_photo_gallery.dependencies import get_collection
 from conversational_photo_gallery.models import ImageMetadata
+from conversational_photo_gallery.services.content_store import ContentStore
 
 router = APIRouter()
 
@@ -46,7 +47,7 @@ async def image_viewer(
 
         # Create Pydantic model instance
         image_data = ImageMetadata(
-            url=f"/images/{image_id}",
+            url=ContentStore().url_for(full_image_path, metadata),
             description=metadata.get("description", "No description available"),
             tags=combined_tags,
             date=metadata.get("date", "No date available"),
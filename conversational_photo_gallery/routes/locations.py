@@ -0,0 +1,125 @@
+from os.path import basename
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from conversational_photo_gallery.config import GEO_DEFAULT_RADIUS_KM
+from conversational_photo_gallery.dependencies import get_metadata_index
+from conversational_photo_gallery.models import LocationMatch, LocationSearchResponse, Place
+from conversational_photo_gallery.services.content_store import ContentStore
+from conversational_photo_gallery.services.geo import BoundingBox, valid_coordinates
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+from conversational_photo_gallery.services.metrics import timed_stage
+
+router = APIRouter()
+
+
+def parse_bbox(bbox: str) -> Optional[BoundingBox]:
+    """Parse 'south,west,north,east' in degrees; None if malformed (west > east crosses longitude 180)."""
+    try:
+        south, west, north, east = (float(part) for part in bbox.split(","))
+    except ValueError:
+        return None
+    if not (valid_coordinates(south, west) and valid_coordinates(north, east)) or south > north:
+        return None
+    return south, west, north, east
+
+
+@router.get("/search", response_model=LocationSearchResponse)
+def search_locations(
+    bbox: Optional[str] = Query(None, description="Bounding box 'south,west,north,east' in degrees"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the centre of a radius search"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the centre of a radius search"),
+    radius_km: float = Query(GEO_DEFAULT_RADIUS_KM, gt=0, le=20038, description="Search radius in km"),
+    place: Optional[str] = Query(None, description="Name of a saved place to search around"),
+    limit: int = Query(200, ge=1, le=5000),
+    metadata_index: MetadataIndex = Depends(get_metadata_index),
+) -> LocationSearchResponse:
+    """Return the geotagged photos inside a bounding box and/or near a point or saved place.
+
+    Args:
+        bbox: Comma-separated south, west, north and east edges.
+        lat: Latitude of the point to search around.
+        lon: Longitude of the point to search around.
+        radius_km: Radius around the point.
+        place: Saved place to search around (its own radius is used).
+        limit: Maximum number of photos to return.
+        metadata_index: SQLite side index dependency.
+
+    Returns:
+        LocationSearchResponse: The matching photos, nearest first for radius searches.
+
+    Raises:
+        HTTPException: If no area is given, a parameter is malformed, the place is unknown or the index fails.
+    """
+    area = None
+    if bbox:
+        area = parse_bbox(bbox)
+        if area is None:
+            raise HTTPException(status_code=400, detail="bbox must be 'south,west,north,east' in degrees.")
+    near = None
+    if place:
+        near = metadata_index.place(place)
+        if near is None:
+            raise HTTPException(status_code=404, detail=f"Unknown place: {place}")
+    elif lat is not None and lon is not None:
+        near = (lat, lon, radius_km)
+    elif lat is not None or lon is not None:
+        raise HTTPException(status_code=400, detail="Provide both lat and lon.")
+    if area is None and near is None:
+        raise HTTPException(status_code=400, detail="Provide bbox, lat and lon, or place.")
+
+    try:
+        with timed_stage("locations", "search"):
+            rows = metadata_index.locations(area, near, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Location search failed: {e}")
+
+    content_store = ContentStore()
+    return LocationSearchResponse(
+        images=[
+            LocationMatch(
+                id=basename(image_id),
+                url=content_store.url_for(image_id, {"content_hash": content_hash}, thumbnail=True),
+                latitude=latitude,
+                longitude=longitude,
+                distance_km=round(distance, 3) if distance is not None else None,
+            )
+            for image_id, latitude, longitude, distance, content_hash in rows
+        ]
+    )
+
+
+@router.get("/places", response_model=List[Place])
+def list_places(metadata_index: MetadataIndex = Depends(get_metadata_index)) -> List[Place]:
+    """Return every saved place."""
+    return [
+        Place(name=name, latitude=latitude, longitude=longitude, radius_km=radius_km)
+        for name, latitude, longitude, radius_km in metadata_index.places()
+    ]
+
+
+@router.put("/places", response_model=Place)
+def save_place(place: Place, metadata_index: MetadataIndex = Depends(get_metadata_index)) -> Place:
+    """Save (or move) a named place, so chat queries such as 'photos near the beach house' can use it.
+
+    Raises:
+        HTTPException: If the name, coordinates or radius are invalid.
+    """
+    try:
+        metadata_index.set_place(place.name, place.latitude, place.longitude, place.radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return place
+
+
+@router.delete("/places/{name}")
+def delete_place(name: str, metadata_index: MetadataIndex = Depends(get_metadata_index)) -> dict:
+    """Remove a saved place.
+
+    Raises:
+        HTTPException: If there is no place with this name.
+    """
+    if not metadata_index.delete_place(name):
+        raise HTTPException(status_code=404, detail=f"Unknown place: {name}")
+    return {"status": "deleted", "name": name}
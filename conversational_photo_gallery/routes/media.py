@@ -0,0 +1,105 @@
+import mimetypes
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from conversational_photo_gallery.config import MEDIA_CACHE_CONTROL
+from conversational_photo_gallery.services.content_store import ContentStore
+
+router = APIRouter()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header against a strong ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_file_response(path: Path, etag: str) -> Response:
+    """Serve a content-addressed file with immutable caching headers.
+
+    FileResponse handles Range/If-Range requests and hands the file path to
+    servers that support zero-copy sends; other servers get chunked reads.
+    """
+    headers = {
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def resolve_image(store: ContentStore, filename: str):
+    """Return the stored image path and its current content hash.
+
+    Raises:
+        HTTPException: If the image does not exist.
+    """
+    try:
+        image_path = store.resolve(filename)
+        return image_path, store.digest(str(image_path))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+
+@router.get("/{digest}/{filename}")
+def original_image(request: Request, digest: str, filename: str) -> Response:
+    """Serve an original image under its content-hash URL.
+
+    Args:
+        request: The incoming HTTP request.
+        digest: Content hash of the image.
+        filename: Image filename (its gallery ID).
+
+    Returns:
+        Response: The image, a 304 when the client's copy is current, or a
+        redirect to the current URL when the image content has changed.
+
+    Raises:
+        HTTPException: If the image does not exist.
+    """
+    store = ContentStore()
+    etag = f'"{digest}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": etag})
+
+    image_path, current_digest = resolve_image(store, filename)
+    if current_digest != digest:
+        return RedirectResponse(store.url_for(str(image_path)), status_code=307)
+    return cached_file_response(image_path, etag)
+
+
+@router.get("/{digest}/thumb/{filename}")
+def thumbnail_image(request: Request, digest: str, filename: str) -> Response:
+    """Serve an image thumbnail under its content-hash URL.
+
+    Args:
+        request: The incoming HTTP request.
+        digest: Content hash of the original image.
+        filename: Image filename (its gallery ID).
+
+    Returns:
+        Response: The JPEG thumbnail, a 304 when the client's copy is current,
+        or a redirect to the current URL when the image content has changed.
+
+    Raises:
+        HTTPException: If the image does not exist or the thumbnail cannot be generated.
+    """
+    store = ContentStore()
+    etag = f'"{digest}-thumb"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": etag})
+
+    image_path, current_digest = resolve_image(store, filename)
+    if current_digest != digest:
+        return RedirectResponse(store.url_for(str(image_path), thumbnail=True), status_code=307)
+    try:
+        thumbnail_path = store.thumbnail(image_path, digest)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return cached_file_response(thumbnail_path, etag)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from conversational_photo_gallery.services.metrics import REGISTRY
+
+router = APIRouter()
+
+
+@router.get("", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Expose stage latency, LLM size, cache and HTTP metrics in Prometheus text format.
+
+    Metrics are kept per process; with several uvicorn workers each worker
+    reports its own series.
+
+    Returns:
+        PlainTextResponse: The metrics in Prometheus exposition format 0.0.4.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
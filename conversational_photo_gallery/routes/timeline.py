@@ -0,0 +1,85 @@
+from datetime import datetime
+from os.path import basename, join
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from conversational_photo_gallery.config import IMAGE_DIR
+from conversational_photo_gallery.dependencies import get_metadata_index
+from conversational_photo_gallery.models import TimelineBucket, TimelineImage, TimelineResponse
+from conversational_photo_gallery.services.content_store import ContentStore
+
+router = APIRouter()
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    """Parse a 'YYYY-MM-DD' or 'YYYY-MM' query parameter into an epoch timestamp.
+
+    Raises:
+        HTTPException: If the date is malformed.
+    """
+    if not value:
+        return None
+    for date_format in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            return datetime.strptime(value, date_format).timestamp()
+        except ValueError:
+            continue
+    raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD or YYYY-MM")
+
+
+@router.get("", response_model=TimelineResponse)
+def timeline(
+    start: Optional[str] = Query(None, description="Inclusive start date (YYYY-MM-DD or YYYY-MM)"),
+    end: Optional[str] = Query(None, description="Exclusive end date (YYYY-MM-DD or YYYY-MM)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    metadata_index=Depends(get_metadata_index),
+) -> TimelineResponse:
+    """Return photos in a date range, newest first, with per-month counts.
+
+    Args:
+        start: Inclusive start date.
+        end: Exclusive end date.
+        cursor: Opaque pagination cursor returned by the previous page.
+        limit: Maximum number of photos per page.
+        metadata_index: SQLite side index dependency.
+
+    Returns:
+        TimelineResponse: One page of photos plus the month buckets of the range.
+
+    Raises:
+        HTTPException: If a parameter is malformed or the index query fails.
+    """
+    start_ts, end_ts = parse_date(start), parse_date(end)
+
+    page_cursor = None
+    if cursor:
+        try:
+            timestamp, filename = cursor.split(":", 1)
+            page_cursor = (float(timestamp), join(IMAGE_DIR, filename))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        rows = metadata_index.timeline(start_ts, end_ts, limit=limit, cursor=page_cursor)
+        buckets = metadata_index.month_buckets(start_ts, end_ts)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load timeline: {e}")
+
+    content_store = ContentStore()
+    images = [
+        TimelineImage(
+            id=basename(image_id),
+            # the indexed hash spares reading every file on the page
+            url=content_store.url_for(image_id, {"content_hash": content_hash}, thumbnail=True),
+            timestamp=taken_at,
+        )
+        for image_id, taken_at, content_hash in rows
+    ]
+    next_cursor = f"{images[-1].timestamp!r}:{images[-1].id}" if len(images) == limit else None
+    return TimelineResponse(
+        images=images,
+        buckets=[TimelineBucket(month=month, count=count) for month, count in buckets],
+        next_cursor=next_cursor,
+    )
@@ -44,12 +44,7 @@ async def upload_images(files: list[UploadFile] = File(...)) -> UploadResponse:
     """
     try:
         uploader = ImageUploader()
-        errors = []
-        for upload_file in files:
-            try:
-                uploader.upload(upload_file)
-            except ValueError as e:
-                errors.append(f"Failed to upload {upload_file.filename}: {str(e)}")
+        errors = uploader.upload_many(files)
 
         num_files = len(files)
         if errors:
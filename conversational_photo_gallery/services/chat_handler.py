@@ -1,20 +1,28 @@
-import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException, UploadFile
 
+from conversational_photo_gallery.config import RERANK_CANDIDATES, RERANK_LLM_CONFIRMATION
+from conversational_photo_gallery.dependencies import get_metadata_index, get_semantic_cache
 from conversational_photo_gallery.models import ChatResponse
+from conversational_photo_gallery.services.content_store import ContentStore
 from conversational_photo_gallery.services.decision_maker import retrieve_decision
 from conversational_photo_gallery.services.embedding_generator import EmbeddingGenerator
 from conversational_photo_gallery.services.file_manager import FileManager
 from conversational_photo_gallery.services.image_processor import ImageProcessor
-from conversational_photo_gallery.services.llm_service import LLMService
+from conversational_photo_gallery.services.llm_service import LLMService, LLMUnavailableError
+from conversational_photo_gallery.services.metrics import timed_stage
+from conversational_photo_gallery.services.query_filters import QueryFilters, parse_query_filters, resolve_place
+from conversational_photo_gallery.services.reranker import RankedImage, rerank
+from conversational_photo_gallery.services.semantic_cache import CachedResponse
+from conversational_photo_gallery.services.vector_search import query_images, search_images
 from conversational_photo_gallery.constants import PROMPT_TEMPLATES
 
 class ChatHandler:
     """Handles chat queries with text, image, or both, maintaining conversation history."""
 
-    conversation_history: List[Dict[str, str]] = [
+    # History a new chat session starts from
+    INITIAL_HISTORY: List[Dict[str, str]] = [
         {
             "role": "assistant",
             "content": PROMPT_TEMPLATES["INITIAL_GREETING"],
@@ -24,17 +32,27 @@ class ChatHandler:
     CHATBOT_RESPONSE_PROMPT = PROMPT_TEMPLATES["CHATBOT_RESPONSE_PROMPT"]
     IMAGE_SELECTION_PROMPT = PROMPT_TEMPLATES["IMAGE_SELECTION_PROMPT"]
 
-    def __init__(self, collection) -> None:
+    def __init__(self, collection, conversation_history: Optional[List[Dict[str, str]]] = None) -> None:
         """Initialize ChatHandler with dependencies.
 
         Args:
             collection: ChromaDB collection instance for querying images.
+            conversation_history: History of the chat session, updated in place (optional,
+                defaults to a new session).
         """
         self.collection = collection
+        self.conversation_history = (
+            conversation_history
+            if conversation_history is not None
+            else [dict(message) for message in self.INITIAL_HISTORY]
+        )
         self.image_processor = ImageProcessor()
         self.embedding_generator = EmbeddingGenerator()
         self.llm_service = LLMService()
         self.file_manager = FileManager()
+        self.content_store = ContentStore()
+        self.metadata_index = get_metadata_index()
+        self.semantic_cache = get_semantic_cache()
         self.n_results = 5
 
     def build_prompt(self) -> str:
@@ -48,6 +66,94 @@ class ChatHandler:
             prompt += f"{msg['role'].capitalize()}: {msg['content']}\n"
         return prompt
 
+    def _decide_retrieval(self, query: str) -> bool:
+        """Decide whether to retrieve images; without the LLM every query is treated as a search.
+
+        Raises:
+            ValueError: If the decision fails for another reason.
+        """
+        try:
+            with timed_stage("chat", "retrieve_decision"):
+                return retrieve_decision(query)
+        except LLMUnavailableError:
+            return True
+
+    def _confirm_ambiguous(self, query: str, ambiguous: List[RankedImage]) -> List[RankedImage]:
+        """Ask the LLM which borderline candidates to show.
+
+        Without RERANK_LLM_CONFIRMATION, or while the LLM is unavailable, all of
+        them are kept.
+
+        Args:
+            query: The user's query.
+            ambiguous: Borderline candidates from the re-ranker.
+
+        Returns:
+            List[RankedImage]: The candidates to show, in re-ranked order.
+        """
+        if not ambiguous or not RERANK_LLM_CONFIRMATION:
+            return ambiguous
+
+        retrieved_images = ""
+        for idx, image in enumerate(ambiguous, 1):
+            retrieved_images += (
+                f"{idx}. Description: {image.metadata.get('description', '')}, "
+                f"Tags: {image.metadata.get('tags', '')}\n"
+            )
+        prompt = self.build_prompt() + ChatHandler.IMAGE_SELECTION_PROMPT.format(
+            query=query, retrieved_images=retrieved_images
+        )
+        try:
+            with timed_stage("chat", "image_selection"):
+                response = self.llm_service.generate_response(prompt)
+        except LLMUnavailableError:
+            return ambiguous
+        selected_indices = {int(idx) for idx in response.split(",") if idx.strip().isdigit()}
+        return [image for idx, image in enumerate(ambiguous, 1) if idx in selected_indices]
+
+    def _embed_text(self, text: str) -> List[float]:
+        """Encode a search query with CLIP.
+
+        Raises:
+            HTTPException: If encoding fails.
+        """
+        try:
+            with timed_stage("chat", "text_embedding"):
+                return self.embedding_generator.generate_text_embedding(text)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Embedding error: {e}")
+
+    def _vector_only_response(
+        self, embedding: List[float], filters: Optional[QueryFilters] = None
+    ) -> ChatResponse:
+        """Answer with the nearest images when the LLM is unavailable.
+
+        Args:
+            embedding: Text or image embedding to search with.
+            filters: Structured filters parsed from the query (optional).
+
+        Returns:
+            ChatResponse: The closest matches with their stored descriptions.
+        """
+        with timed_stage("chat", "vector_query"):
+            image_ids, metadatas = query_images(
+                self.collection, embedding, self.n_results, filters, self.metadata_index
+            )
+        if not image_ids:
+            response_text = PROMPT_TEMPLATES["LLM_UNAVAILABLE_NO_RESULT_RESPONSE"]
+            self.conversation_history.append({"role": "assistant", "content": response_text})
+            return ChatResponse(response=response_text, images=[])
+
+        response_text = PROMPT_TEMPLATES["LLM_UNAVAILABLE_RESPONSE"]
+        for i, meta in enumerate(metadatas, 1):
+            response_text += f"{i}. {meta.get('description', '')}\n"
+        self.conversation_history.append({"role": "assistant", "content": response_text})
+        image_urls = [
+            self.content_store.url_for(img_id, meta, thumbnail=True)
+            for img_id, meta in zip(image_ids, metadatas)
+        ]
+        return ChatResponse(response=response_text, images=image_urls)
+
     def handle_text_query(self, query: str) -> ChatResponse:
         """Handle text-only queries.
 
@@ -63,9 +169,13 @@ class ChatHandler:
         # append query to chat history
         self.conversation_history.append({"role": "user", "content": query})
 
+        # push tag/colour/date/location filters down to the metadata index
+        filters = parse_query_filters(query)
+        resolve_place(filters, self.metadata_index.place)
+
         # make retrieved decision
         try:
-            should_retrieve = retrieve_decision(query)
+            should_retrieve = self._decide_retrieval(query)
         except ValueError as e:
             raise HTTPException(status_code=500, detail=f"Decision error: {str(e)}")
         except Exception as e:
@@ -78,68 +188,50 @@ class ChatHandler:
                 prompt = self.build_prompt() + ChatHandler.CHATBOT_RESPONSE_PROMPT
 
                 # generate response
-                response = self.llm_service.generate_response(prompt)
+                with timed_stage("chat", "llm_response"):
+                    response = self.llm_service.generate_response(prompt)
 
                 # save response to chat history
                 self.conversation_history.append(
                     {"role": "assistant", "content": response}
                 )
                 return ChatResponse(response=response)
+            except LLMUnavailableError:
+                return self._vector_only_response(self._embed_text(filters.semantic_query), filters)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"LLM error: {e}")
 
         # conversation with retrieving
         else:
-            try:
-                text_embedding = self.embedding_generator.generate_text_embedding(query)
-                results = self.collection.query(
-                    query_embeddings=[text_embedding],
-                    n_results=self.n_results,
-                )
+            text_embedding = self._embed_text(filters.semantic_query)
+
+            # a differently phrased search for the same thing reuses the earlier answer
+            with timed_stage("chat", "semantic_cache"):
+                cached = self.semantic_cache.lookup(text_embedding, filters)
+            if cached is not None:
+                return ChatResponse(response=cached.response, images=cached.images)
 
-                # extract image_id and metadata
-                image_ids = results["ids"][0]
-                metadatas = results["metadatas"][0]
+            try:
+                with timed_stage("chat", "vector_query"):
+                    image_ids, metadatas, similarities = search_images(
+                        self.collection, text_embedding, RERANK_CANDIDATES, filters, self.metadata_index
+                    )
 
                 # Check if there is no results at all
                 if not image_ids:
-                    no_results_response = PROMPT_TEMPLATES['NO_RESULTS_RESPONSE'].format(query=query)
+                    no_results_response = PROMPT_TEMPLATES['NO_RESULT_RESPONSE'].format(query=query)
                     self.conversation_history.append(
                         {"role": "assistant", "content": no_results_response}
                     )
                     return ChatResponse(response=no_results_response, images=[])
 
-                # extract retrieved image info
-                image_info = [
-                    {
-                        "id": img_id,
-                        "description": meta.get("description", ""),
-                        "tags": meta.get("tags", ""),
-                    }
-                    for img_id, meta in zip(image_ids, metadatas)
-                ]
-
-                # Initialize an empty string to accumulate the formatted image information.
-                retrieved_images = PROMPT_TEMPLATES['RESPONSE_TEXT_WITH_IMAGES']
-                for idx, info in enumerate(image_info, 1):
-                    retrieved_images += f"{idx}. Description: {info['description']}, Tags: {info['tags']}\n"
-
-                #  build prompt to filter retrieved images
-                prompt = (
-                        self.build_prompt() +
-                        ChatHandler.IMAGE_SELECTION_PROMPT.format( query=query, retrieved_images=retrieved_images)
-                )
-
-                # response to filter (e.g., '1,3')
-                response = self.llm_service.generate_response(prompt)
-
-                selected_indices = [int(idx) for idx in response.split(",") if idx.strip().isdigit()]
-                selected_image_ids = [
-                    image_info[idx - 1]["id"]
-                    for idx in selected_indices
-                    if 1 <= idx <= len(image_info)
-                ]
-                if not selected_image_ids:
+                # re-rank locally; the LLM only confirms borderline candidates
+                with timed_stage("chat", "rerank"):
+                    confident, ambiguous = rerank(
+                        filters.semantic_query, image_ids, metadatas, similarities, self.n_results
+                    )
+                selected_images = confident + self._confirm_ambiguous(query, ambiguous)
+                if not selected_images:
                     no_selection_response = PROMPT_TEMPLATES['NO_SELECTION_RESPONSE'].format(query=query)
                     self.conversation_history.append(
                         {"role": "assistant", "content": no_selection_response}
@@ -147,15 +239,18 @@ class ChatHandler:
                     return ChatResponse(response=no_selection_response, images=[])
 
                 image_urls = [
-                    f"/images/{os.path.basename(img_id)}" for img_id in selected_image_ids
+                    self.content_store.url_for(image.id, image.metadata, thumbnail=True)
+                    for image in selected_images
                 ]
                 response_text = "Here are some relevant images:\n"
-                for i, (img_id, info) in enumerate(
-                        [(img_id, info) for img_id in selected_image_ids for info in image_info if
-                         info["id"] == img_id], 1
-                ):
-                    response_text += f"{i}. {info['description']} \n"
+                for i, image in enumerate(selected_images, 1):
+                    response_text += f"{i}. {image.metadata.get('description', '')} \n"
 
+                self.semantic_cache.store(
+                    text_embedding,
+                    filters,
+                    CachedResponse([image.id for image in selected_images], image_urls, response_text),
+                )
                 return ChatResponse(response=response_text, images = image_urls, )
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Image selection error: {e}")
@@ -174,11 +269,21 @@ class ChatHandler:
             HTTPException: If processing the image fails.
         """
         try:
-            image_path = self.file_manager.save_image(image)
+            # decode once in memory; the upload never touches IMAGE_DIR
+            with timed_stage("chat", "decode_upload"):
+                query_image = self.file_manager.read_image(image)
+                image_data = ImageProcessor.encode_jpeg(query_image)
 
             # generate image description
             prompt = PROMPT_TEMPLATES['IMAGE_DESCRIPTION_PROMPT']
-            description = self.llm_service.generate_image_response(image_path, prompt)
+            try:
+                with timed_stage("chat", "image_description"):
+                    description = self.llm_service.generate_image_bytes_response(image_data, prompt)
+            except LLMUnavailableError:
+                # Show similar photos instead of describing the upload
+                with timed_stage("chat", "image_embedding"):
+                    image_embedding = self.embedding_generator.generate_image_embedding(query_image)
+                return self._vector_only_response(image_embedding)
 
             self.conversation_history.append(
                 {"role": "user", "content": f"[Image uploaded: {description}]"}
@@ -187,11 +292,8 @@ class ChatHandler:
             self.conversation_history.append(
                 {"role": "assistant", "content": response_message}
             )
-            os.remove(image_path)
             return ChatResponse(response=response_message)
         except Exception as e:
-            if "image_path" in locals() and os.path.exists(image_path):
-                os.remove(image_path)
             raise HTTPException(status_code=500, detail=f"Image-only search error: {e}")
 
 
@@ -209,108 +311,87 @@ class ChatHandler:
             HTTPException: If processing the multimodal query fails.
         """
         try:
-            image_path = self.file_manager.save_image(image)
+            # decode once in memory; the upload never touches IMAGE_DIR
+            with timed_stage("chat", "decode_upload"):
+                query_image = self.file_manager.read_image(image)
+                image_data = ImageProcessor.encode_jpeg(query_image)
 
             image_prompt = PROMPT_TEMPLATES['IMAGE_DESCRIPTION_PROMPT']
-            description = self.llm_service.generate_image_response(image_path, image_prompt)
+            try:
+                with timed_stage("chat", "image_description"):
+                    description = self.llm_service.generate_image_bytes_response(image_data, image_prompt)
+            except LLMUnavailableError:
+                description = "no description available"
 
             self.conversation_history.append(
                 {"role": "user", "content": f"query: {query}, [Image uploaded: {description}]"}
             )
 
             # make retrieval decision
-            should_retrieve = retrieve_decision(query)
+            should_retrieve = self._decide_retrieval(query)
 
             # only conversation
             if not should_retrieve:
                 prompt = self.build_prompt() + ChatHandler.CHATBOT_RESPONSE_PROMPT
-                response = self.llm_service.generate_image_response(image_path, prompt)
+                try:
+                    with timed_stage("chat", "llm_response"):
+                        response = self.llm_service.generate_image_bytes_response(image_data, prompt)
+                except LLMUnavailableError:
+                    with timed_stage("chat", "image_embedding"):
+                        image_embedding = self.embedding_generator.generate_image_embedding(query_image)
+                    return self._vector_only_response(image_embedding)
                 self.conversation_history.append(
                     {"role": "assistant", "content": response}
                 )
-                os.remove(image_path)
                 return ChatResponse(response=response)
 
             # conversation with retrieving
             else:
                 # get embedding for retrieval
-                text_embedding = self.embedding_generator.generate_text_embedding(query)
-                image_embedding = self.embedding_generator.generate_embedding(image_path)
-
-                # retrieve from text
-                text_results = self.collection.query(query_embeddings=[text_embedding], n_results=self.n_results)
-                text_image_ids = text_results["ids"][0]
-                text_metadatas = text_results["metadatas"][0]
-
-                # retrieve from image
-                image_results = self.collection.query(query_embeddings=[image_embedding], n_results=self.n_results)
-                image_image_ids = image_results["ids"][0]
-                image_metadatas = image_results["metadatas"][0]
-
-                # combine retrieved result
-                combined_image_ids = list(set(text_image_ids + image_image_ids))
-                combined_metadatas = []
-                for img_id in combined_image_ids:
-                    if img_id in text_image_ids:
-                        idx = text_image_ids.index(img_id)
-                        combined_metadatas.append(text_metadatas[idx])
-                    elif img_id in image_image_ids:
-                        idx = image_image_ids.index(img_id)
-                        combined_metadatas.append(image_metadatas[idx])
-
-                # extract from combined image
-                image_info = [
-                    {
-                        "id": img_id,
-                        "description": meta.get("description", ""),
-                        "tags": meta.get("tags", ""),
-                    }
-                    for img_id, meta in zip(combined_image_ids, combined_metadatas)
-                ]
-
-
-                # Initialize an empty string to accumulate the formatted image information.
-                retrieved_images = ""
-                for idx, info in enumerate(image_info, 1):
-                    retrieved_images += f"{idx}. Description: {info['description']}, Tags: {info['tags']}\n"
-
-                # build prompt to filter retrieved images
-                prompt = (
-                        self.build_prompt() +
-                        ChatHandler.IMAGE_SELECTION_PROMPT.format(query=query, retrieved_images=retrieved_images)
-                )
-
-                # filter retrieved image
-                response = self.llm_service.generate_response(prompt)
-
-                selected_indices = [
-                    int(idx) for idx in response.split(",") if idx.strip().isdigit()
-                ]
-                selected_image_ids = [
-                    image_info[idx - 1]["id"]
-                    for idx in selected_indices
-                    if 1 <= idx <= len(image_info)
-                ]
+                filters = parse_query_filters(query)
+                resolve_place(filters, self.metadata_index.place)
+                with timed_stage("chat", "text_embedding"):
+                    text_embedding = self.embedding_generator.generate_text_embedding(filters.semantic_query)
+                with timed_stage("chat", "image_embedding"):
+                    image_embedding = self.embedding_generator.generate_image_embedding(query_image)
+
+                # retrieve and re-rank from text and from image
+                rankings = []
+                for embedding in (text_embedding, image_embedding):
+                    with timed_stage("chat", "vector_query"):
+                        image_ids, metadatas, similarities = search_images(
+                            self.collection, embedding, RERANK_CANDIDATES, filters, self.metadata_index
+                        )
+                    with timed_stage("chat", "rerank"):
+                        rankings.append(rerank(
+                            filters.semantic_query, image_ids, metadatas, similarities, self.n_results
+                        ))
+
+                # combine retrieved results; an image confident in either ranking is not ambiguous
+                confident_images, ambiguous_images, seen = [], [], set()
+                for ranked in [ranked for confident, _ in rankings for ranked in confident]:
+                    if ranked.id not in seen:
+                        seen.add(ranked.id)
+                        confident_images.append(ranked)
+                for ranked in [ranked for _, ambiguous in rankings for ranked in ambiguous]:
+                    if ranked.id not in seen:
+                        seen.add(ranked.id)
+                        ambiguous_images.append(ranked)
+                selected_images = confident_images + self._confirm_ambiguous(query, ambiguous_images)
 
                 #get url to show images
                 image_urls = [
-                    f"/images/{os.path.basename(img_id)}" for img_id in selected_image_ids
+                    self.content_store.url_for(ranked.id, ranked.metadata, thumbnail=True)
+                    for ranked in selected_images
                 ]
 
-
                 response_text = PROMPT_TEMPLATES['RESPONSE_TEXT_WITH_IMAGES_MULTIMODAL']
-                for i, (img_id, info) in enumerate(
-                        [(img_id, info) for img_id in selected_image_ids for info in image_info if
-                         info["id"] == img_id], 1
-                ):
-                    response_text += f"{i}. {info['description']}\n"
+                for i, ranked in enumerate(selected_images, 1):
+                    response_text += f"{i}. {ranked.metadata.get('description', '')}\n"
 
                 self.conversation_history.append(
                     {"role": "assistant", "content": response_text}
                 )
-                os.remove(image_path)
                 return ChatResponse(response=response_text, images=image_urls)
         except Exception as e:
-            if "image_path" in locals() and os.path.exists(image_path):
-                os.remove(image_path)
             raise HTTPException(status_code=500, detail=f"Multimodal search error: {e}")
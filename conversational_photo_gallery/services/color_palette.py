@@ -0,0 +1,160 @@
+"""Local colour analysis: palettes over the fixed colour vocabulary and a colour-similarity index.
+
+Every pixel of a small copy of the image is given the name of the nearest
+COLOR_ANCHORS shade in CIELAB, so the palette is the share of the image
+covered by each COLOR_VOCABULARY colour and the dominant colour is the
+largest share. Palettes are stored in the image metadata as a compact
+string ('blue:0.412,white:0.301,...') and indexed in the SQLite side index;
+ColorIndex keeps them in memory as a matrix to find the images with the
+most similar palette in a few milliseconds.
+"""
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from conversational_photo_gallery.config import COLOR_MIN_SHARE, COLOR_SAMPLE_SIZE
+from conversational_photo_gallery.constants import COLOR_ANCHORS, COLOR_VOCABULARY
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) array of 8-bit sRGB colours to CIELAB (D65 white point)."""
+    linear = rgb.astype(np.float32) / 255.0
+    linear = np.where(linear > 0.04045, ((linear + 0.055) / 1.055) ** 2.4, linear / 12.92)
+    xyz = linear @ np.array(
+        [[0.4124, 0.2126, 0.0193], [0.3576, 0.7152, 0.1192], [0.1805, 0.0722, 0.9505]], dtype=np.float32
+    )
+    xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack(
+        [116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1
+    )
+
+
+# Every anchor shade in CIELAB, and the COLOR_VOCABULARY position of the colour it names
+_ANCHOR_LAB = srgb_to_lab(np.array([shade for color in COLOR_VOCABULARY for shade in COLOR_ANCHORS[color]]))
+_ANCHOR_COLOR = np.array(
+    [position for position, color in enumerate(COLOR_VOCABULARY) for _ in COLOR_ANCHORS[color]]
+)
+
+
+def extract_palette(image: Image.Image, sample_size: int = COLOR_SAMPLE_SIZE) -> Dict[str, float]:
+    """Return the share of the image covered by each vocabulary colour.
+
+    Args:
+        image: The image to analyse (left unchanged).
+        sample_size: Longest side of the copy whose pixels are counted.
+
+    Returns:
+        Dict[str, float]: Shares of at least COLOR_MIN_SHARE, largest first.
+    """
+    sample = image.convert("RGB")
+    sample.thumbnail((sample_size, sample_size))
+    lab = srgb_to_lab(np.asarray(sample).reshape(-1, 3))
+    # squared distance of every pixel to every anchor, without materializing the differences
+    distances = (
+        (lab ** 2).sum(axis=1, keepdims=True) - 2 * lab @ _ANCHOR_LAB.T + (_ANCHOR_LAB ** 2).sum(axis=1)
+    )
+    counts = np.bincount(_ANCHOR_COLOR[distances.argmin(axis=1)], minlength=len(COLOR_VOCABULARY))
+    shares = counts / max(int(counts.sum()), 1)
+    order = np.argsort(-shares, kind="stable")
+    return {COLOR_VOCABULARY[i]: round(float(shares[i]), 3) for i in order if shares[i] >= COLOR_MIN_SHARE}
+
+
+def dominant_color(palette: Dict[str, float]) -> str:
+    """Return the colour with the largest share ('' for an empty palette)."""
+    return max(palette, key=palette.get) if palette else ""
+
+
+def format_palette(palette: Dict[str, float]) -> str:
+    """Serialize a palette for the image metadata (e.g., 'blue:0.412,white:0.301')."""
+    return ",".join(f"{color}:{share:.3f}" for color, share in palette.items())
+
+
+def palette_vector(palette: Dict[str, float]) -> np.ndarray:
+    """Return the palette as a vector of shares in COLOR_VOCABULARY order."""
+    return np.array([palette.get(color, 0.0) for color in COLOR_VOCABULARY], dtype=np.float32)
+
+
+class ColorIndex:
+    """In-memory matrix of every image's palette, reloaded from the side index when the collection changes."""
+
+    def __init__(self, metadata_index: MetadataIndex) -> None:
+        """Initialize an empty index; palettes are loaded on the first query.
+
+        Args:
+            metadata_index: SQLite side index holding the palettes.
+        """
+        self.metadata_index = metadata_index
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, len(COLOR_VOCABULARY)), dtype=np.float32)
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        """Reload the palettes if the collection changed since they were loaded; the caller holds the lock."""
+        version = self.metadata_index.version()
+        if version == self._version:
+            return
+        rows = self.metadata_index.palettes()
+        matrix = np.zeros((0, len(COLOR_VOCABULARY)), dtype=np.float32)
+        ids: List[str] = []
+        if rows:
+            image_ids, colors, shares = zip(*rows)
+            row_of: Dict[str, int] = {}
+            image_rows = [row_of.setdefault(image_id, len(row_of)) for image_id in image_ids]
+            positions = {color: i for i, color in enumerate(COLOR_VOCABULARY)}
+            matrix = np.zeros((len(row_of), len(COLOR_VOCABULARY)), dtype=np.float32)
+            matrix[image_rows, [positions[color] for color in colors]] = shares
+            ids = list(row_of)
+        self._ids, self._matrix, self._version = ids, matrix, version
+        self._positions = {image_id: i for i, image_id in enumerate(ids)}
+
+    def similar(
+        self, palette: Dict[str, float], limit: int = 20, exclude: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return the images whose palette overlaps most with the given one.
+
+        Similarity is the histogram intersection of the two palettes: the
+        share of the image covered by colours they have in common (1.0 for
+        identical palettes).
+
+        Args:
+            palette: Colour shares to match, e.g. an image's stored palette or {'blue': 1.0}.
+            limit: Maximum number of images to return.
+            exclude: Image IDs to leave out (e.g., the query image).
+
+        Returns:
+            List[Tuple[str, float]]: (image ID, similarity) of images sharing at least one colour,
+            most similar first.
+
+        Raises:
+            RuntimeError: If the palettes cannot be loaded.
+        """
+        query = palette_vector(palette)
+        with self._lock:
+            self._refresh()
+            ids, matrix = self._ids, self._matrix
+        if not ids:
+            return []
+        scores = np.minimum(matrix, query).sum(axis=1)
+        count = min(len(ids), limit + len(exclude or ()))
+        top = np.argpartition(-scores, count - 1)[:count]
+        ranked = top[np.argsort(-scores[top], kind="stable")]
+        results = [
+            (ids[i], float(scores[i])) for i in ranked if scores[i] > 0 and not (exclude and ids[i] in exclude)
+        ]
+        return results[:limit]
+
+    def palette_of(self, image_id: str) -> Dict[str, float]:
+        """Return the stored palette of an image (empty if it has none)."""
+        with self._lock:
+            self._refresh()
+            position = self._positions.get(image_id)
+            if position is None:
+                return {}
+            row = self._matrix[position]
+        return {color: float(share) for color, share in zip(COLOR_VOCABULARY, row) if share > 0}
@@ -0,0 +1,295 @@
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from conversational_photo_gallery.config import (
+    CONSISTENCY_GRACE_PERIOD,
+    CONSISTENCY_ORPHAN_ACTION,
+    CONSISTENCY_STATE_PATH,
+    IMAGE_DIR,
+    QUARANTINE_DIR,
+)
+from conversational_photo_gallery.services.database_manager import DatabaseManager
+from conversational_photo_gallery.services.image_uploader import ImageUploader
+from conversational_photo_gallery.services.metrics import CONSISTENCY_FIXES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_fingerprints (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Fingerprint of a file: (st_mtime_ns, st_size)
+Fingerprint = Tuple[int, int]
+
+ORPHAN_ACTIONS = ("requeue", "quarantine")
+
+
+@dataclass
+class ScanReport:
+    """What one consistency scan found and fixed."""
+
+    files: int = 0
+    unchanged: int = 0
+    orphans: int = 0
+    orphans_pending: int = 0
+    requeued: int = 0
+    quarantined: int = 0
+    modified: int = 0
+    reindexed: int = 0
+    dangling_removed: int = 0
+    index_repaired: int = 0
+    index_pruned: int = 0
+    failures: int = 0
+    duration_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the report as a plain dictionary."""
+        return asdict(self)
+
+
+class ConsistencyScanner:
+    """Reconciles the image directory, the ChromaDB collection and the SQLite side index.
+
+    A scan lists the collection IDs and the image directory (names and stat
+    only) and compares them:
+
+    - orphans, files with no vector (e.g. an upload that failed after saving
+      the file), are re-indexed or moved to QUARANTINE_DIR;
+    - dangling vectors, whose file was deleted, are removed from the
+      collection and the side index;
+    - indexed files whose (mtime, size) fingerprint changed since the last
+      scan are re-embedded and re-annotated;
+    - side index rows are added or pruned to match the collection.
+
+    Files are never read or hashed unless they need fixing, and files
+    modified within the grace period are skipped because an upload may still
+    be processing them.
+    """
+
+    def __init__(
+        self,
+        db_manager: Optional[DatabaseManager] = None,
+        uploader: Optional[ImageUploader] = None,
+        image_dir: str = str(IMAGE_DIR),
+        quarantine_dir: str = str(QUARANTINE_DIR),
+        state_path: str = str(CONSISTENCY_STATE_PATH),
+        grace_period: float = CONSISTENCY_GRACE_PERIOD,
+        orphan_action: str = CONSISTENCY_ORPHAN_ACTION,
+    ) -> None:
+        """Initialize the scanner.
+
+        Args:
+            db_manager: Database manager to reconcile (optional, defaults to the configured database).
+            uploader: Uploader used to re-index files (optional, created on first use).
+            image_dir: Directory holding the original images.
+            quarantine_dir: Directory orphaned files are moved to.
+            state_path: SQLite file storing the fingerprints of the last scan.
+            grace_period: Seconds after its last modification before a file is touched.
+            orphan_action: 'requeue' to index orphaned files, 'quarantine' to move them away.
+
+        Raises:
+            ValueError: If orphan_action is unknown.
+            RuntimeError: If the database or the state file cannot be opened.
+        """
+        if orphan_action not in ORPHAN_ACTIONS:
+            raise ValueError(f"Unknown orphan action '{orphan_action}', expected one of {ORPHAN_ACTIONS}")
+        self.db_manager = db_manager or DatabaseManager()
+        self._uploader = uploader
+        self.image_dir = os.path.abspath(image_dir)
+        self.quarantine_dir = Path(quarantine_dir)
+        self.grace_period = grace_period
+        self.orphan_action = orphan_action
+        try:
+            self.connection = sqlite3.connect(state_path, check_same_thread=False)
+            self.connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Consistency scanner initialization failed: {e}")
+
+    @property
+    def uploader(self) -> ImageUploader:
+        """Uploader used to re-index files, created on first use since it loads the models."""
+        if self._uploader is None:
+            self._uploader = ImageUploader(db_manager=self.db_manager)
+        return self._uploader
+
+    def _list_files(self) -> Dict[str, Fingerprint]:
+        """Fingerprint every regular, non-hidden file in the image directory."""
+        files = {}
+        with os.scandir(self.image_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _load_fingerprints(self) -> Dict[str, Fingerprint]:
+        """Fingerprints of the indexed files recorded by the previous scan."""
+        rows = self.connection.execute("SELECT path, mtime_ns, size FROM file_fingerprints").fetchall()
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+
+    def _save_fingerprints(self, fingerprints: Dict[str, Fingerprint]) -> None:
+        """Replace the stored fingerprints with those of the files now known to be indexed."""
+        with self.connection:
+            self.connection.execute("DELETE FROM file_fingerprints")
+            self.connection.executemany(
+                "INSERT INTO file_fingerprints (path, mtime_ns, size) VALUES (?, ?, ?)",
+                [(path, mtime_ns, size) for path, (mtime_ns, size) in fingerprints.items()],
+            )
+
+    def _in_grace_period(self, fingerprint: Fingerprint, now: float) -> bool:
+        """Return whether a file was modified too recently to be touched."""
+        return now - fingerprint[0] / 1e9 < self.grace_period
+
+    def _quarantine(self, image_path: str) -> None:
+        """Move a file out of the image directory, keeping its name when possible."""
+        self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        target = self.quarantine_dir / os.path.basename(image_path)
+        if target.exists():
+            target = self.quarantine_dir / f"{uuid.uuid4().hex[:8]}_{target.name}"
+        shutil.move(image_path, str(target))
+
+    def _fix_orphan(self, image_path: str, report: ScanReport) -> bool:
+        """Re-index or quarantine an orphaned file; return whether it is now indexed."""
+        if self.orphan_action == "requeue":
+            try:
+                self.uploader.index_file(image_path)
+                report.requeued += 1
+                CONSISTENCY_FIXES.inc(action="requeue")
+                return True
+            except ValueError as e:
+                # A file that cannot be processed would fail on every scan
+                print(f"Quarantining {image_path}: {e}")
+        try:
+            self._quarantine(image_path)
+            report.quarantined += 1
+            CONSISTENCY_FIXES.inc(action="quarantine")
+        except OSError as e:
+            print(f"Failed to quarantine {image_path}: {e}")
+            report.failures += 1
+        return False
+
+    def scan(self, dry_run: bool = False) -> ScanReport:
+        """Run one reconciliation pass.
+
+        Args:
+            dry_run: Only count inconsistencies, without fixing anything or updating fingerprints.
+
+        Returns:
+            ScanReport: Counts of what was found and fixed.
+
+        Raises:
+            RuntimeError: If the collection, the side index or the image directory cannot be read.
+        """
+        start = time.perf_counter()
+        report = ScanReport()
+        try:
+            # List IDs before files: an upload finishing in between then shows up as a
+            # recent orphan (skipped by the grace period), never as a dangling vector
+            collection_ids = set(self.db_manager.all_ids())
+            index_ids = set(self.db_manager.metadata_index.all_ids())
+            files = self._list_files()
+            previous = self._load_fingerprints()
+        except Exception as e:
+            raise RuntimeError(f"Consistency scan failed: {e}")
+
+        now = time.time()
+        report.files = len(files)
+        indexed: Dict[str, Fingerprint] = {}
+        orphans: List[str] = []
+        modified: List[str] = []
+        for image_path, fingerprint in files.items():
+            if image_path not in collection_ids:
+                orphans.append(image_path)
+            elif image_path in previous and previous[image_path] != fingerprint:
+                modified.append(image_path)
+            else:
+                report.unchanged += 1
+                indexed[image_path] = fingerprint
+        dangling = [
+            image_id for image_id in collection_ids
+            if image_id not in files and os.path.dirname(image_id) == self.image_dir
+        ]
+        report.orphans = len(orphans)
+        report.modified = len(modified)
+
+        if dry_run:
+            report.dangling_removed = len(dangling)
+            report.index_repaired = len(collection_ids - index_ids - set(dangling))
+            report.index_pruned = len(index_ids - collection_ids)
+            report.duration_seconds = time.perf_counter() - start
+            return report
+
+        # Re-check existence so a file restored since the listing keeps its vector
+        dangling = [image_id for image_id in dangling if not os.path.exists(image_id)]
+        try:
+            self.db_manager.delete_images(dangling)
+            report.dangling_removed = len(dangling)
+            CONSISTENCY_FIXES.inc(len(dangling), action="remove_dangling")
+        except ValueError as e:
+            print(f"Failed to remove dangling vectors: {e}")
+            report.failures += len(dangling)
+
+        try:
+            stale = list(index_ids - collection_ids)
+            self.db_manager.metadata_index.delete(stale)
+            report.index_pruned = len(stale)
+            missing = list(collection_ids - index_ids - set(dangling))
+            report.index_repaired = self.db_manager.index_metadata(missing)
+            CONSISTENCY_FIXES.inc(report.index_pruned + report.index_repaired, action="repair_index")
+        except (ValueError, RuntimeError) as e:
+            print(f"Failed to repair the metadata index: {e}")
+            report.failures += 1
+
+        for image_path in orphans:
+            if self._in_grace_period(files[image_path], now):
+                report.orphans_pending += 1
+            elif self._fix_orphan(image_path, report):
+                indexed[image_path] = files[image_path]
+
+        for image_path in modified:
+            if self._in_grace_period(files[image_path], now):
+                # Keep the old fingerprint so the change is picked up by a later scan
+                indexed[image_path] = previous[image_path]
+                continue
+            try:
+                self.uploader.index_file(image_path)
+                report.reindexed += 1
+                CONSISTENCY_FIXES.inc(action="reindex")
+                indexed[image_path] = files[image_path]
+            except ValueError as e:
+                print(f"Failed to re-index {image_path}: {e}")
+                report.failures += 1
+                indexed[image_path] = previous[image_path]
+
+        self._save_fingerprints(indexed)
+        report.duration_seconds = time.perf_counter() - start
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconcile the image directory with the vector database.")
+    parser.add_argument("--dry-run", action="store_true", help="only report inconsistencies")
+    parser.add_argument(
+        "--orphan-action", choices=ORPHAN_ACTIONS, default=CONSISTENCY_ORPHAN_ACTION,
+        help="re-index files missing from the collection, or move them to the quarantine directory",
+    )
+    parser.add_argument(
+        "--grace-period", type=float, default=CONSISTENCY_GRACE_PERIOD,
+        help="skip files modified less than this many seconds ago",
+    )
+    args = parser.parse_args()
+
+    scanner = ConsistencyScanner(grace_period=args.grace_period, orphan_action=args.orphan_action)
+    for name, value in scanner.scan(dry_run=args.dry_run).as_dict().items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from os.path import basename
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+from conversational_photo_gallery.config import IMAGE_DIR, THUMBNAIL_DIR, THUMBNAIL_SIZE
+from conversational_photo_gallery.services.metrics import record_cache
+
+
+# Hex characters of the SHA-256 digest used in media URLs
+DIGEST_LENGTH = 16
+
+
+@lru_cache(maxsize=65536)
+def _file_digest(image_path: str, mtime_ns: int, size: int) -> str:
+    """Hash a file's content; cached per (path, mtime, size) so unchanged files are hashed once."""
+    sha256 = hashlib.sha256()
+    with open(image_path, "rb") as image_file:
+        for chunk in iter(lambda: image_file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:DIGEST_LENGTH]
+
+
+class ContentStore:
+    """Builds content-addressed URLs for stored images and serves their thumbnails."""
+
+    def __init__(
+        self, image_dir: str = str(IMAGE_DIR), thumbnail_dir: str = str(THUMBNAIL_DIR)
+    ) -> None:
+        """Initialize ContentStore with the image and thumbnail directories.
+
+        Args:
+            image_dir: Directory holding the original images.
+            thumbnail_dir: Directory where generated thumbnails are cached.
+        """
+        self.image_dir = Path(image_dir)
+        self.thumbnail_dir = Path(thumbnail_dir)
+
+    def digest(self, image_path: str, metadata: Optional[Dict[str, str]] = None) -> str:
+        """Return the content hash of an image.
+
+        Args:
+            image_path: Path to the image file.
+            metadata: Stored metadata; its 'content_hash' is used when present (optional).
+
+        Returns:
+            str: Truncated hex SHA-256 of the file content.
+
+        Raises:
+            FileNotFoundError: If the image file does not exist.
+        """
+        if metadata and metadata.get("content_hash"):
+            return metadata["content_hash"]
+        stat = os.stat(image_path)
+        hits = _file_digest.cache_info().hits
+        digest = _file_digest(str(image_path), stat.st_mtime_ns, stat.st_size)
+        record_cache("content_digest", _file_digest.cache_info().hits > hits)
+        return digest
+
+    def url_for(
+        self, image_path: str, metadata: Optional[Dict[str, str]] = None, thumbnail: bool = False
+    ) -> str:
+        """Return the cacheable URL of an image or its thumbnail.
+
+        The filename stays the last path segment so clients can still derive
+        the gallery ID from the URL. Falls back to the plain /images URL when
+        the file is missing.
+
+        Args:
+            image_path: Path to the image file (its ChromaDB ID).
+            metadata: Stored metadata, used to skip re-hashing (optional).
+            thumbnail: Return the thumbnail URL instead of the original.
+
+        Returns:
+            str: URL of the form /media/<digest>/[thumb/]<filename>.
+        """
+        filename = basename(image_path)
+        try:
+            digest = self.digest(image_path, metadata)
+        except OSError:
+            return f"/images/{filename}"
+        return f"/media/{digest}/thumb/{filename}" if thumbnail else f"/media/{digest}/{filename}"
+
+    def resolve(self, filename: str) -> Path:
+        """Return the path of a stored original image.
+
+        Args:
+            filename: Image filename from the URL.
+
+        Returns:
+            Path: Location of the image in the image directory.
+
+        Raises:
+            FileNotFoundError: If the filename is invalid or the image does not exist.
+        """
+        image_path = self.image_dir / basename(filename)
+        if basename(filename) != filename or not image_path.is_file():
+            raise FileNotFoundError(f"Image not found: {filename}")
+        return image_path
+
+    def thumbnail(self, image_path: Path, digest: str) -> Path:
+        """Return the cached thumbnail of an image, generating it on first use.
+
+        Args:
+            image_path: Path to the original image.
+            digest: Content hash of the original, which names the thumbnail.
+
+        Returns:
+            Path: Location of the JPEG thumbnail.
+
+        Raises:
+            ValueError: If the thumbnail cannot be generated.
+        """
+        thumbnail_path = self.thumbnail_dir / f"{digest}.jpg"
+        cached = thumbnail_path.is_file()
+        record_cache("thumbnail", cached)
+        if cached:
+            return thumbnail_path
+        try:
+            with Image.open(image_path) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                image.thumbnail(THUMBNAIL_SIZE)
+                # Write under a temporary name so readers never see a partial file
+                temp_path = thumbnail_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+                image.save(temp_path, format="JPEG", quality=85, optimize=True)
+            os.replace(temp_path, thumbnail_path)
+            return thumbnail_path
+        except Exception as e:
+            raise ValueError(f"Failed to generate thumbnail for {image_path}: {e}")
@@ -1,33 +1,52 @@
+import os
 from typing import Dict, List, Optional
 
 import chromadb
 
 from conversational_photo_gallery.config import COLLECTION_NAME, DATABASE_PATH
+from conversational_photo_gallery.dependencies import get_metadata_index, get_tagger
+from conversational_photo_gallery.services.color_palette import dominant_color, format_palette
+from conversational_photo_gallery.services.image_processor import ImageProcessor
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+from conversational_photo_gallery.services.sharding import ShardedCollection
+from conversational_photo_gallery.services.zero_shot_tagger import ZeroShotTagger
 
 
 class DatabaseManager:
     """Handles interactions with ChromaDB for image storage."""
 
+    # Page size used when scanning the whole collection
+    SCAN_BATCH_SIZE = 1000
+
     def __init__(
         self,
         db_path: str = str(DATABASE_PATH),
         collection_name: str = COLLECTION_NAME,
+        metadata_index: Optional[MetadataIndex] = None,
     ) -> None:
         """Initialize the DatabaseManager with a ChromaDB client and collection.
 
         Args:
             db_path: Path to the ChromaDB storage directory.
-            collection_name: Name of the collection to use or create.
+            collection_name: Name of the (first shard) collection to use or create.
+            metadata_index: SQLite side index kept in sync with every write (optional).
 
         Raises:
-            RuntimeError: If ChromaDB client or collection initialization fails.
+            RuntimeError: If ChromaDB client or collection initialization fails, or SNAPSHOT_PATH
+                is set and no side index of its own is given (the app is a read-only replica).
         """
+        if os.getenv("SNAPSHOT_PATH") and metadata_index is None:
+            # The default side index is then the snapshot's; writing the (empty) local database through
+            # it would delete its rows
+            raise RuntimeError("Database writes are disabled while serving a snapshot (SNAPSHOT_PATH is set)")
         try:
             self.client = chromadb.PersistentClient(path=db_path)
-            self.collection = self.client.get_or_create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine"},
-            )
+            self.collection = ShardedCollection(db_path, collection_name, client=self.client)
+            self.metadata_index = metadata_index or get_metadata_index()
+            # Backfill the side index for collections created before it existed
+            if self.metadata_index.is_empty() and self.collection.count():
+                self.rebuild_metadata_index()
+                self.backfill_timestamps()
         except Exception as e:
             raise RuntimeError(f"Database initialization failed: {e}")
 
@@ -50,9 +69,29 @@ class DatabaseManager:
                 embeddings=[embedding],
                 metadatas=[metadata],
             )
+            self.metadata_index.upsert(image_path, metadata)
         except Exception as e:
             raise ValueError(f"Failed to add image {image_path}: {e}")
 
+    def add_images(
+        self, image_paths: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, str]]
+    ) -> None:
+        """Add several images in one ChromaDB write and one side index transaction.
+
+        Args:
+            image_paths: Paths to the image files, used as IDs.
+            embeddings: Embedding vectors, aligned with image_paths.
+            metadatas: Metadata dictionaries, aligned with image_paths.
+
+        Raises:
+            ValueError: If adding the images to ChromaDB fails.
+        """
+        try:
+            self.collection.add(ids=image_paths, embeddings=embeddings, metadatas=metadatas)
+            self.metadata_index.upsert_many(image_paths, metadatas)
+        except Exception as e:
+            raise ValueError(f"Failed to add {len(image_paths)} images: {e}")
+
     def get_metadata(self, image_path: str) -> Dict[str, str]:
         """Retrieve metadata for an image.
 
@@ -97,14 +136,304 @@ class DatabaseManager:
                     ids=[image_path],
                     metadatas=[current_metadata],
                 )
+                self.metadata_index.upsert(image_path, current_metadata)
             elif metadata is not None:
                 self.collection.update(
                     ids=[image_path],
                     metadatas=[metadata],
                 )
+                # ChromaDB merges partial updates, so index the stored result
+                self.metadata_index.upsert(image_path, self.get_metadata(image_path))
             else:
                 raise ValueError("Either metadata or user_tags must be provided")
         except ValueError as e:
             raise  # Re-raise ValueError from get_metadata or our check
         except Exception as e:
             raise ValueError(f"Failed to update metadata for {image_path}: {e}")
+
+    def pending_annotations(self) -> Dict[str, int]:
+        """Return the images whose Gemini annotation was deferred.
+
+        Returns:
+            Dict[str, int]: Failed annotation attempts so far, keyed by the paths of images
+            with annotation_status 'pending'.
+
+        Raises:
+            RuntimeError: If the query fails.
+        """
+        try:
+            page = self.collection.get(where={"annotation_status": "pending"}, include=["metadatas"])
+            return {
+                image_path: int(metadata.get("annotation_attempts", 0) or 0)
+                for image_path, metadata in zip(page["ids"], page["metadatas"])
+            }
+        except Exception as e:
+            raise RuntimeError(f"Pending annotation lookup failed: {e}")
+
+    def all_ids(self) -> List[str]:
+        """Return the ID of every image in the collection, without loading embeddings or metadata.
+
+        Returns:
+            List[str]: Image paths stored in the collection.
+
+        Raises:
+            RuntimeError: If reading the collection fails.
+        """
+        try:
+            image_ids: List[str] = []
+            while True:
+                page = self.collection.get(include=[], limit=self.SCAN_BATCH_SIZE, offset=len(image_ids))
+                if not page["ids"]:
+                    return image_ids
+                image_ids.extend(page["ids"])
+        except Exception as e:
+            raise RuntimeError(f"Listing collection IDs failed: {e}")
+
+    def delete_images(self, image_paths: List[str]) -> None:
+        """Remove images from the collection and the side index (image files are left untouched).
+
+        Args:
+            image_paths: Paths of the images, used as IDs.
+
+        Raises:
+            ValueError: If deleting from ChromaDB or the side index fails.
+        """
+        if not image_paths:
+            return
+        try:
+            for start in range(0, len(image_paths), self.SCAN_BATCH_SIZE):
+                self.collection.delete(ids=image_paths[start:start + self.SCAN_BATCH_SIZE])
+            self.metadata_index.delete(image_paths)
+        except Exception as e:
+            raise ValueError(f"Failed to delete images: {e}")
+
+    def index_metadata(self, image_paths: List[str]) -> int:
+        """Copy the stored metadata of some images into the side index.
+
+        Args:
+            image_paths: Paths of images present in the collection but missing from the index.
+
+        Returns:
+            int: Number of images indexed.
+
+        Raises:
+            RuntimeError: If reading the collection or writing the index fails.
+        """
+        indexed = 0
+        try:
+            for start in range(0, len(image_paths), self.SCAN_BATCH_SIZE):
+                page = self.collection.get(
+                    ids=image_paths[start:start + self.SCAN_BATCH_SIZE], include=["metadatas"]
+                )
+                self.metadata_index.upsert_many(page["ids"], page["metadatas"])
+                indexed += len(page["ids"])
+        except Exception as e:
+            raise RuntimeError(f"Metadata indexing failed: {e}")
+        return indexed
+
+    def rebuild_metadata_index(self) -> int:
+        """Rebuild the SQLite side index from the metadata stored in ChromaDB.
+
+        Returns:
+            int: Number of images indexed.
+
+        Raises:
+            RuntimeError: If reading the collection or writing the index fails.
+        """
+        try:
+            image_ids, metadatas = [], []
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["metadatas"], limit=self.SCAN_BATCH_SIZE, offset=offset
+                )
+                if not page["ids"]:
+                    break
+                image_ids.extend(page["ids"])
+                metadatas.extend(page["metadatas"])
+                offset += len(page["ids"])
+            self.metadata_index.rebuild(image_ids, metadatas)
+            return len(image_ids)
+        except Exception as e:
+            raise RuntimeError(f"Metadata index rebuild failed: {e}")
+
+    def backfill_timestamps(self) -> int:
+        """Store parsed capture timestamps for images indexed without one.
+
+        Timestamps come from the EXIF date, or the file modification time when
+        the EXIF date is missing. Images whose file no longer exists are skipped.
+
+        Returns:
+            int: Number of images updated.
+
+        Raises:
+            RuntimeError: If updating ChromaDB or the side index fails.
+        """
+        undated_ids = self.metadata_index.undated_ids()
+        updated = 0
+        try:
+            for start in range(0, len(undated_ids), self.SCAN_BATCH_SIZE):
+                timestamps = {}
+                for image_path in undated_ids[start:start + self.SCAN_BATCH_SIZE]:
+                    try:
+                        timestamps[image_path] = ImageProcessor.extract_timestamp(image_path)
+                    except FileNotFoundError:
+                        continue
+                if not timestamps:
+                    continue
+                # ChromaDB merges partial metadata, so only the new key is sent
+                self.collection.update(
+                    ids=list(timestamps),
+                    metadatas=[{"timestamp": ts} for ts in timestamps.values()],
+                )
+                self.metadata_index.set_timestamps(timestamps)
+                updated += len(timestamps)
+        except Exception as e:
+            raise RuntimeError(f"Timestamp backfill failed: {e}")
+        return updated
+
+    def backfill_palettes(self) -> int:
+        """Compute local colour palettes for images stored without one.
+
+        Their dominant colour is replaced too, so colours annotated by Gemini
+        as free text become COLOR_VOCABULARY entries. Images whose file no
+        longer exists are skipped.
+
+        Returns:
+            int: Number of images updated.
+
+        Raises:
+            RuntimeError: If updating ChromaDB or the side index fails.
+        """
+        missing = sorted(set(self.metadata_index.all_ids()) - self.metadata_index.palette_ids())
+        updated = 0
+        try:
+            for start in range(0, len(missing), self.SCAN_BATCH_SIZE):
+                palettes = {}
+                for image_path in missing[start:start + self.SCAN_BATCH_SIZE]:
+                    try:
+                        palettes[image_path] = ImageProcessor.extract_palette(image_path)
+                    except ValueError:
+                        continue
+                if not palettes:
+                    continue
+                # ChromaDB merges partial metadata, so only the colour keys are sent
+                self.collection.update(
+                    ids=list(palettes),
+                    metadatas=[
+                        {"palette": format_palette(palette), "dominant_color": dominant_color(palette)}
+                        for palette in palettes.values()
+                    ],
+                )
+                updated += self.index_metadata(list(palettes))
+        except Exception as e:
+            raise RuntimeError(f"Palette backfill failed: {e}")
+        return updated
+
+    def backfill_locations(self) -> int:
+        """Read EXIF GPS positions of images stored without a location.
+
+        Images without GPS data, or whose file no longer exists, are skipped
+        (and read again on the next run).
+
+        Returns:
+            int: Number of images updated.
+
+        Raises:
+            RuntimeError: If updating ChromaDB or the side index fails.
+        """
+        missing = sorted(set(self.metadata_index.all_ids()) - self.metadata_index.location_ids())
+        updated = 0
+        try:
+            for start in range(0, len(missing), self.SCAN_BATCH_SIZE):
+                locations = {}
+                for image_path in missing[start:start + self.SCAN_BATCH_SIZE]:
+                    location = ImageProcessor.extract_gps(image_path)
+                    if location:
+                        locations[image_path] = location
+                if not locations:
+                    continue
+                # ChromaDB merges partial metadata, so only the location keys are sent
+                self.collection.update(
+                    ids=list(locations),
+                    metadatas=[
+                        {"latitude": latitude, "longitude": longitude}
+                        for latitude, longitude in locations.values()
+                    ],
+                )
+                updated += self.index_metadata(list(locations))
+        except Exception as e:
+            raise RuntimeError(f"Location backfill failed: {e}")
+        return updated
+
+    def retag(self, tagger: ZeroShotTagger) -> int:
+        """Re-tag every image from its stored CLIP embedding, e.g. after the tag vocabulary changed.
+
+        Each page of embeddings is tagged with one matrix product; only images
+        whose tags changed are written back. User tags are left untouched.
+
+        Args:
+            tagger: The zero-shot tagger holding the current vocabulary.
+
+        Returns:
+            int: Number of images whose tags changed.
+
+        Raises:
+            RuntimeError: If reading or updating ChromaDB or the side index fails.
+        """
+        updated = 0
+        offset = 0
+        try:
+            while True:
+                page = self.collection.get(
+                    include=["embeddings", "metadatas"], limit=self.SCAN_BATCH_SIZE, offset=offset
+                )
+                if not len(page["ids"]):
+                    return updated
+                offset += len(page["ids"])
+                changed_ids, changed_metadatas = [], []
+                for image_id, metadata, tags in zip(
+                    page["ids"], page["metadatas"], tagger.tag_many(page["embeddings"])
+                ):
+                    joined = ",".join(tags)
+                    if (metadata or {}).get("tags", "") != joined:
+                        changed_ids.append(image_id)
+                        changed_metadatas.append({**(metadata or {}), "tags": joined})
+                if not changed_ids:
+                    continue
+                # ChromaDB merges partial metadata, so only the tags are sent
+                self.collection.update(
+                    ids=changed_ids, metadatas=[{"tags": metadata["tags"]} for metadata in changed_metadatas]
+                )
+                self.metadata_index.upsert_many(changed_ids, changed_metadatas)
+                updated += len(changed_ids)
+        except Exception as e:
+            raise RuntimeError(f"Re-tagging failed: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the image database.")
+    parser.add_argument("--rebuild-index", action="store_true", help="rebuild the SQLite metadata side index")
+    parser.add_argument("--backfill-timestamps", action="store_true", help="parse capture dates for existing images")
+    parser.add_argument("--rebuild-facets", action="store_true", help="recompute the tag and colour facet counts")
+    parser.add_argument("--backfill-palettes", action="store_true", help="compute colour palettes for existing images")
+    parser.add_argument("--backfill-locations", action="store_true", help="read GPS positions for existing images")
+    parser.add_argument("--retag", action="store_true", help="re-tag every image with the current tag vocabulary")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if args.rebuild_index:
+        print(f"Indexed {db_manager.rebuild_metadata_index()} images")
+    if args.backfill_timestamps:
+        print(f"Backfilled timestamps for {db_manager.backfill_timestamps()} images")
+    if args.backfill_palettes:
+        print(f"Computed palettes for {db_manager.backfill_palettes()} images")
+    if args.backfill_locations:
+        print(f"Read GPS positions for {db_manager.backfill_locations()} images")
+    if args.retag:
+        print(f"Re-tagged {db_manager.retag(get_tagger())} images")
+    if args.rebuild_facets:
+        db_manager.metadata_index.rebuild_facets()
+        print("Rebuilt facet counts")
@@ -1,4 +1,4 @@
-from conversational_photo_gallery.services.llm_service import LLMService
+from conversational_photo_gallery.services.llm_service import LLMService, LLMUnavailableError
 from conversational_photo_gallery.constants import PROMPT_TEMPLATES
 
 def retrieve_decision(query: str) -> bool:
@@ -11,6 +11,7 @@ def retrieve_decision(query: str) -> bool:
         bool: True if retrieval is needed, False if conversational response is sufficient.
 
     Raises:
+        LLMUnavailableError: If Gemini is unavailable.
         ValueError: If the LLM response is not 'yes' or 'no' or if an error occurs.
     """
     llm_service = LLMService()  # Instantiate the service
@@ -20,5 +21,7 @@ def retrieve_decision(query: str) -> bool:
         if decision not in ['yes', 'no']:
             raise ValueError(f"Unexpected LLM response: '{decision}'")
         return decision == 'yes'
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise ValueError(f"Error in retrieval decision: {str(e)}")
@@ -1,13 +1,90 @@
 import os
-from typing import List
+from typing import List, Optional
 
 import torch
 from PIL import Image
 from sentence_transformers import SentenceTransformer
 
+from conversational_photo_gallery.config import (
+    CLIP_INTER_OP_THREADS,
+    CLIP_INTRA_OP_THREADS,
+    CLIP_MODEL_NAME,
+    CLIP_PRECISION,
+    EMBEDDING_SOCKET_PATH,
+)
+from conversational_photo_gallery.services.embedding_server import EmbeddingClient
+
+# Supported CPU inference precisions
+CLIP_PRECISIONS = ("fp32", "int8")
+
+
+def clip_precision() -> str:
+    """Return the configured CPU inference precision (CLIP_PRECISION environment variable, else config).
+
+    Raises:
+        ValueError: If the precision is not one of CLIP_PRECISIONS.
+    """
+    precision = os.getenv("CLIP_PRECISION", CLIP_PRECISION).strip().lower()
+    if precision not in CLIP_PRECISIONS:
+        raise ValueError(f"Unknown CLIP precision {precision!r}, expected one of {', '.join(CLIP_PRECISIONS)}")
+    return precision
+
+
+def configure_cpu_threads(intra_op: int = CLIP_INTRA_OP_THREADS, inter_op: int = CLIP_INTER_OP_THREADS) -> None:
+    """Apply the PyTorch CPU thread settings; 0 keeps PyTorch's default."""
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0 and torch.get_num_interop_threads() != inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            # Only allowed before PyTorch has started its inter-op thread pool
+            print(f"Could not set {inter_op} inter-op threads: {e}")
+
+
+def quantize_int8(model: SentenceTransformer) -> SentenceTransformer:
+    """Apply dynamic int8 quantization to a CPU model, in place.
+
+    The weights of every linear layer (attention and MLP blocks of both CLIP
+    transformers and their output projections, nearly all of the compute)
+    are stored as int8 and activations are quantized per batch at run time.
+    The patch embedding convolution, layer norms and token embeddings stay
+    in fp32.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_clip_model(precision: Optional[str] = None, device: Optional[str] = None) -> SentenceTransformer:
+    """Load the CLIP model on the GPU if available, else on the CPU with the configured precision and threads.
+
+    Args:
+        precision: "fp32" or "int8" (optional, defaults to clip_precision()); only applies on the CPU.
+        device: "cuda" or "cpu" (optional, defaults to the GPU when one is available).
+
+    Returns:
+        SentenceTransformer: The CLIP model, ready to encode.
+
+    Raises:
+        ValueError: If the precision is unknown.
+    """
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    precision = precision or clip_precision()
+    if precision not in CLIP_PRECISIONS:
+        raise ValueError(f"Unknown CLIP precision {precision!r}, expected one of {', '.join(CLIP_PRECISIONS)}")
+    if device == "cpu":
+        configure_cpu_threads()
+    model = SentenceTransformer(CLIP_MODEL_NAME, device=device)
+    if device == "cpu" and precision == "int8":
+        model = quantize_int8(model.eval())
+    return model
+
 
 class EmbeddingGenerator:
-    """Handles generation of CLIP embeddings for text and images."""
+    """Handles generation of CLIP embeddings for text and images.
+
+    With EMBEDDING_BACKEND=server the model is not loaded in this process;
+    requests go to the shared embedding server instead.
+    """
     _instance = None  # Singleton instance
 
     def __new__(cls):
@@ -18,10 +95,14 @@ class EmbeddingGenerator:
         return cls._instance
 
     def _initialize(self) -> None:
-        """Initialize the EmbeddingGenerator with the CLIP model."""
+        """Initialize the EmbeddingGenerator with the CLIP model or an embedding server client."""
         try:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.clip_model = SentenceTransformer("clip-ViT-B-32", device=device)
+            if os.getenv("EMBEDDING_BACKEND", "local") == "server":
+                self.clip_model = None
+                self.client = EmbeddingClient(str(EMBEDDING_SOCKET_PATH))
+            else:
+                self.clip_model = load_clip_model()
+                self.client = None
         except Exception as e:
             raise RuntimeError(f"Failed to initialize EmbeddingGenerator: {e}")
 
@@ -42,10 +123,35 @@ class EmbeddingGenerator:
             raise ValueError("Text must be a non-empty string")
 
         try:
+            if self.client is not None:
+                return self.client.encode_texts([text])[0].tolist()
             return self.clip_model.encode(text).tolist()
         except Exception as e:
             raise ValueError(f"Failed to generate text embedding: {e}")
 
+    def generate_text_embeddings(self, texts: List[str], batch_size: int = 256) -> List[List[float]]:
+        """Generate CLIP embeddings for several texts in batched forward passes.
+
+        Args:
+            texts: The non-empty texts to encode.
+            batch_size: Number of texts encoded per forward pass.
+
+        Returns:
+            List[List[float]]: Embedding vectors, aligned with texts.
+
+        Raises:
+            ValueError: If a text is empty or encoding fails.
+        """
+        if not all(text and isinstance(text, str) for text in texts):
+            raise ValueError("Texts must be non-empty strings")
+
+        try:
+            if self.client is not None:
+                return self.client.encode_texts(texts).tolist()
+            return self.clip_model.encode(texts, batch_size=batch_size).tolist()
+        except Exception as e:
+            raise ValueError(f"Failed to generate embeddings for {len(texts)} texts: {e}")
+
     def generate_embedding(self, image_path: str) -> List[float]:
         """Generate a CLIP embedding for the image.
 
@@ -60,7 +166,73 @@ class EmbeddingGenerator:
             raise ValueError(f"Invalid image path: {image_path}")
 
         try:
+            if self.client is not None:
+                return self.client.encode_image_paths([image_path])[0].tolist()
             image = Image.open(image_path).convert("RGB")
             return self.clip_model.encode(image).tolist()
         except Exception as e:
             raise ValueError(f"Failed to generate embedding for {image_path}: {e}")
+
+    def generate_image_embedding(self, image: Image.Image) -> List[float]:
+        """Generate a CLIP embedding for an already decoded image.
+
+        Args:
+            image: The RGB image.
+
+        Returns:
+            List[float]: Embedding vector for the image.
+
+        Raises:
+            ValueError: If encoding fails.
+        """
+        try:
+            if self.client is not None:
+                return self.client.encode_images([image])[0].tolist()
+            return self.clip_model.encode(image).tolist()
+        except Exception as e:
+            raise ValueError(f"Failed to generate image embedding: {e}")
+
+    def generate_image_embeddings(self, images: List[Image.Image], batch_size: int = 32) -> List[List[float]]:
+        """Generate CLIP embeddings for several already decoded images in batched forward passes.
+
+        Args:
+            images: The RGB images.
+            batch_size: Number of images encoded per forward pass.
+
+        Returns:
+            List[List[float]]: Embedding vectors, aligned with images.
+
+        Raises:
+            ValueError: If encoding fails.
+        """
+        try:
+            if self.client is not None:
+                return self.client.encode_images(images).tolist()
+            return self.clip_model.encode(images, batch_size=batch_size).tolist()
+        except Exception as e:
+            raise ValueError(f"Failed to generate embeddings for {len(images)} images: {e}")
+
+    def generate_embeddings(self, image_paths: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Generate CLIP embeddings for several images in batched forward passes.
+
+        Args:
+            image_paths: Paths to the image files.
+            batch_size: Number of images encoded per forward pass.
+
+        Returns:
+            List[List[float]]: Embedding vectors, aligned with image_paths.
+
+        Raises:
+            ValueError: If a path is invalid or encoding fails.
+        """
+        for image_path in image_paths:
+            if not isinstance(image_path, str) or not os.path.isfile(image_path):
+                raise ValueError(f"Invalid image path: {image_path}")
+
+        try:
+            if self.client is not None:
+                return self.client.encode_image_paths(image_paths).tolist()
+            images = [Image.open(image_path).convert("RGB") for image_path in image_paths]
+            return self.clip_model.encode(images, batch_size=batch_size).tolist()
+        except Exception as e:
+            raise ValueError(f"Failed to generate embeddings for {len(image_paths)} images: {e}")
@@ -0,0 +1,326 @@
+"""Local CLIP inference server shared by all worker processes.
+
+One process loads the model and listens on a Unix socket. Concurrent text
+and image requests from any worker are collected into micro-batches: a batch
+is encoded as soon as it reaches `max_batch_size` inputs or `max_wait`
+seconds after its first request arrived, whichever comes first.
+
+Run it next to the app and start the workers with EMBEDDING_BACKEND=server:
+
+    python -m conversational_photo_gallery.services.embedding_server
+"""
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from conversational_photo_gallery.config import (
+    CLIP_IMAGE_SIZE,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_WAIT,
+    EMBEDDING_SOCKET_PATH,
+)
+
+# Frame header: JSON header length and binary payload length
+FRAME = struct.Struct("!II")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly `size` bytes from the socket."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("Embedding server connection closed")
+        received += count
+    return bytes(buffer)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b"") -> None:
+    """Send one frame: a JSON header followed by an optional binary payload."""
+    data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    sock.sendall(FRAME.pack(len(data), len(payload)) + data + payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    """Receive one frame sent by send_message."""
+    header_size, payload_size = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, header_size))
+    return header, _recv_exact(sock, payload_size) if payload_size else b""
+
+
+def pack_images(images: Sequence[Image.Image]) -> Tuple[List[List[int]], bytes]:
+    """Serialize decoded images as raw RGB pixels plus their (height, width) shapes."""
+    arrays = [np.asarray(image.convert("RGB"), dtype=np.uint8) for image in images]
+    return [list(array.shape[:2]) for array in arrays], b"".join(array.tobytes() for array in arrays)
+
+
+def downscale_for_clip(image: Image.Image, size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """Return the image with its shortest side reduced to `size` pixels (smaller images are returned as is).
+
+    CLIP resizes the shortest side to its input size anyway, so this keeps its
+    center crop while sending a fraction of the pixels.
+    """
+    scale = size / min(image.size)
+    if scale >= 1:
+        return image
+    return image.resize(
+        (max(round(image.width * scale), size), max(round(image.height * scale), size)), Image.BICUBIC
+    )
+
+
+def unpack_images(shapes: List[List[int]], payload: bytes) -> List[Image.Image]:
+    """Inverse of pack_images."""
+    images, offset = [], 0
+    for height, width in shapes:
+        size = height * width * 3
+        array = np.frombuffer(payload, dtype=np.uint8, count=size, offset=offset).reshape(height, width, 3)
+        images.append(Image.fromarray(array, "RGB"))
+        offset += size
+    return images
+
+
+class _Job:
+    """One encode request waiting for its micro-batch."""
+
+    def __init__(self, kind: str, inputs: List[Any]) -> None:
+        self.kind = kind
+        self.inputs = inputs
+        self.arrived = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[str] = None
+
+
+class EmbeddingServer:
+    """Serves CLIP encode requests over a Unix socket with dynamic micro-batching."""
+
+    def __init__(
+        self,
+        socket_path: str = str(EMBEDDING_SOCKET_PATH),
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait: float = EMBEDDING_MAX_WAIT,
+        model: Any = None,
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            socket_path: Path of the Unix socket to listen on.
+            max_batch_size: Maximum number of inputs encoded in one forward pass.
+            max_wait: Seconds a request may wait for others to join its batch.
+            model: SentenceTransformer-compatible model (optional, defaults to the CLIP model).
+        """
+        if model is None:
+            # Imported here because embedding_generator imports this module for the client
+            from conversational_photo_gallery.services.embedding_generator import load_clip_model
+
+            model = load_clip_model()
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.model = model
+        self.jobs: "queue.Queue[_Job]" = queue.Queue()
+        self.stats = {"requests": 0, "inputs": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+
+    def serve_forever(self) -> None:
+        """Listen on the socket and serve clients until interrupted."""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(128)
+        threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True).start()
+        print(f"Embedding server listening on {self.socket_path}")
+        try:
+            while True:
+                connection, _ = server.accept()
+                threading.Thread(target=self._serve_client, args=(connection,), daemon=True).start()
+        finally:
+            server.close()
+            os.remove(self.socket_path)
+
+    def _serve_client(self, connection: socket.socket) -> None:
+        """Answer requests on one client connection until it closes."""
+        with connection:
+            while True:
+                try:
+                    header, payload = recv_message(connection)
+                except (ConnectionError, OSError):
+                    return
+                try:
+                    job = self._job_for(header, payload)
+                except Exception as e:
+                    send_message(connection, {"ok": False, "error": str(e)})
+                    continue
+                if job is None:
+                    with self._stats_lock:
+                        send_message(connection, {"ok": True, "stats": dict(self.stats)})
+                    continue
+
+                self.jobs.put(job)
+                job.done.wait()
+                if job.error is not None:
+                    send_message(connection, {"ok": False, "error": job.error})
+                else:
+                    result = np.ascontiguousarray(job.result, dtype=np.float32)
+                    send_message(connection, {"ok": True, "shape": list(result.shape)}, result.tobytes())
+
+    @staticmethod
+    def _job_for(header: Dict[str, Any], payload: bytes) -> Optional[_Job]:
+        """Decode a request into a job (None for a stats request). Images are decoded here, in parallel."""
+        kind = header.get("kind")
+        if kind == "stats":
+            return None
+        if kind == "text":
+            return _Job("text", list(header["texts"]))
+        if kind == "image":
+            if "paths" in header:
+                images = []
+                for path in header["paths"]:
+                    with Image.open(path) as image:
+                        images.append(image.convert("RGB"))
+                return _Job("image", images)
+            return _Job("image", unpack_images(header["shapes"], payload))
+        raise ValueError(f"Unknown request kind: {kind}")
+
+    def _batch_loop(self) -> None:
+        """Collect queued jobs into micro-batches and encode them."""
+        while True:
+            batch = [self.jobs.get()]
+            deadline = batch[0].arrived + self.max_wait
+            size = len(batch[0].inputs)
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.jobs.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(job)
+                size += len(job.inputs)
+            for kind in ("text", "image"):
+                self._encode([job for job in batch if job.kind == kind])
+
+    def _encode(self, jobs: List[_Job]) -> None:
+        """Encode the inputs of several jobs in one forward pass and hand back each job's rows."""
+        if not jobs:
+            return
+        inputs = [item for job in jobs for item in job.inputs]
+        try:
+            embeddings = self.model.encode(inputs, batch_size=self.max_batch_size, convert_to_numpy=True)
+        except Exception as e:
+            for job in jobs:
+                job.error = f"Encoding failed: {e}"
+                job.done.set()
+            return
+        offset = 0
+        for job in jobs:
+            job.result = embeddings[offset:offset + len(job.inputs)]
+            offset += len(job.inputs)
+            job.done.set()
+        with self._stats_lock:
+            self.stats["requests"] += len(jobs)
+            self.stats["inputs"] += len(inputs)
+            self.stats["batches"] += 1
+
+
+class EmbeddingClient:
+    """Client of the embedding server; each thread keeps its own connection."""
+
+    def __init__(self, socket_path: str = str(EMBEDDING_SOCKET_PATH), timeout: float = 60.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        """Return this thread's connection, opening it if needed."""
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        """Close and forget this thread's connection."""
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _request(self, header: Dict[str, Any], payload: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        """Send a request, reconnecting once if the connection went stale.
+
+        Raises:
+            ConnectionError: If the server cannot be reached or does not answer in time.
+            RuntimeError: If the server reports an error.
+        """
+        for attempt in range(2):
+            sent = False
+            try:
+                sock = self._connection()
+                send_message(sock, header, payload)
+                sent = True
+                response, data = recv_message(sock)
+                break
+            except OSError as e:
+                self._close()
+                # A stale connection fails with a connection error and is retried once; after a timeout
+                # the server may still be encoding the request, so it is not sent again
+                stale = isinstance(e, ConnectionError) or not sent
+                if attempt or isinstance(e, socket.timeout) or not stale:
+                    raise ConnectionError(f"Embedding server unavailable at {self.socket_path}: {e}")
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Embedding server error"))
+        return response, data
+
+    def _encode(self, header: Dict[str, Any], payload: bytes = b"") -> np.ndarray:
+        """Send an encode request and return the embeddings as a float32 array."""
+        response, data = self._request(header, payload)
+        return np.frombuffer(data, dtype=np.float32).reshape(response["shape"])
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts; returns a (len(texts), dim) array."""
+        return self._encode({"kind": "text", "texts": texts})
+
+    def encode_image_paths(self, image_paths: List[str]) -> np.ndarray:
+        """Encode image files (decoded by the server); returns a (len(image_paths), dim) array."""
+        return self._encode({"kind": "image", "paths": [os.path.abspath(path) for path in image_paths]})
+
+    def encode_images(self, images: Sequence[Image.Image]) -> np.ndarray:
+        """Encode already decoded images; returns a (len(images), dim) array."""
+        shapes, payload = pack_images([downscale_for_clip(image) for image in images])
+        return self._encode({"kind": "image", "shapes": shapes}, payload)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the server's request, input and batch counters."""
+        response, _ = self._request({"kind": "stats"})
+        return response["stats"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the shared CLIP embedding server.")
+    parser.add_argument("--socket", default=str(EMBEDDING_SOCKET_PATH), help="Unix socket path")
+    parser.add_argument("--max-batch-size", type=int, default=EMBEDDING_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBEDDING_MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    EmbeddingServer(args.socket, args.max_batch_size, args.max_wait_ms / 1000).serve_forever()
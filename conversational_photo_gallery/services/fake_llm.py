@@ -0,0 +1,98 @@
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Union
+
+
+# Canned answers keyed by a phrase that identifies each prompt in constants.py / image_processor.py
+CANNED_RESPONSES = {
+    "requires retrieving and displaying images": "yes",
+    "select the most relevant images": "1,2,3",
+    "description": (
+        "A chocolate birthday cake with lit candles sits on a wooden table. "
+        "Warm indoor lighting highlights the glossy frosting."
+    ),
+}
+
+
+class FakeLLMError(RuntimeError):
+    """Simulated transient Gemini failure."""
+
+
+class FakeResponse:
+    """Mimics the `.text` attribute of a Gemini response."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel with canned answers and injectable faults.
+
+    Select it with LLM_BACKEND=fake, or pass an instance to LLMService(model=...).
+    Latency, slow-tail responses and failures can be injected to exercise
+    timeouts, hedging, retries and the circuit breaker without network access.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        seed: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the fake model.
+
+        Args:
+            model_name: Ignored; kept for signature compatibility with genai.GenerativeModel.
+            latency: Seconds every call sleeps before answering.
+            failure_rate: Probability that a call raises FakeLLMError.
+            slow_rate: Probability that a call takes slow_latency instead of latency.
+            slow_latency: Latency of the slow tail, in seconds.
+            seed: Seed for the fault injection.
+        """
+        self.model_name = model_name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents: Union[str, List[Any]], **kwargs: Any) -> FakeResponse:
+        """Answer a prompt locally, after the configured latency and fault injection."""
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+            slow = self._random.random() < self.slow_rate
+        delay = self.slow_latency if slow else self.latency
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeLLMError("Simulated Gemini failure")
+        return FakeResponse(self.answer(contents))
+
+    @staticmethod
+    def answer(contents: Union[str, List[Any]]) -> str:
+        """Return the canned answer for a prompt."""
+        if isinstance(contents, str):
+            contents = [contents]
+        prompt = " ".join(part for part in contents if isinstance(part, str))
+        if "JSON array" in prompt:
+            # Batched annotation: one object per image part
+            count = sum(1 for part in contents if not isinstance(part, str))
+            return json.dumps([FakeGenerativeModel._annotation(index) for index in range(count)])
+        for phrase, answer in CANNED_RESPONSES.items():
+            if phrase in prompt:
+                return answer
+        return "Here is what I found in your gallery."
+
+    @staticmethod
+    def _annotation(index: int) -> Dict[str, Any]:
+        """Canned batched annotation for one image."""
+        return {"index": index, "description": CANNED_RESPONSES["description"]}
@@ -1,10 +1,12 @@
 import shutil
+import tempfile
 import uuid
 from pathlib import Path
 
 from fastapi import UploadFile
+from PIL import Image, ImageOps
 
-from conversational_photo_gallery.config import IMAGE_DIR
+from conversational_photo_gallery.config import CHAT_IMAGE_SPILL_DIR, CHAT_IMAGE_SPILL_THRESHOLD, IMAGE_DIR
 
 
 class FileManager:
@@ -34,3 +36,31 @@ class FileManager:
         with open(image_path, "wb") as buffer:
             shutil.copyfileobj(upload_file.file, buffer)
         return str(image_path)
+
+    @staticmethod
+    def read_image(upload_file: UploadFile) -> Image.Image:
+        """Decode an uploaded image in memory without storing it in the gallery.
+
+        Uploads up to CHAT_IMAGE_SPILL_THRESHOLD bytes stay in memory; larger ones
+        spill to an anonymous temporary file in CHAT_IMAGE_SPILL_DIR, which is
+        removed as soon as the image is decoded (or the process dies).
+
+        Args:
+            upload_file (UploadFile): The image file to read.
+
+        Returns:
+            Image.Image: The decoded, EXIF-oriented RGB image.
+
+        Raises:
+            ValueError: If the upload is not a readable image.
+        """
+        try:
+            with tempfile.SpooledTemporaryFile(
+                max_size=CHAT_IMAGE_SPILL_THRESHOLD, dir=str(CHAT_IMAGE_SPILL_DIR)
+            ) as buffer:
+                shutil.copyfileobj(upload_file.file, buffer)
+                buffer.seek(0)
+                with Image.open(buffer) as image:
+                    return ImageOps.exif_transpose(image).convert("RGB")
+        except Exception as e:
+            raise ValueError(f"Failed to read image {upload_file.filename}: {e}")
@@ -0,0 +1,123 @@
+"""Geohash encoding and bounding-box helpers for the location index.
+
+Image coordinates are stored in the metadata index with their geohash, so
+all photos in a geohash cell share a key prefix and a bounding box becomes
+a few key ranges over an indexed column. covering_cells picks the finest
+geohash precision at which the box is covered by at most GEO_MAX_CELLS
+cells; the exact coordinates are then checked on the few candidates those
+cells hold.
+"""
+import math
+from typing import List, Optional, Tuple
+
+from conversational_photo_gallery.config import GEO_MAX_CELLS, GEOHASH_PRECISION
+
+# Geohash alphabet (no a, i, l, o)
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Mean Earth radius used for distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# (south, west, north, east) in degrees
+BoundingBox = Tuple[float, float, float, float]
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Return the geohash of a point with the given number of characters."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude (even) and latitude (odd), starting with longitude
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Return the (latitude, longitude) extent in degrees of a geohash cell."""
+    total_bits = 5 * precision
+    return 180.0 / 2 ** (total_bits // 2), 360.0 / 2 ** ((total_bits + 1) // 2)
+
+
+def valid_coordinates(latitude: float, longitude: float) -> bool:
+    """Return True for a finite latitude in [-90, 90] and longitude in [-180, 180]."""
+    return (
+        math.isfinite(latitude) and math.isfinite(longitude)
+        and -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+    )
+
+
+def split_antimeridian(box: BoundingBox) -> List[BoundingBox]:
+    """Split a box whose west edge is east of its east edge (it crosses longitude 180) in two."""
+    south, west, north, east = box
+    if west <= east:
+        return [box]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def covering_cells(box: BoundingBox, max_cells: int = GEO_MAX_CELLS) -> List[str]:
+    """Return geohash prefixes whose cells together cover a box (which must not cross longitude 180).
+
+    The finest precision (up to GEOHASH_PRECISION) needing at most max_cells
+    cells is used; an empty prefix stands for the whole world.
+    """
+    south, west, north, east = box
+    best: List[str] = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_size, lon_size = cell_size(precision)
+        lat_cells = range(int((south + 90) // lat_size), int(min(north + 90, 180 - 1e-9) // lat_size) + 1)
+        lon_cells = range(int((west + 180) // lon_size), int(min(east + 180, 360 - 1e-9) // lon_size) + 1)
+        if len(lat_cells) * len(lon_cells) > max_cells:
+            break
+        best = [
+            encode(-90 + (i + 0.5) * lat_size, -180 + (j + 0.5) * lon_size, precision)
+            for i in lat_cells
+            for j in lon_cells
+        ]
+    return best
+
+
+def box_around(latitude: float, longitude: float, radius_km: float) -> BoundingBox:
+    """Return a box containing every point within radius_km of a point (west > east across longitude 180)."""
+    lat_delta = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    cos_latitude = math.cos(math.radians(max(abs(south), abs(north))))
+    if cos_latitude <= 1e-9 or radius_km / (KM_PER_DEGREE * cos_latitude) >= 180:
+        # The circle reaches a pole or spans every longitude
+        return south, -180.0, north, 180.0
+    lon_delta = radius_km / (KM_PER_DEGREE * cos_latitude)
+    west = (longitude - lon_delta + 180) % 360 - 180
+    east = (longitude + lon_delta + 180) % 360 - 180
+    return south, west, north, east
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_coordinates(value: str) -> Optional[Tuple[float, float]]:
+    """Parse 'latitude,longitude' (e.g. '48.8584, 2.2945'); None if malformed or out of range."""
+    latitude, _, longitude = (value or "").partition(",")
+    try:
+        point = float(latitude), float(longitude)
+    except ValueError:
+        return None
+    return point if valid_coordinates(*point) else None
@@ -0,0 +1,176 @@
+"""Decoding and EXIF parsing of image files, run by the ingest pipeline's decode worker processes.
+
+The decode workers are started with 'spawn', so they import this module from
+scratch: it must not import anything that loads CLIP, torch or the Gemini
+client. It only depends on PIL, numpy (through color_palette), config and
+the small color_palette, content_store, geo and metadata_index modules.
+"""
+import io
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from conversational_photo_gallery.config import ANNOTATION_IMAGE_SIZE, INGEST_EMBED_IMAGE_SIZE
+from conversational_photo_gallery.services.color_palette import extract_palette
+from conversational_photo_gallery.services.content_store import ContentStore
+from conversational_photo_gallery.services.geo import valid_coordinates
+from conversational_photo_gallery.services.metadata_index import parse_exif_date
+
+# EXIF tag IDs: pointer from IFD0 to the Exif sub-IFD, capture time, file change time
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATE_TIME_ORIGINAL = 0x9003
+EXIF_DATE_TIME = 0x0132
+
+# GPS IFD pointer and the tags of the GPS IFD holding latitude and longitude (as degrees, minutes, seconds)
+EXIF_GPS_IFD_POINTER = 0x8825
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+
+def _gps_degrees(value: Any, reference: Any) -> float:
+    """Convert an EXIF (degrees, minutes, seconds) triple and its N/S/E/W reference to signed degrees."""
+    degrees, minutes, seconds = (float(part) for part in value)
+    if isinstance(reference, bytes):
+        reference = reference.decode("ascii", "ignore")
+    sign = -1.0 if str(reference).strip("\x00 ").upper() in ("S", "W") else 1.0
+    return sign * (degrees + minutes / 60 + seconds / 3600)
+
+
+def encode_jpeg(image: Image.Image, max_size: int = ANNOTATION_IMAGE_SIZE) -> bytes:
+    """Encode a copy of the image as JPEG with its longest side at most max_size pixels.
+
+    Args:
+        image: The image to encode (left unchanged).
+        max_size: Maximum width and height of the copy.
+
+    Returns:
+        bytes: JPEG-encoded image data.
+    """
+    image = image.convert("RGB")
+    image.thumbnail((max_size, max_size))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def extract_exif_data(image_path: str) -> Optional[str]:
+    """Extract date from image EXIF data.
+
+    Args:
+        image_path: Path to the image file.
+
+    Returns:
+        Optional[str]: Date string from EXIF data, or None if not found.
+
+    Raises:
+        ValueError: If image loading fails.
+        FileNotFoundError: if the image file is not found.
+        PIL.UnidentifiedImageError: if the image format is not recognized.
+    """
+    try:
+        image = Image.open(image_path)
+        exif = image.getexif()
+        date = None
+
+        if exif:
+            # DateTimeOriginal lives in the Exif sub-IFD; IFD0 only has DateTime
+            exif_ifd = exif.get_ifd(EXIF_IFD_POINTER)
+            date = (
+                exif_ifd.get(EXIF_DATE_TIME_ORIGINAL)
+                or exif.get(EXIF_DATE_TIME_ORIGINAL)
+                or exif.get(EXIF_DATE_TIME)
+            )
+            if date:
+                date = str(date).strip("\x00 ")
+
+        return date
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {image_path}")
+    except Image.UnidentifiedImageError:
+        raise Image.UnidentifiedImageError(f"Unidentified image file: {image_path}")
+    except Exception as e:
+        raise ValueError(f"Failed to extract EXIF data from {image_path}: {e}")
+
+
+def extract_gps(image_path: str) -> Optional[Tuple[float, float]]:
+    """Extract the GPS position from the image's EXIF GPS IFD.
+
+    Args:
+        image_path: Path to the image file.
+
+    Returns:
+        Optional[Tuple[float, float]]: (latitude, longitude) in degrees, or None if the
+        image has no usable GPS data.
+    """
+    try:
+        with Image.open(image_path) as image:
+            gps = image.getexif().get_ifd(EXIF_GPS_IFD_POINTER)
+        if not gps or GPS_LATITUDE not in gps or GPS_LONGITUDE not in gps:
+            return None
+        latitude = _gps_degrees(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF, "N"))
+        longitude = _gps_degrees(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF, "E"))
+    except Exception:
+        return None
+    # Cameras without a fix often write 0/0; no one photographs that spot in the Gulf of Guinea
+    if (latitude, longitude) == (0.0, 0.0) or not valid_coordinates(latitude, longitude):
+        return None
+    return latitude, longitude
+
+
+def extract_timestamp(image_path: str) -> float:
+    """Return the capture time of an image as an epoch timestamp.
+
+    Uses the EXIF date when it can be parsed and falls back to the file's
+    modification time otherwise.
+
+    Args:
+        image_path: Path to the image file.
+
+    Returns:
+        float: Seconds since the epoch (local time, like EXIF dates).
+
+    Raises:
+        FileNotFoundError: if the image file is not found.
+    """
+    try:
+        timestamp = parse_exif_date(extract_exif_data(image_path) or "")
+    except (ValueError, Image.UnidentifiedImageError):
+        timestamp = None
+    if timestamp is None:
+        try:
+            timestamp = os.path.getmtime(image_path)
+        except OSError:
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+    return timestamp
+
+
+def preprocess_image(image_path: str) -> Dict[str, Any]:
+    """Decode an image once and derive everything the later stages need (runs in a worker process).
+
+    Args:
+        image_path: Path to the saved image file.
+
+    Returns:
+        Dict[str, Any]: 'clip_image' (RGB copy downscaled to INGEST_EMBED_IMAGE_SIZE),
+        'preview' (JPEG bytes for Gemini), 'palette', 'date', 'timestamp', 'location' and
+        'content_hash'.
+
+    Raises:
+        ValueError: If the image cannot be decoded.
+    """
+    try:
+        with Image.open(image_path) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+        preview = encode_jpeg(image, ANNOTATION_IMAGE_SIZE)
+        image.thumbnail((INGEST_EMBED_IMAGE_SIZE, INGEST_EMBED_IMAGE_SIZE))
+        return {
+            "clip_image": image,
+            "preview": preview,
+            "palette": extract_palette(image),
+            "date": extract_exif_data(image_path) or "",
+            "timestamp": extract_timestamp(image_path),
+            "location": extract_gps(image_path),
+            "content_hash": ContentStore().digest(image_path),
+        }
+    except Exception as e:
+        raise ValueError(f"Failed to decode {image_path}: {e}")
@@ -1,21 +1,71 @@
-from typing import List, Optional
+import json
+from typing import Any, Dict, List, Optional
 
-from PIL import Image, ExifTags
+from PIL import Image, ImageOps
 
-from conversational_photo_gallery.services.llm_service import LLMService
+from conversational_photo_gallery.config import ANNOTATION_BATCH_SIZE, ANNOTATION_IMAGE_SIZE, COLOR_SAMPLE_SIZE
+from conversational_photo_gallery.constants import PROMPT_TEMPLATES
+from conversational_photo_gallery.dependencies import get_embeddings_generator, get_tagger
+from conversational_photo_gallery.services.color_palette import dominant_color, extract_palette
+from conversational_photo_gallery.services.image_preprocess import (
+    encode_jpeg,
+    extract_exif_data,
+    extract_gps,
+    extract_timestamp,
+)
+from conversational_photo_gallery.services.llm_service import LLMService, LLMUnavailableError
+
+
+def parse_batch_annotations(response: str, count: int) -> Dict[int, Dict[str, Any]]:
+    """Parse and validate a batched annotation response.
+
+    Items that are malformed, duplicated or out of range are dropped so the
+    caller can retry just those images.
+
+    Args:
+        response: Raw model output, expected to be a JSON array (optionally in a code fence).
+        count: Number of images in the batch.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: Valid annotations keyed by image index.
+    """
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("["):] if "[" in text else text
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    annotations: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index, description = item.get("index"), item.get("description")
+        if (
+            not isinstance(index, int) or not 0 <= index < count or index in annotations
+            or not isinstance(description, str) or not description.strip()
+        ):
+            continue
+        annotations[index] = {"description": description.strip()}
+    return annotations
 
 
 class ImageProcessor:
     """Processes images to generate metadata and descriptions."""
 
     def __init__(self) -> None:
-        """Initialize ImageProcessor with YOLO and LLM dependencies.
+        """Initialize ImageProcessor with the LLM service and the local tagger.
 
         Raises:
             RuntimeError: If model initialization fails.
         """
         try:
             self.llm_service = LLMService()
+            self.tagger = get_tagger()
         except Exception as e:
             raise RuntimeError(f"Failed to initialize ImageProcessor: {e}")
 
@@ -39,71 +89,173 @@ class ImageProcessor:
         )
         return self.llm_service.generate_image_response(image_path, prompt)
 
-    def generate_tags(self, image_path: str) -> List[str]:
-        """Generate tags directly from the image using the Gemini model.
+    def generate_tags(self, image_path: str, embedding: Optional[List[float]] = None) -> List[str]:
+        """Tag the image locally from its CLIP embedding (see services/zero_shot_tagger.py).
 
         Args:
             image_path: Path to the image file.
+            embedding: CLIP embedding of the image (optional, computed from the file if missing).
 
         Returns:
-            List[str]: List of tags extracted from the image.
+            List[str]: TAG_VOCABULARY entries matching the image, most similar first.
 
         Raises:
             ValueError: If tag generation fails.
         """
-        prompt = (
-            "Generate a comma-separated list of relevant tags for this image, "
-            "focusing on activities, objects and scenes."
-        )
-        response = self.llm_service.generate_image_response(image_path, prompt)
-        return [tag.strip() for tag in response.split(",")]
+        if embedding is None:
+            embedding = get_embeddings_generator().generate_embedding(image_path)
+        return self.tagger.tag(embedding)
 
     def detect_dominant_color(self, image_path: str) -> str:
-        """Detect the dominant color in the image using the Gemini model.
+        """Detect the dominant color in the image locally from its colour palette.
 
         Args:
             image_path: Path to the image file.
 
         Returns:
-            str: Name of the dominant color (e.g., 'red').
+            str: Name of the dominant color (a COLOR_VOCABULARY entry, e.g., 'red').
 
         Raises:
-            ValueError: If color detection fails.
+            ValueError: If the image cannot be read.
         """
-        prompt = (
-            "Identify the dominant color in this image and return only the color name "
-            "(e.g., 'red', 'blue') without additional text."
+        return dominant_color(self.extract_palette(image_path))
+
+    @staticmethod
+    def extract_palette(image_path: str) -> Dict[str, float]:
+        """Compute the colour palette of an image file (see services/color_palette.py).
+
+        Args:
+            image_path: Path to the image file.
+
+        Returns:
+            Dict[str, float]: Share of the image covered by each vocabulary colour, largest first.
+
+        Raises:
+            ValueError: If the image cannot be read.
+        """
+        try:
+            with Image.open(image_path) as image:
+                # JPEGs are decoded at reduced scale, since only a tiny copy is analysed
+                image.draft("RGB", (COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+                return extract_palette(image)
+        except Exception as e:
+            raise ValueError(f"Failed to extract colours from {image_path}: {e}")
+
+    def annotate_image(self, image_path: str) -> Dict[str, Any]:
+        """Generate the Gemini annotation of one image.
+
+        Tags are not part of it; they are assigned locally from the CLIP embedding.
+
+        Args:
+            image_path: Path to the image file.
+
+        Returns:
+            Dict[str, Any]: 'description' of the image.
+
+        Raises:
+            LLMUnavailableError: If Gemini is unavailable.
+            ValueError: If the Gemini call fails.
+        """
+        return {"description": self.generate_description(image_path)}
+
+    def annotate_images(
+        self, image_paths: List[str], previews: Optional[Dict[str, bytes]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Annotate several images, packing up to ANNOTATION_BATCH_SIZE into each Gemini call.
+
+        A single pending image uses the per-image prompts. Images missing from a
+        batched response are retried in smaller batches, down to single images.
+
+        Args:
+            image_paths: Paths to the image files.
+            previews: Already downscaled JPEG copies keyed by image path (optional, others
+                are downscaled from disk).
+
+        Returns:
+            Dict[str, Optional[Dict[str, Any]]]: Annotations keyed by image path. Images
+            left unannotated because Gemini became unavailable map to None; images
+            that could not be annotated at all are left out.
+        """
+        annotations: Dict[str, Optional[Dict[str, Any]]] = {}
+        for start in range(0, len(image_paths), ANNOTATION_BATCH_SIZE):
+            try:
+                self._annotate_batch(image_paths[start:start + ANNOTATION_BATCH_SIZE], annotations, previews)
+            except LLMUnavailableError:
+                for image_path in image_paths[start:]:
+                    annotations.setdefault(image_path, None)
+                break
+        return annotations
+
+    def _annotate_batch(
+        self,
+        image_paths: List[str],
+        annotations: Dict[str, Optional[Dict[str, Any]]],
+        previews: Optional[Dict[str, bytes]] = None,
+    ) -> None:
+        """Annotate one batch into `annotations`, splitting and retrying on bad output.
+
+        Raises:
+            LLMUnavailableError: If Gemini is unavailable.
+        """
+        if len(image_paths) == 1:
+            try:
+                annotations[image_paths[0]] = self.annotate_image(image_paths[0])
+            except LLMUnavailableError:
+                raise
+            except ValueError:
+                pass
+            return
+
+        prompt = PROMPT_TEMPLATES["BATCH_ANNOTATION_PROMPT"].format(
+            count=len(image_paths), last=len(image_paths) - 1
         )
-        return self.llm_service.generate_image_response(image_path, prompt)
+        try:
+            images = [
+                previews[image_path] if previews and image_path in previews else self.downscale_image(image_path)
+                for image_path in image_paths
+            ]
+            response = self.llm_service.generate_batch_image_response(images, prompt)
+            parsed = parse_batch_annotations(response, len(image_paths))
+        except LLMUnavailableError:
+            raise
+        except ValueError:
+            parsed = {}
 
-    def extract_exif_data(self, image_path: str) -> Optional[str]:
-        """Extract date from image EXIF data.
+        for index, annotation in parsed.items():
+            annotations[image_paths[index]] = annotation
+        missing = [image_path for index, image_path in enumerate(image_paths) if index not in parsed]
+        if not missing:
+            return
+        if len(missing) < len(image_paths):
+            self._annotate_batch(missing, annotations, previews)
+        else:
+            # Nothing usable came back: split the batch in half and retry each part
+            middle = len(image_paths) // 2
+            self._annotate_batch(image_paths[:middle], annotations, previews)
+            self._annotate_batch(image_paths[middle:], annotations, previews)
+
+    @staticmethod
+    def downscale_image(image_path: str, max_size: int = ANNOTATION_IMAGE_SIZE) -> bytes:
+        """Return a JPEG copy of the image whose longest side is at most max_size pixels.
 
         Args:
             image_path: Path to the image file.
+            max_size: Maximum width and height of the copy.
 
         Returns:
-            Optional[str]: Date string from EXIF data, or None if not found.
+            bytes: JPEG-encoded image data.
 
         Raises:
-            ValueError: If image loading fails.
-            FileNotFoundError: if the image file is not found.
-            PIL.UnidentifiedImageError: if the image format is not recognized.
+            ValueError: If the image cannot be read.
         """
         try:
-            image = Image.open(image_path)
-            exif = image.getexif()
-            date = None
-
-            if exif:
-                date_tag = ExifTags.TAGS.get("DateTimeOriginal")
-                if date_tag and date_tag in exif:
-                    date = exif[date_tag]
-
-            return date
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-        except Image.UnidentifiedImageError:
-            raise Image.UnidentifiedImageError(f"Unidentified image file: {image_path}")
+            with Image.open(image_path) as image:
+                return ImageProcessor.encode_jpeg(ImageOps.exif_transpose(image), max_size)
         except Exception as e:
-            raise ValueError(f"Failed to extract EXIF data from {image_path}: {e}")
+            raise ValueError(f"Failed to downscale {image_path}: {e}")
+
+    # Decoding helpers live in image_preprocess, which the decode worker processes import without the models
+    encode_jpeg = staticmethod(encode_jpeg)
+    extract_exif_data = staticmethod(extract_exif_data)
+    extract_gps = staticmethod(extract_gps)
+    extract_timestamp = staticmethod(extract_timestamp)
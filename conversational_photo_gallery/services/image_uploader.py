@@ -1,57 +1,135 @@
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import UploadFile
 
+from conversational_photo_gallery.config import ANNOTATION_MAX_ATTEMPTS
 from conversational_photo_gallery.dependencies import get_embeddings_generator
+from conversational_photo_gallery.services.color_palette import dominant_color, format_palette
+from conversational_photo_gallery.services.content_store import ContentStore
 from conversational_photo_gallery.services.database_manager import DatabaseManager
 from conversational_photo_gallery.services.file_manager import FileManager
 from conversational_photo_gallery.services.image_processor import ImageProcessor
+from conversational_photo_gallery.services.ingest_pipeline import IngestPipeline
+from conversational_photo_gallery.services.llm_service import LLMUnavailableError
+from conversational_photo_gallery.services.metrics import timed_stage
 
 
 class ImageUploader:
     """Coordinates the upload and processing of images."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        db_manager: Optional[DatabaseManager] = None,
+        file_manager: Optional[FileManager] = None,
+    ) -> None:
         """Initialize ImageUploader with required managers and processors.
 
+        Args:
+            db_manager: Database manager to write to (optional, defaults to the configured database).
+            file_manager: File manager to save uploads with (optional, defaults to IMAGE_DIR).
+
         Raises:
             RuntimeError: If initialization of dependencies fails.
         """
         try:
-            self.db_manager = DatabaseManager()
+            self.db_manager = db_manager or DatabaseManager()
             self.image_processor = ImageProcessor()
             self.embedding_generator = get_embeddings_generator()
-            self.file_manager = FileManager()
+            self.file_manager = file_manager or FileManager()
+            self.content_store = ContentStore()
+            self.last_ingest_stats: Dict[str, Dict[str, Any]] = {}
         except Exception as e:
             raise RuntimeError(f"Failed to initialize ImageUploader: {e}")
 
-    def _process_image(self, image_path: str) -> Tuple[List[float], Dict[str, str]]:
+    @staticmethod
+    def compose_metadata(
+        date: str,
+        timestamp: float,
+        content_hash: str,
+        palette: Dict[str, float],
+        tags: List[str],
+        annotation: Optional[Dict[str, Any]],
+        location: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        """Build the stored metadata of an image from its local metadata and Gemini annotation.
+
+        Args:
+            date: EXIF date string ('' if missing).
+            timestamp: Capture time as an epoch timestamp.
+            content_hash: Truncated SHA-256 of the file content.
+            palette: Share of the image covered by each vocabulary colour.
+            tags: Vocabulary tags assigned by the local zero-shot tagger.
+            annotation: 'description' of the image, or None when annotation
+                is deferred because Gemini is unavailable.
+            location: (latitude, longitude) from the EXIF GPS data, or None if the image has none.
+
+        Returns:
+            Dict[str, Any]: Metadata dictionary to store in ChromaDB.
+        """
+        metadata = {
+            "description": annotation["description"] if annotation else "",
+            "tags": ",".join(tags),
+            "date": date if date else "",
+            "timestamp": timestamp,
+            "user_tags": "",
+            "dominant_color": dominant_color(palette),
+            "palette": format_palette(palette),
+            "content_hash": content_hash,
+            "annotation_status": "done" if annotation else "pending",
+        }
+        if location:
+            # ChromaDB metadata cannot hold None, so images without GPS data simply lack the fields
+            metadata["latitude"], metadata["longitude"] = location
+        return metadata
+
+    def _build_metadata(
+        self, image_path: str, tags: List[str], annotation: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Combine a Gemini annotation with the locally extracted metadata of an image.
+
+        Args:
+            image_path: Path to the image file.
+            tags: Vocabulary tags assigned by the local zero-shot tagger.
+            annotation: 'description' of the image, or None when annotation
+                is deferred because Gemini is unavailable.
+
+        Returns:
+            Dict[str, Any]: Metadata dictionary to store in ChromaDB.
+        """
+        with timed_stage("upload", "exif"):
+            date = self.image_processor.extract_exif_data(image_path)
+            timestamp = self.image_processor.extract_timestamp(image_path)
+            location = self.image_processor.extract_gps(image_path)
+        with timed_stage("upload", "content_hash"):
+            content_hash = self.content_store.digest(image_path)
+        with timed_stage("upload", "palette"):
+            palette = self.image_processor.extract_palette(image_path)
+        return self.compose_metadata(date, timestamp, content_hash, palette, tags, annotation, location)
+
+    def _process_image(self, image_path: str) -> Tuple[List[float], Dict[str, Any]]:
         """Process a single image and return embedding and metadata.
 
         Args:
             image_path: Path to the image file to process.
 
         Returns:
-            Tuple[List[float], Dict[str, str]]: Embedding vector and metadata dictionary.
+            Tuple[List[float], Dict[str, Any]]: Embedding vector and metadata dictionary.
 
         Raises:
             ValueError: If image processing fails.
         """
         try:
-            embedding = self.embedding_generator.generate_embedding(image_path)
-            description = self.image_processor.generate_description(image_path)
-            tags = self.image_processor.generate_tags(image_path)
-            date = self.image_processor.extract_exif_data(image_path)
-            dominant_color = self.image_processor.detect_dominant_color(image_path)
-
-            metadata = {
-                "description": description,
-                "tags": ",".join(tags),
-                "date": date if date else "",
-                "user_tags": "",
-                "dominant_color": dominant_color,
-            }
-            return embedding, metadata
+            with timed_stage("upload", "embed"):
+                embedding = self.embedding_generator.generate_embedding(image_path)
+            with timed_stage("upload", "tag"):
+                tags = self.image_processor.generate_tags(image_path, embedding)
+            try:
+                with timed_stage("upload", "annotate"):
+                    annotation = self.image_processor.annotate_image(image_path)
+            except LLMUnavailableError:
+                # Store the image now and annotate it once Gemini is back
+                annotation = None
+            return embedding, self._build_metadata(image_path, tags, annotation)
         except Exception as e:
             raise ValueError(f"Error processing image {image_path}: {str(e)}")
 
@@ -65,8 +143,97 @@ class ImageUploader:
             ValueError: If file saving or image processing fails.
         """
         try:
-            image_path = self.file_manager.save_image(upload_file)
+            with timed_stage("upload", "save"):
+                image_path = self.file_manager.save_image(upload_file)
             embedding, metadata = self._process_image(image_path)
-            self.db_manager.add_image(image_path, embedding, metadata)
+            with timed_stage("upload", "db_write"):
+                self.db_manager.add_image(image_path, embedding, metadata)
         except Exception as e:
             raise ValueError(f"Failed to upload image {upload_file.filename}: {str(e)}")
+
+    def index_file(self, image_path: str) -> None:
+        """Process an image already stored on disk and (re)place it in the collection.
+
+        Used by the consistency scanner for files left unindexed by a failed
+        upload and for indexed files whose content changed; user tags of an
+        existing entry are kept.
+
+        Args:
+            image_path: Path to the image file.
+
+        Raises:
+            ValueError: If image processing or the database write fails.
+        """
+        embedding, metadata = self._process_image(image_path)
+        try:
+            existing = self.db_manager.get_metadata(image_path)
+            if existing:
+                metadata["user_tags"] = existing.get("user_tags", "")
+                self.db_manager.delete_images([image_path])
+            self.db_manager.add_image(image_path, embedding, metadata)
+        except Exception as e:
+            raise ValueError(f"Failed to index image {image_path}: {e}")
+
+    def upload_many(self, upload_files: List[UploadFile]) -> List[str]:
+        """Process and upload several images through the staged ingest pipeline.
+
+        Saving, decoding, CLIP embedding (batched), Gemini annotation (several
+        images per call) and database writes (bulk) run concurrently in their
+        own worker pools; see IngestPipeline. Per-stage throughput of the run
+        is kept in `last_ingest_stats`.
+
+        Args:
+            upload_files: The image files to upload.
+
+        Returns:
+            List[str]: One error message per image that could not be uploaded.
+        """
+        if len(upload_files) == 1:
+            try:
+                self.upload(upload_files[0])
+                return []
+            except ValueError as e:
+                return [str(e)]
+
+        pipeline = IngestPipeline(self)
+        errors = pipeline.run(upload_files)
+        self.last_ingest_stats = pipeline.stage_stats()
+        return errors
+
+    def annotate_pending(self, max_attempts: int = ANNOTATION_MAX_ATTEMPTS) -> int:
+        """Annotate images stored while Gemini was unavailable.
+
+        Images Gemini answers for but cannot annotate (e.g., malformed output)
+        count an attempt; after max_attempts they are marked 'failed' and no
+        longer retried. Attempts cut short by Gemini being unavailable do not count.
+
+        Args:
+            max_attempts: Failed attempts after which an image is given up on.
+
+        Returns:
+            int: Number of images annotated.
+
+        Raises:
+            RuntimeError: If reading or updating the database fails.
+        """
+        if not self.image_processor.llm_service.available:
+            return 0
+        try:
+            pending = self.db_manager.pending_annotations()
+            annotations = self.image_processor.annotate_images(list(pending))
+            annotated = 0
+            for image_path, attempts in pending.items():
+                if image_path in annotations:
+                    annotation = annotations[image_path]
+                    if annotation is None:
+                        continue
+                    update = {"description": annotation["description"], "annotation_status": "done"}
+                    annotated += 1
+                else:
+                    update = {"annotation_attempts": attempts + 1}
+                    if attempts + 1 >= max_attempts:
+                        update["annotation_status"] = "failed"
+                self.db_manager.update_metadata(image_path, metadata=update)
+            return annotated
+        except Exception as e:
+            raise RuntimeError(f"Deferred annotation failed: {e}")
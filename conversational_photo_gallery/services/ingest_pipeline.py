@@ -0,0 +1,351 @@
+"""Staged ingest pipeline for multi-image uploads.
+
+Each image flows through five stages connected by bounded queues:
+
+    save -> decode -> embed -> annotate -> write
+
+Every stage has its own workers, so disk I/O, CPU-bound decoding, CLIP
+inference and network-bound Gemini calls overlap instead of running one
+after the other. A full queue blocks the stage feeding it, which keeps
+memory bounded when one stage is slower than the others.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from conversational_photo_gallery.config import (
+    ANNOTATION_BATCH_SIZE,
+    INGEST_ANNOTATE_WORKERS,
+    INGEST_BATCH_WAIT,
+    INGEST_DECODE_WORKERS,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+    INGEST_SAVE_WORKERS,
+    INGEST_WRITE_BATCH_SIZE,
+)
+from conversational_photo_gallery.services.image_preprocess import preprocess_image
+from conversational_photo_gallery.services.metrics import timed_stage
+
+if TYPE_CHECKING:
+    from conversational_photo_gallery.services.image_uploader import ImageUploader
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+_decode_pool: Optional[Executor] = None
+_decode_pool_lock = threading.Lock()
+
+
+def _get_decode_pool() -> Executor:
+    """Return the process-wide decode pool (a thread pool when INGEST_DECODE_WORKERS is 0)."""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            if INGEST_DECODE_WORKERS > 0:
+                # Forking the multithreaded server (uvicorn, torch and executor threads) can deadlock
+                # the children, so workers start fresh; preprocess_image lives in image_preprocess,
+                # which does not import the models, so a new worker loads in well under a second
+                _decode_pool = ProcessPoolExecutor(
+                    max_workers=INGEST_DECODE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _decode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-decode")
+        return _decode_pool
+
+
+@dataclass
+class IngestItem:
+    """One image moving through the pipeline."""
+
+    filename: str
+    upload_file: Optional[UploadFile] = None
+    image_path: str = ""
+    local: Dict[str, Any] = field(default_factory=dict)
+    embedding: Optional[List[float]] = None
+    tags: List[str] = field(default_factory=list)
+    annotation: Optional[Dict[str, Any]] = None
+
+
+class StageStats:
+    """Throughput counters of one pipeline stage."""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, items: int, failed: int, start: float, end: float, queue_depth: int) -> None:
+        """Add one processed batch."""
+        with self._lock:
+            self.items += items
+            self.failed += failed
+            self.batches += 1
+            self.busy_seconds += end - start
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self.first_start = start if self.first_start is None else min(self.first_start, start)
+            self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters plus throughput (items per second while active) and utilization."""
+        active = (self.last_end - self.first_start) if self.batches else 0.0
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "failed": self.failed,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "items_per_second": round(self.items / active, 2) if active > 0 else None,
+            "utilization": round(self.busy_seconds / (active * self.workers), 3) if active > 0 else None,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class IngestPipeline:
+    """Runs uploads through save, decode, embed, annotate and write stages concurrently."""
+
+    def __init__(
+        self,
+        uploader: "ImageUploader",
+        save_workers: int = INGEST_SAVE_WORKERS,
+        decode_workers: int = max(1, INGEST_DECODE_WORKERS),
+        embed_batch_size: int = INGEST_EMBED_BATCH_SIZE,
+        annotate_workers: int = INGEST_ANNOTATE_WORKERS,
+        annotate_batch_size: int = ANNOTATION_BATCH_SIZE,
+        write_batch_size: int = INGEST_WRITE_BATCH_SIZE,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        batch_wait: float = INGEST_BATCH_WAIT,
+    ) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            uploader: Uploader providing the file manager, models and database manager.
+            save_workers: Threads writing uploads to IMAGE_DIR.
+            decode_workers: Images decoded concurrently in the decode process pool.
+            embed_batch_size: Maximum images per CLIP forward pass.
+            annotate_workers: Concurrent Gemini requests.
+            annotate_batch_size: Maximum images per Gemini request.
+            write_batch_size: Maximum images per database write.
+            queue_size: Capacity of each queue between stages.
+            batch_wait: Seconds a batching stage waits for more items before running a partial batch.
+        """
+        self.uploader = uploader
+        self.queue_size = queue_size
+        self.batch_wait = batch_wait
+        # (name, workers, batch size, handler) in pipeline order
+        self.stages = [
+            ("save", save_workers, 1, self._save),
+            ("decode", decode_workers, 1, self._decode),
+            ("embed", 1, embed_batch_size, self._embed),
+            ("annotate", annotate_workers, annotate_batch_size, self._annotate),
+            ("write", 1, write_batch_size, self._write),
+        ]
+        self.stats: Dict[str, StageStats] = {}
+        self.errors: List[str] = []
+        self._errors_lock = threading.Lock()
+
+    def run(self, upload_files: List[UploadFile]) -> List[str]:
+        """Ingest the uploads and wait until every image is stored or has failed.
+
+        Args:
+            upload_files: The image files to upload.
+
+        Returns:
+            List[str]: One error message per image that could not be uploaded.
+        """
+        self.stats = {name: StageStats(name, workers) for name, workers, _, _ in self.stages}
+        self.errors = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        stage_threads = []
+        for index, (name, workers, batch_size, handler) in enumerate(self.stages):
+            threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(name, queues[index], queues[index + 1], batch_size, handler),
+                    name=f"ingest-{name}-{i}",
+                    daemon=True,
+                )
+                for i in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            stage_threads.append(threads)
+
+        # The last queue has no consumer, so drain it in the background
+        finished = threading.Thread(target=self._drain, args=(queues[-1],), daemon=True)
+        finished.start()
+
+        for upload_file in upload_files:
+            queues[0].put(IngestItem(filename=upload_file.filename, upload_file=upload_file))
+        queues[0].put(_DONE)
+        # Once every worker of a stage has stopped, nothing more can reach the next queue
+        for index, threads in enumerate(stage_threads):
+            for thread in threads:
+                thread.join()
+            queues[index + 1].put(_DONE)
+        finished.join()
+        return self.errors
+
+    def stage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage throughput of the last run."""
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def _fail(self, item: IngestItem, error: Any) -> None:
+        """Record an image that could not be uploaded."""
+        with self._errors_lock:
+            self.errors.append(f"Failed to upload image {item.filename}: {error}")
+
+    def _take(self, inbox: "queue.Queue", batch_size: int) -> List[Any]:
+        """Block for one item, then collect up to batch_size within batch_wait seconds.
+
+        The end marker is put back for the other workers of the stage and
+        ends the batch.
+        """
+        batch = [inbox.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while batch[-1] is not _DONE and len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(inbox.get(timeout=remaining) if remaining > 0 else inbox.get_nowait())
+            except queue.Empty:
+                break
+        if batch[-1] is _DONE:
+            inbox.put(_DONE)
+            batch.pop()
+        return batch
+
+    def _worker(
+        self,
+        name: str,
+        inbox: "queue.Queue",
+        outbox: "queue.Queue",
+        batch_size: int,
+        handler: Callable[[List[IngestItem]], List[IngestItem]],
+    ) -> None:
+        """Process batches from inbox until the end marker, passing successful items on."""
+        stats = self.stats[name]
+        while True:
+            depth = inbox.qsize()
+            batch = self._take(inbox, batch_size)
+            if not batch:
+                return
+            start = time.perf_counter()
+            try:
+                with timed_stage("ingest", name):
+                    passed = handler(batch)
+            except Exception as e:
+                for item in batch:
+                    self._fail(item, e)
+                passed = []
+            end = time.perf_counter()
+            stats.record(len(batch), len(batch) - len(passed), start, end, depth)
+            for item in passed:
+                outbox.put(item)
+
+    @staticmethod
+    def _drain(inbox: "queue.Queue") -> None:
+        """Consume the output of the last stage until the end marker."""
+        while inbox.get() is not _DONE:
+            pass
+
+    # Stage handlers: each takes a batch and returns the items that succeeded
+
+    def _save(self, batch: List[IngestItem]) -> List[IngestItem]:
+        for item in batch:
+            item.image_path = self.uploader.file_manager.save_image(item.upload_file)
+            item.upload_file = None
+        return batch
+
+    def _decode(self, batch: List[IngestItem]) -> List[IngestItem]:
+        pool = _get_decode_pool()
+        futures = [pool.submit(preprocess_image, item.image_path) for item in batch]
+        passed = []
+        for item, future in zip(batch, futures):
+            try:
+                item.local = future.result()
+                passed.append(item)
+            except Exception as e:
+                self._fail(item, e)
+        return passed
+
+    def _embed(self, batch: List[IngestItem]) -> List[IngestItem]:
+        generator = self.uploader.embedding_generator
+        images = [item.local.pop("clip_image") for item in batch]
+        try:
+            embeddings = generator.generate_image_embeddings(images, batch_size=len(images))
+        except ValueError:
+            # Fall back to one image at a time so a single bad image does not fail the batch
+            embeddings = []
+            for image in images:
+                try:
+                    embeddings.append(generator.generate_image_embedding(image))
+                except ValueError:
+                    embeddings.append(None)
+        passed = []
+        for item, embedding in zip(batch, embeddings):
+            if embedding is None:
+                self._fail(item, "embedding failed")
+                continue
+            item.embedding = embedding
+            passed.append(item)
+        if passed:
+            # Tag the whole batch with one product against the vocabulary matrix
+            tags = self.uploader.image_processor.tagger.tag_many([item.embedding for item in passed])
+            for item, item_tags in zip(passed, tags):
+                item.tags = item_tags
+        return passed
+
+    def _annotate(self, batch: List[IngestItem]) -> List[IngestItem]:
+        previews = {item.image_path: item.local.pop("preview") for item in batch}
+        annotations = self.uploader.image_processor.annotate_images(list(previews), previews=previews)
+        passed = []
+        for item in batch:
+            if item.image_path not in annotations:
+                self._fail(item, "annotation failed")
+                continue
+            # None means Gemini is unavailable: store the image now and annotate it later
+            item.annotation = annotations[item.image_path]
+            passed.append(item)
+        return passed
+
+    def _write(self, batch: List[IngestItem]) -> List[IngestItem]:
+        metadatas = [
+            self.uploader.compose_metadata(
+                item.local["date"],
+                item.local["timestamp"],
+                item.local["content_hash"],
+                item.local["palette"],
+                item.tags,
+                item.annotation,
+                item.local["location"],
+            )
+            for item in batch
+        ]
+        try:
+            self.uploader.db_manager.add_images(
+                [item.image_path for item in batch], [item.embedding for item in batch], metadatas
+            )
+            return batch
+        except ValueError:
+            # Retry one by one so only the failing images are reported
+            passed = []
+            for item, metadata in zip(batch, metadatas):
+                try:
+                    self.uploader.db_manager.add_image(item.image_path, item.embedding, metadata)
+                    passed.append(item)
+                except ValueError as e:
+                    self._fail(item, e)
+            return passed
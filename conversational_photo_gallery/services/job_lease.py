@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+import time
+
+from conversational_photo_gallery.config import JOB_LEASE_PATH
+
+
+class JobLeases:
+    """Named leases in a local SQLite file, so only one of the worker processes runs each background job.
+
+    A lease is held by an owner until it expires; the owner can renew it at any
+    time, any other owner only once it has expired, so the worker that runs a
+    job keeps running it and another one takes over if it stops.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS job_leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: str = str(JOB_LEASE_PATH)) -> None:
+        """Open (and create if needed) the lease database.
+
+        Args:
+            path: Path to the SQLite database file.
+
+        Raises:
+            RuntimeError: If the database cannot be opened.
+        """
+        try:
+            self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(self.SCHEMA)
+            self._db_lock = threading.Lock()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Job lease store initialization failed: {e}")
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease of a job for `ttl` seconds; return whether `owner` now holds it."""
+        now = time.time()
+        with self._db_lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO job_leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE job_leases.owner = excluded.owner OR job_leases.expires_at < ?",
+                (name, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str) -> None:
+        """Give back a lease taken by `owner`."""
+        with self._db_lock, self.connection:
+            self.connection.execute("DELETE FROM job_leases WHERE name = ? AND owner = ?", (name, owner))
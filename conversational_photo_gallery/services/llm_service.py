@@ -1,25 +1,123 @@
 import os
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 import google.generativeai as genai
 from dotenv import load_dotenv
+from google.api_core import exceptions as google_exceptions
+
+from conversational_photo_gallery.config import (
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_TIMEOUT,
+    LLM_HEDGE_DELAY,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_ATTEMPTS,
+    LLM_TIMEOUT,
+)
+from conversational_photo_gallery.services.fake_llm import FakeGenerativeModel
+from conversational_photo_gallery.services.metrics import LLM_PROMPT_SIZE, LLM_RESPONSE_SIZE, timed_stage
+from conversational_photo_gallery.services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+class LLMUnavailableError(ValueError):
+    """Raised when Gemini cannot be reached (circuit open, timeouts or repeated transient errors)."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Return whether a failed Gemini call is worth retrying.
+
+    Client errors such as a bad request or a missing permission will fail
+    again, except rate limiting. ValueError covers responses blocked by the
+    safety filters.
+    """
+    if isinstance(error, google_exceptions.TooManyRequests):
+        return True
+    return not isinstance(error, (google_exceptions.ClientError, ValueError))
+
+
+# Shared by every LLMService so the circuit reflects the health of Gemini, not of one instance
+GEMINI_CALLER = ResilientCaller(
+    CircuitBreaker("gemini", LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_TIMEOUT),
+    timeout=LLM_TIMEOUT,
+    max_attempts=LLM_MAX_ATTEMPTS,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    hedge_delay=LLM_HEDGE_DELAY,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+    retryable=is_retryable,
+)
 
 
 class LLMService:
     """Manages configuration and response generation for the Gemini LLM."""
 
-    def __init__(self) -> None:
+    def __init__(self, model: Optional[Any] = None, caller: Optional[ResilientCaller] = None) -> None:
         """Initialize the LLMService with Gemini model configuration.
 
+        Set LLM_BACKEND=fake to use the offline fake model instead of Gemini, or
+        GEMINI_API_ENDPOINT (e.g., http://127.0.0.1:8765) to send Gemini REST calls to
+        another server such as the load-test stub in benchmarks/gemini_stub.py.
+
+        Args:
+            model: Model with a genai.GenerativeModel-compatible generate_content (optional).
+            caller: Retry/hedging/circuit-breaker policy (optional, defaults to the shared Gemini policy).
+
         Raises:
             ValueError: If GEMINI_API_KEY is missing in the environment.
         """
         load_dotenv()
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY is missing in .env file.")
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash-exp")
+        self.caller = caller or GEMINI_CALLER
+        if model is not None:
+            self.model = model
+        elif os.getenv("LLM_BACKEND", "gemini") == "fake":
+            self.model = FakeGenerativeModel(
+                latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+                failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+            )
+        elif os.getenv("GEMINI_API_ENDPOINT"):
+            # The stub ignores the key, so a placeholder is enough
+            self.api_key = os.getenv("GEMINI_API_KEY") or "local-endpoint"
+            genai.configure(
+                api_key=self.api_key,
+                transport="rest",
+                client_options={"api_endpoint": os.getenv("GEMINI_API_ENDPOINT")},
+            )
+            self.model = genai.GenerativeModel("gemini-2.0-flash-exp")
+        else:
+            self.api_key = os.getenv("GEMINI_API_KEY")
+            if not self.api_key:
+                raise ValueError("GEMINI_API_KEY is missing in .env file.")
+            genai.configure(api_key=self.api_key)
+            self.model = genai.GenerativeModel("gemini-2.0-flash-exp")
+
+    @property
+    def available(self) -> bool:
+        """Whether calls are currently let through (the circuit is not open)."""
+        return self.caller.breaker.state != CircuitBreaker.OPEN
+
+    def _generate(self, call: str, contents: Any, **kwargs: Any) -> str:
+        """Call generate_content under the resilience policy and return the stripped text.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open or every attempt failed transiently.
+            Exception: The model's error if it is not retryable.
+        """
+        try:
+            with timed_stage("llm", call):
+                text = self.caller.call(
+                    lambda: self.model.generate_content(contents, **kwargs).text, name=call
+                ).strip()
+        except CircuitOpenError as e:
+            raise LLMUnavailableError(f"Gemini is unavailable: {e}")
+        except Exception as e:
+            if is_retryable(e):
+                raise LLMUnavailableError(f"Gemini is unavailable: {e}")
+            raise
+        LLM_RESPONSE_SIZE.observe(len(text), call=call)
+        return text
 
     def generate_response(
         self, prompt: Union[str, List[Union[str, Dict[str, str]]]]
@@ -34,11 +132,17 @@ class LLMService:
             str: The generated response text.
 
         Raises:
+            LLMUnavailableError: If Gemini is unavailable.
             ValueError: If the LLM fails to generate a response.
         """
+        LLM_PROMPT_SIZE.observe(
+            len(prompt) if isinstance(prompt, str) else sum(len(part) for part in prompt if isinstance(part, str)),
+            call="generate",
+        )
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generate("generate", prompt)
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate response: {e}")
 
@@ -53,14 +157,67 @@ class LLMService:
             str: The generated response text.
 
         Raises:
+            LLMUnavailableError: If Gemini is unavailable.
             ValueError: If querying Gemini with the image fails.
         """
         try:
             with open(image_path, "rb") as image_file:
                 image_data = image_file.read()
-            response = self.model.generate_content(
-                [prompt, {"mime_type": "image/jpeg", "data": image_data}]
+        except OSError as e:
+            raise ValueError(f"Failed to query Gemini for {image_path}: {e}")
+        return self.generate_image_bytes_response(image_data, prompt, name=image_path)
+
+    def generate_image_bytes_response(self, image_data: bytes, prompt: str, name: str = "image") -> str:
+        """Generate a response for an in-memory JPEG image with a given prompt using Gemini.
+
+        Args:
+            image_data: JPEG-encoded image bytes.
+            prompt: The prompt to send alongside the image.
+            name: Name of the image used in error messages.
+
+        Returns:
+            str: The generated response text.
+
+        Raises:
+            LLMUnavailableError: If Gemini is unavailable.
+            ValueError: If querying Gemini with the image fails.
+        """
+        LLM_PROMPT_SIZE.observe(len(prompt), call="generate_image")
+        try:
+            return self._generate("generate_image", [prompt, {"mime_type": "image/jpeg", "data": image_data}])
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to query Gemini for {name}: {e}")
+
+    def generate_batch_image_response(self, images: List[bytes], prompt: str) -> str:
+        """Generate one JSON response covering several images in a single Gemini call.
+
+        Each image is sent as a JPEG part preceded by its label ('Image 0', 'Image 1', ...)
+        so the model can refer to it by index.
+
+        Args:
+            images: JPEG-encoded image bytes, in index order.
+            prompt: The instruction describing the expected JSON output.
+
+        Returns:
+            str: The generated response text (expected to be JSON).
+
+        Raises:
+            LLMUnavailableError: If Gemini is unavailable.
+            ValueError: If querying Gemini with the images fails.
+        """
+        contents: List[Union[str, Dict[str, bytes]]] = [prompt]
+        for index, image_data in enumerate(images):
+            contents.append(f"Image {index}:")
+            contents.append({"mime_type": "image/jpeg", "data": image_data})
+
+        LLM_PROMPT_SIZE.observe(len(prompt), call="generate_batch")
+        try:
+            return self._generate(
+                "generate_batch", contents, generation_config={"response_mime_type": "application/json"}
             )
-            return response.text.strip()
+        except LLMUnavailableError:
+            raise
         except Exception as e:
-            raise ValueError(f"Failed to query Gemini for {image_path}: {e}")
+            raise ValueError(f"Failed to query Gemini for a batch of {len(images)} images: {e}")
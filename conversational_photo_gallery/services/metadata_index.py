@@ -0,0 +1,789 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from conversational_photo_gallery.config import METADATA_INDEX_PATH
+from conversational_photo_gallery.constants import COLOR_SYNONYMS, COLOR_VOCABULARY
+from conversational_photo_gallery.services.geo import (
+    BoundingBox,
+    box_around,
+    covering_cells,
+    encode,
+    haversine_km,
+    split_antimeridian,
+    valid_coordinates,
+)
+from conversational_photo_gallery.services.query_filters import QueryFilters
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id TEXT PRIMARY KEY,
+    description TEXT NOT NULL DEFAULT '',
+    color TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL DEFAULT '',
+    taken_at REAL,
+    content_hash TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_images_color ON images(color);
+CREATE INDEX IF NOT EXISTS idx_images_timeline ON images(taken_at, id);
+
+CREATE TABLE IF NOT EXISTS image_tags (
+    image_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (image_id, source, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_image_tags_tag ON image_tags(tag, image_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(
+    description, content='images', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN
+    INSERT INTO images_fts(rowid, description) VALUES (new.rowid, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN
+    INSERT INTO images_fts(images_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF description ON images BEGIN
+    INSERT INTO images_fts(images_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+    INSERT INTO images_fts(rowid, description) VALUES (new.rowid, new.description);
+END;
+
+-- Per-month photo counts, maintained by triggers so bucket queries never scan images
+CREATE TABLE IF NOT EXISTS month_counts (
+    month TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS month_counts_insert AFTER INSERT ON images
+WHEN new.taken_at IS NOT NULL BEGIN
+    INSERT INTO month_counts (month, count)
+    VALUES (strftime('%Y-%m', new.taken_at, 'unixepoch', 'localtime'), 1)
+    ON CONFLICT(month) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS month_counts_delete AFTER DELETE ON images
+WHEN old.taken_at IS NOT NULL BEGIN
+    UPDATE month_counts SET count = count - 1
+    WHERE month = strftime('%Y-%m', old.taken_at, 'unixepoch', 'localtime');
+    DELETE FROM month_counts WHERE count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS month_counts_update AFTER UPDATE OF taken_at ON images
+WHEN old.taken_at IS NOT new.taken_at BEGIN
+    UPDATE month_counts SET count = count - 1
+    WHERE old.taken_at IS NOT NULL
+      AND month = strftime('%Y-%m', old.taken_at, 'unixepoch', 'localtime');
+    DELETE FROM month_counts WHERE count <= 0;
+    INSERT INTO month_counts (month, count)
+    SELECT strftime('%Y-%m', new.taken_at, 'unixepoch', 'localtime'), 1
+    WHERE new.taken_at IS NOT NULL
+    ON CONFLICT(month) DO UPDATE SET count = count + 1;
+END;
+
+-- Share of each vocabulary colour in an image's palette (from the 'palette' metadata value)
+CREATE TABLE IF NOT EXISTS image_colors (
+    image_id TEXT NOT NULL,
+    color TEXT NOT NULL,
+    share REAL NOT NULL,
+    PRIMARY KEY (image_id, color)
+) WITHOUT ROWID;
+
+-- GPS position of geotagged images; rows sharing a geohash prefix lie in the same cell, so a bounding box
+-- becomes a few key ranges on the covering index
+CREATE TABLE IF NOT EXISTS image_locations (
+    image_id TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    geohash TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_locations_geohash ON image_locations(geohash, latitude, longitude);
+
+-- Named places ('beach house') that chat queries can search near
+CREATE TABLE IF NOT EXISTS places (
+    name TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    radius_km REAL NOT NULL
+) WITHOUT ROWID;
+
+-- Facet counts (images per tag and per colour), maintained by triggers so facet queries never scan images.
+-- A tag set both by Gemini and by the user counts once per image.
+CREATE TABLE IF NOT EXISTS tag_counts (
+    tag TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS tag_counts_insert AFTER INSERT ON image_tags
+WHEN NOT EXISTS (
+    SELECT 1 FROM image_tags WHERE image_id = new.image_id AND tag = new.tag AND source <> new.source
+) BEGIN
+    INSERT INTO tag_counts (tag, count) VALUES (new.tag, 1)
+    ON CONFLICT(tag) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tag_counts_delete AFTER DELETE ON image_tags
+WHEN NOT EXISTS (SELECT 1 FROM image_tags WHERE image_id = old.image_id AND tag = old.tag) BEGIN
+    UPDATE tag_counts SET count = count - 1 WHERE tag = old.tag;
+    DELETE FROM tag_counts WHERE tag = old.tag AND count <= 0;
+END;
+
+CREATE TABLE IF NOT EXISTS color_counts (
+    color TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS color_counts_insert AFTER INSERT ON images
+WHEN new.color <> '' BEGIN
+    INSERT INTO color_counts (color, count) VALUES (new.color, 1)
+    ON CONFLICT(color) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS color_counts_delete AFTER DELETE ON images
+WHEN old.color <> '' BEGIN
+    UPDATE color_counts SET count = count - 1 WHERE color = old.color;
+    DELETE FROM color_counts WHERE color = old.color AND count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS color_counts_update AFTER UPDATE OF color ON images
+WHEN old.color IS NOT new.color BEGIN
+    UPDATE color_counts SET count = count - 1 WHERE color = old.color;
+    DELETE FROM color_counts WHERE color = old.color AND count <= 0;
+    INSERT INTO color_counts (color, count)
+    SELECT new.color, 1 WHERE new.color <> ''
+    ON CONFLICT(color) DO UPDATE SET count = count + 1;
+END;
+
+-- Bumped on every change to the indexed images, so caches in any process can tell when results went stale.
+CREATE TABLE IF NOT EXISTS collection_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO collection_version (id, version) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS collection_version_insert AFTER INSERT ON images BEGIN
+    UPDATE collection_version SET version = version + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS collection_version_delete AFTER DELETE ON images BEGIN
+    UPDATE collection_version SET version = version + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS collection_version_update AFTER UPDATE ON images BEGIN
+    UPDATE collection_version SET version = version + 1 WHERE id = 0;
+END;
+"""
+
+# Recompute month_counts from scratch (used when upgrading an index created before it existed).
+# The rebuilds are lists of statements run with execute() inside one BEGIN IMMEDIATE transaction
+# (executescript() would commit before running them), so other workers never see them half done.
+REBUILD_MONTH_COUNTS = [
+    "DELETE FROM month_counts",
+    "INSERT INTO month_counts (month, count) "
+    "SELECT strftime('%Y-%m', taken_at, 'unixepoch', 'localtime'), COUNT(*) "
+    "FROM images WHERE taken_at IS NOT NULL GROUP BY 1",
+]
+
+# Recompute the facet counts from scratch (used on demand and when upgrading an older index)
+REBUILD_FACET_COUNTS = [
+    "DELETE FROM tag_counts",
+    "INSERT INTO tag_counts (tag, count) SELECT tag, COUNT(DISTINCT image_id) FROM image_tags GROUP BY tag",
+    "DELETE FROM color_counts",
+    "INSERT INTO color_counts (color, count) SELECT color, COUNT(*) FROM images WHERE color <> '' GROUP BY color",
+]
+
+# Format of the EXIF DateTimeOriginal tag (e.g., '2023:07:14 18:32:05')
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def normalize_color(value: str) -> str:
+    """Map a free-text colour (e.g., 'Light Blue.') onto a COLOR_VOCABULARY entry.
+
+    Args:
+        value: Colour string as stored in the image metadata.
+
+    Returns:
+        str: The matching vocabulary colour, or the cleaned input if none matches.
+    """
+    words = re.findall(r"[a-z]+", (value or "").lower())
+    # The last colour word is the base colour ('light blue' -> 'blue')
+    for word in reversed(words):
+        word = COLOR_SYNONYMS.get(word, word)
+        if word in COLOR_VOCABULARY:
+            return word
+    return " ".join(words)
+
+
+def split_tags(value: str) -> List[str]:
+    """Split a comma-joined tag string into normalized, de-duplicated tags."""
+    tags = []
+    for tag in (value or "").split(","):
+        tag = tag.strip().lower()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def parse_palette(value: str) -> Dict[str, float]:
+    """Parse a stored palette such as 'blue:0.412,white:0.301' into colour shares.
+
+    Entries that are malformed or not in COLOR_VOCABULARY are skipped.
+    """
+    palette = {}
+    for entry in (value or "").split(","):
+        color, _, share = entry.partition(":")
+        color = color.strip().lower()
+        try:
+            if color in COLOR_VOCABULARY:
+                palette[color] = float(share)
+        except ValueError:
+            continue
+    return palette
+
+
+def parse_location(metadata: Dict[str, str]) -> Optional[Tuple[float, float]]:
+    """Return the (latitude, longitude) stored in image metadata, or None if missing or invalid."""
+    try:
+        location = float(metadata["latitude"]), float(metadata["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return location if valid_coordinates(*location) else None
+
+
+def location_clause(
+    area: Optional[BoundingBox] = None, near: Optional[Tuple[float, float, float]] = None
+) -> Tuple[str, List]:
+    """Build the image_locations condition for images inside a box and/or within a radius of a point.
+
+    The box (or the box around the circle) is split into covering geohash cells
+    whose key ranges use the geohash index; exact bounds and distance are then
+    checked on the rows found there.
+
+    Args:
+        area: (south, west, north, east) in degrees; west > east crosses longitude 180.
+        near: (latitude, longitude, radius in km).
+
+    Returns:
+        Tuple[str, List]: WHERE clause over image_locations and its parameters.
+    """
+    boxes = []
+    for box in ([area] if area else []) + ([box_around(*near)] if near else []):
+        boxes.append(split_antimeridian(box))
+    if len(boxes) == 2:
+        # Both filters apply: keep the overlaps of their parts
+        boxes = [[
+            (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+            for a in boxes[0] for b in boxes[1]
+            if max(a[0], b[0]) <= min(a[2], b[2]) and max(a[1], b[1]) <= min(a[3], b[3])
+        ]]
+    parts, params = [], []
+    for south, west, north, east in boxes[0] if boxes else []:
+        cells = covering_cells((south, west, north, east))
+        ranges = " OR ".join(["(geohash >= ? AND geohash < ?)"] * len(cells))
+        parts.append(f"(({ranges}) AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?)")
+        for cell in cells:
+            # '~' sorts after every geohash character
+            params.extend([cell, cell + "~"])
+        params.extend([south, north, west, east])
+    where = " OR ".join(parts) or "0"
+    if near:
+        where = f"({where}) AND haversine_km(latitude, longitude, ?, ?) <= ?"
+        params.extend(near)
+    return where, params
+
+
+def normalize_place(name: str) -> str:
+    """Normalize a place name for storage and lookup ('The  Beach House' -> 'beach house')."""
+    words = (name or "").lower().split()
+    # Queries say 'near the beach house' and the parser keeps the article out of the name
+    if len(words) > 1 and words[0] in ("the", "my", "our"):
+        words = words[1:]
+    return " ".join(words)
+
+
+def parse_exif_date(value: str) -> Optional[float]:
+    """Parse an EXIF date string into an epoch timestamp, or None if unparsable."""
+    try:
+        return datetime.strptime(value.strip(), EXIF_DATE_FORMAT).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class MetadataIndex:
+    """Normalized SQLite index over image metadata used to push filters down before vector search."""
+
+    def __init__(self, index_path: str = str(METADATA_INDEX_PATH)) -> None:
+        """Open (and create if needed) the SQLite side index.
+
+        Args:
+            index_path: Path to the SQLite database file.
+
+        Raises:
+            RuntimeError: If the index database cannot be opened.
+        """
+        try:
+            self.connection = sqlite3.connect(index_path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.create_function("haversine_km", 4, haversine_km, deterministic=True)
+            self.connection.executescript(SCHEMA)
+            self.lock = threading.RLock()
+            with self.connection:
+                # Take the write lock before checking, so workers starting together rebuild the counts once
+                self.connection.execute("BEGIN IMMEDIATE")
+                if self.connection.execute("SELECT 1 FROM month_counts LIMIT 1").fetchone() is None:
+                    self._run(REBUILD_MONTH_COUNTS)
+                if (
+                    self.connection.execute("SELECT 1 FROM tag_counts LIMIT 1").fetchone() is None
+                    and self.connection.execute("SELECT 1 FROM color_counts LIMIT 1").fetchone() is None
+                ):
+                    self._run(REBUILD_FACET_COUNTS)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Metadata index initialization failed: {e}")
+
+    def _run(self, statements: List[str]) -> None:
+        """Execute statements in the current transaction without committing."""
+        for statement in statements:
+            self.connection.execute(statement)
+
+    def is_empty(self) -> bool:
+        """Return True if no image has been indexed yet."""
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM images LIMIT 1").fetchone() is None
+
+    def _upsert(self, image_id: str, metadata: Dict[str, str]) -> None:
+        """Write one image's rows without committing."""
+        date = metadata.get("date", "") or ""
+        timestamp = metadata.get("timestamp")
+        if not isinstance(timestamp, (int, float)):
+            timestamp = parse_exif_date(date)
+        self.connection.execute(
+            """
+            INSERT INTO images (id, description, color, date, taken_at, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                description = excluded.description,
+                color = excluded.color,
+                date = excluded.date,
+                taken_at = excluded.taken_at,
+                content_hash = excluded.content_hash
+            """,
+            (
+                image_id,
+                metadata.get("description", "") or "",
+                normalize_color(metadata.get("dominant_color", "")),
+                date,
+                timestamp,
+                metadata.get("content_hash", "") or "",
+            ),
+        )
+        self.connection.execute("DELETE FROM image_tags WHERE image_id = ?", (image_id,))
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO image_tags (image_id, tag, source) VALUES (?, ?, ?)",
+            [(image_id, tag, "auto") for tag in split_tags(metadata.get("tags", ""))]
+            + [(image_id, tag, "user") for tag in split_tags(metadata.get("user_tags", ""))],
+        )
+        self.connection.execute("DELETE FROM image_colors WHERE image_id = ?", (image_id,))
+        self.connection.executemany(
+            "INSERT INTO image_colors (image_id, color, share) VALUES (?, ?, ?)",
+            [(image_id, color, share) for color, share in parse_palette(metadata.get("palette", "")).items()],
+        )
+        self.connection.execute("DELETE FROM image_locations WHERE image_id = ?", (image_id,))
+        location = parse_location(metadata)
+        if location is not None:
+            self.connection.execute(
+                "INSERT INTO image_locations (image_id, latitude, longitude, geohash) VALUES (?, ?, ?, ?)",
+                (image_id, *location, encode(*location)),
+            )
+
+    def upsert(self, image_id: str, metadata: Dict[str, str]) -> None:
+        """Insert or replace the indexed metadata of an image.
+
+        Args:
+            image_id: ChromaDB ID of the image (its file path).
+            metadata: Metadata dictionary as stored in ChromaDB.
+
+        Raises:
+            ValueError: If writing to the index fails.
+        """
+        self.upsert_many([image_id], [metadata])
+
+    def upsert_many(self, image_ids: List[str], metadatas: List[Dict[str, str]]) -> None:
+        """Insert or replace the indexed metadata of several images in one transaction.
+
+        Args:
+            image_ids: ChromaDB IDs of the images.
+            metadatas: Metadata dictionaries, aligned with image_ids.
+
+        Raises:
+            ValueError: If writing to the index fails.
+        """
+        try:
+            with self.lock, self.connection:
+                for image_id, metadata in zip(image_ids, metadatas):
+                    self._upsert(image_id, metadata or {})
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to index metadata: {e}")
+
+    def delete(self, image_ids: Iterable[str]) -> None:
+        """Remove images from the index.
+
+        Args:
+            image_ids: ChromaDB IDs of the images to remove.
+
+        Raises:
+            ValueError: If deleting from the index fails.
+        """
+        rows = [(image_id,) for image_id in image_ids]
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("DELETE FROM image_tags WHERE image_id = ?", rows)
+                self.connection.executemany("DELETE FROM image_colors WHERE image_id = ?", rows)
+                self.connection.executemany("DELETE FROM image_locations WHERE image_id = ?", rows)
+                self.connection.executemany("DELETE FROM images WHERE id = ?", rows)
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to remove images from metadata index: {e}")
+
+    def rebuild(self, image_ids: List[str], metadatas: List[Dict[str, str]]) -> None:
+        """Replace the whole index with the given records.
+
+        Args:
+            image_ids: ChromaDB IDs of every image in the collection.
+            metadatas: Metadata dictionaries, aligned with image_ids.
+
+        Raises:
+            ValueError: If rebuilding the index fails.
+        """
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM image_tags")
+                self.connection.execute("DELETE FROM image_colors")
+                self.connection.execute("DELETE FROM image_locations")
+                self.connection.execute("DELETE FROM images")
+                for image_id, metadata in zip(image_ids, metadatas):
+                    self._upsert(image_id, metadata or {})
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to rebuild metadata index: {e}")
+
+    @staticmethod
+    def _filter_clause(filters: QueryFilters):
+        """Build the WHERE clause and parameters for a set of filters."""
+        clauses, params = [], []
+        if filters.colors:
+            clauses.append(f"color IN ({','.join('?' * len(filters.colors))})")
+            params.extend(filters.colors)
+        if filters.start is not None:
+            clauses.append("taken_at >= ?")
+            params.append(filters.start)
+        if filters.end is not None:
+            clauses.append("taken_at < ?")
+            params.append(filters.end)
+        for tag in filters.tags:
+            clauses.append("id IN (SELECT image_id FROM image_tags WHERE tag = ?)")
+            params.append(tag)
+        for phrase in filters.phrases:
+            clauses.append("rowid IN (SELECT rowid FROM images_fts WHERE images_fts MATCH ?)")
+            params.append('"' + phrase.replace('"', '""') + '"')
+        if filters.area is not None or filters.near is not None:
+            location_where, location_params = location_clause(filters.area, filters.near)
+            clauses.append(f"id IN (SELECT image_id FROM image_locations WHERE {location_where})")
+            params.extend(location_params)
+        return " AND ".join(clauses) or "1", params
+
+    def candidate_ids(self, filters: QueryFilters, limit: int) -> List[str]:
+        """Return the IDs of images matching every filter.
+
+        Args:
+            filters: Structured filters parsed from the query.
+            limit: Maximum number of IDs to return.
+
+        Returns:
+            List[str]: Matching image IDs, at most `limit` of them.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        where, params = self._filter_clause(filters)
+        try:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT id FROM images WHERE {where} LIMIT ?", params + [limit]
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Metadata index query failed: {e}")
+        return [row[0] for row in rows]
+
+    def matching_ids(self, image_ids: List[str], filters: QueryFilters) -> Set[str]:
+        """Return the subset of image_ids that match every filter.
+
+        Args:
+            image_ids: IDs to check, typically vector search results.
+            filters: Structured filters parsed from the query.
+
+        Returns:
+            Set[str]: The IDs that satisfy the filters.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        if not image_ids:
+            return set()
+        where, params = self._filter_clause(filters)
+        placeholders = ",".join("?" * len(image_ids))
+        try:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT id FROM images WHERE id IN ({placeholders}) AND {where}",
+                    list(image_ids) + params,
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Metadata index query failed: {e}")
+        return {row[0] for row in rows}
+
+    def version(self) -> int:
+        """Return a counter that increases whenever an indexed image is added, changed or removed."""
+        with self.lock:
+            return self.connection.execute("SELECT version FROM collection_version WHERE id = 0").fetchone()[0]
+
+    def all_ids(self) -> List[str]:
+        """Return the IDs of every indexed image."""
+        with self.lock:
+            rows = self.connection.execute("SELECT id FROM images").fetchall()
+        return [row[0] for row in rows]
+
+    def palettes(self) -> List[Tuple[str, str, float]]:
+        """Return every (image ID, colour, share) palette entry.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        try:
+            with self.lock:
+                return self.connection.execute(
+                    "SELECT image_id, color, share FROM image_colors"
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Palette query failed: {e}")
+
+    def palette_ids(self) -> Set[str]:
+        """Return the IDs of images that have a stored palette."""
+        with self.lock:
+            rows = self.connection.execute("SELECT DISTINCT image_id FROM image_colors").fetchall()
+        return {row[0] for row in rows}
+
+    def location_ids(self) -> Set[str]:
+        """Return the IDs of images that have a stored GPS position."""
+        with self.lock:
+            rows = self.connection.execute("SELECT image_id FROM image_locations").fetchall()
+        return {row[0] for row in rows}
+
+    def locations(
+        self,
+        area: Optional[BoundingBox] = None,
+        near: Optional[Tuple[float, float, float]] = None,
+        limit: int = -1,
+    ) -> List[Tuple[str, float, float, Optional[float], str]]:
+        """Return the geotagged images inside a box and/or within a radius of a point.
+
+        Args:
+            area: (south, west, north, east) in degrees (optional).
+            near: (latitude, longitude, radius in km) (optional).
+            limit: Maximum number of images to return (-1 for all).
+
+        Returns:
+            List[Tuple[str, float, float, Optional[float], str]]: (image ID, latitude, longitude,
+            distance in km from the `near` point or None, content hash or ''), nearest first when
+            `near` is given.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        where, params = location_clause(area, near)
+        distance, order = "NULL", "image_id"
+        if near:
+            distance, order = "haversine_km(latitude, longitude, ?, ?)", "4"
+            params = [near[0], near[1]] + params
+        try:
+            with self.lock:
+                return self.connection.execute(
+                    f"SELECT image_id, latitude, longitude, {distance}, "
+                    "COALESCE((SELECT content_hash FROM images WHERE id = image_id), '') FROM image_locations "
+                    f"WHERE {where} ORDER BY {order} LIMIT ?",
+                    params + [limit],
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Location query failed: {e}")
+
+    def set_place(self, name: str, latitude: float, longitude: float, radius_km: float) -> None:
+        """Save (or move) a named place that chat queries can search near.
+
+        Raises:
+            ValueError: If the name is empty, the coordinates are invalid or writing fails.
+        """
+        name = normalize_place(name)
+        if not name or not valid_coordinates(latitude, longitude) or not radius_km > 0:
+            raise ValueError("A place needs a name, valid coordinates and a positive radius")
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    """
+                    INSERT INTO places (name, latitude, longitude, radius_km) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        latitude = excluded.latitude,
+                        longitude = excluded.longitude,
+                        radius_km = excluded.radius_km
+                    """,
+                    (name, latitude, longitude, radius_km),
+                )
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to save place {name!r}: {e}")
+
+    def delete_place(self, name: str) -> bool:
+        """Remove a named place; returns False if there was none."""
+        with self.lock, self.connection:
+            cursor = self.connection.execute("DELETE FROM places WHERE name = ?", (normalize_place(name),))
+        return cursor.rowcount > 0
+
+    def place(self, name: str) -> Optional[Tuple[float, float, float]]:
+        """Return the (latitude, longitude, radius in km) of a named place, or None."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT latitude, longitude, radius_km FROM places WHERE name = ?", (normalize_place(name),)
+            ).fetchone()
+
+    def places(self) -> List[Tuple[str, float, float, float]]:
+        """Return every named place as (name, latitude, longitude, radius in km)."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT name, latitude, longitude, radius_km FROM places ORDER BY name"
+            ).fetchall()
+
+    def undated_ids(self) -> List[str]:
+        """Return the IDs of images without a capture timestamp."""
+        with self.lock:
+            rows = self.connection.execute("SELECT id FROM images WHERE taken_at IS NULL").fetchall()
+        return [row[0] for row in rows]
+
+    def set_timestamps(self, timestamps: Dict[str, float]) -> None:
+        """Set the capture timestamp of already indexed images.
+
+        Args:
+            timestamps: Mapping of image ID to epoch timestamp.
+
+        Raises:
+            ValueError: If writing to the index fails.
+        """
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "UPDATE images SET taken_at = ? WHERE id = ?",
+                    [(timestamp, image_id) for image_id, timestamp in timestamps.items()],
+                )
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to store timestamps: {e}")
+
+    def timeline(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[float, str]] = None,
+    ) -> List[Tuple[str, float, str]]:
+        """Return images in a time range, newest first, using the (taken_at, id) index.
+
+        Args:
+            start: Inclusive lower bound as an epoch timestamp (optional).
+            end: Exclusive upper bound as an epoch timestamp (optional).
+            limit: Maximum number of images to return.
+            cursor: (taken_at, id) of the last image of the previous page (optional).
+
+        Returns:
+            List[Tuple[str, float, str]]: (image ID, timestamp, content hash or '' if not indexed yet).
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        clauses, params = ["taken_at IS NOT NULL"], []
+        if start is not None:
+            clauses.append("taken_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("taken_at < ?")
+            params.append(end)
+        if cursor is not None:
+            clauses.append("(taken_at, id) < (?, ?)")
+            params.extend(cursor)
+        try:
+            with self.lock:
+                return self.connection.execute(
+                    f"SELECT id, taken_at, content_hash FROM images WHERE {' AND '.join(clauses)} "
+                    "ORDER BY taken_at DESC, id DESC LIMIT ?",
+                    params + [limit],
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Timeline query failed: {e}")
+
+    def month_buckets(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> List[Tuple[str, int]]:
+        """Return per-month photo counts ('YYYY-MM', count), newest month first.
+
+        Args:
+            start: Inclusive lower bound as an epoch timestamp (optional).
+            end: Exclusive upper bound as an epoch timestamp (optional).
+
+        Returns:
+            List[Tuple[str, int]]: Month buckets overlapping the range.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("month >= ?")
+            params.append(datetime.fromtimestamp(start).strftime("%Y-%m"))
+        if end is not None:
+            clauses.append("month <= ?")
+            params.append(datetime.fromtimestamp(end - 1).strftime("%Y-%m"))
+        where = " AND ".join(clauses) or "1"
+        try:
+            with self.lock:
+                return self.connection.execute(
+                    f"SELECT month, count FROM month_counts WHERE {where} ORDER BY month DESC",
+                    params,
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Month bucket query failed: {e}")
+
+    def facets(self, limit: int = 50) -> Dict[str, List[Tuple[str, int]]]:
+        """Return the most common tags and colours with their image counts.
+
+        Counts are read from the trigger-maintained tables, so the cost depends
+        on the number of distinct tags and colours, not on the number of images.
+
+        Args:
+            limit: Maximum number of tags and of colours to return.
+
+        Returns:
+            Dict[str, List[Tuple[str, int]]]: 'tags' and 'colors' lists of (value, count),
+            most common first.
+
+        Raises:
+            RuntimeError: If the index query fails.
+        """
+        try:
+            with self.lock:
+                tags = self.connection.execute(
+                    "SELECT tag, count FROM tag_counts ORDER BY count DESC, tag LIMIT ?", (limit,)
+                ).fetchall()
+                colors = self.connection.execute(
+                    "SELECT color, count FROM color_counts ORDER BY count DESC, color LIMIT ?", (limit,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Facet query failed: {e}")
+        return {"tags": tags, "colors": colors}
+
+    def rebuild_facets(self) -> None:
+        """Recompute the tag and colour counts from the indexed images.
+
+        Raises:
+            ValueError: If rebuilding the counts fails.
+        """
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self._run(REBUILD_FACET_COUNTS)
+        except sqlite3.Error as e:
+            raise ValueError(f"Failed to rebuild facet counts: {e}")
@@ -0,0 +1,206 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Latency buckets in seconds, from sub-millisecond index lookups to slow Gemini calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Size buckets in characters for prompts and responses
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set such as {component="chat",stage="vector_query"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for the given label values."""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        """Return the metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the given label values."""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        """Return the metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0.0
+                bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, series):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered on the /metrics endpoint."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        """Return the counter with this name, creating it on first use."""
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram with this name, creating it on first use."""
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "gallery_stage_duration_seconds", "Latency of each pipeline stage.", ("component", "stage")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "gallery_stage_errors_total", "Pipeline stages that raised an exception.", ("component", "stage")
+)
+LLM_PROMPT_SIZE = REGISTRY.histogram(
+    "gallery_llm_prompt_chars", "Size of prompts sent to the LLM.", ("call",), SIZE_BUCKETS
+)
+LLM_RESPONSE_SIZE = REGISTRY.histogram(
+    "gallery_llm_response_chars", "Size of responses received from the LLM.", ("call",), SIZE_BUCKETS
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "gallery_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result")
+)
+RETRIES = REGISTRY.counter(
+    "gallery_llm_retries_total", "Retried LLM calls after a failed attempt.", ("call",)
+)
+HEDGED_REQUESTS = REGISTRY.counter(
+    "gallery_hedged_requests_total", "Duplicate requests sent because the first one was slow.", ("circuit",)
+)
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "gallery_circuit_transitions_total", "Circuit breaker state changes.", ("circuit", "state")
+)
+CONSISTENCY_FIXES = REGISTRY.counter(
+    "gallery_consistency_fixes_total", "Inconsistencies repaired by the consistency scanner.", ("action",)
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "gallery_http_request_duration_seconds", "Latency of HTTP requests.", ("method", "route", "status")
+)
+
+# Stage timings of the current request, reported in the Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    """Start collecting stage timings for the current request and return the collector."""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header, summing repeated stages."""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def timed_stage(component: str, stage: str) -> Iterator[None]:
+    """Time a pipeline stage into the latency histogram and the request's Server-Timing.
+
+    Args:
+        component: Pipeline the stage belongs to (e.g., 'chat', 'upload', 'llm').
+        stage: Name of the stage (e.g., 'vector_query').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(component=component, stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, component=component, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((f"{component}.{stage}", elapsed))
@@ -0,0 +1,225 @@
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from conversational_photo_gallery.config import GEO_DEFAULT_RADIUS_KM
+from conversational_photo_gallery.constants import COLOR_SYNONYMS, COLOR_VOCABULARY
+from conversational_photo_gallery.services.geo import valid_coordinates
+
+
+# '#beach', 'tagged beach', 'with tag beach'
+TAG_PATTERN = re.compile(r"(?:#|\btagged\s+|\bwith\s+(?:the\s+)?tag\s+)([\w-]+)", re.IGNORECASE)
+
+# 'blue photos', 'red colored images', 'colour blue'
+COLOR_PATTERN = re.compile(
+    r"\b([a-z]+)\s+(?:colou?red\s+)?(?:photos?|images?|pictures?|pics|shots?)\b"
+    r"|\bcolou?r\s+([a-z]+)\b",
+    re.IGNORECASE,
+)
+
+# 'from 2021', 'in 2019', 'taken in 2020'
+YEAR_PATTERN = re.compile(r"\b(?:from|in|during|taken\s+in)\s+((?:19|20)\d{2})\b", re.IGNORECASE)
+
+# 'in July 2022', 'from march', 'during december 2019'
+MONTH_NAMES = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+MONTH_PATTERN = re.compile(
+    r"\b(?:from|in|during|taken\s+in)\s+(%s)(?:\s+((?:19|20)\d{2}))?\b" % "|".join(MONTH_NAMES),
+    re.IGNORECASE,
+)
+
+# 'last summer', 'this year', 'last month', 'this week'
+RELATIVE_PATTERN = re.compile(
+    r"\b(?:(?:from|in|during|taken)\s+)?(last|this|past)\s+"
+    r"(spring|summer|autumn|fall|winter|year|month|week)\b",
+    re.IGNORECASE,
+)
+
+# First month of each (northern hemisphere) season; every season lasts three months
+SEASON_START_MONTHS = {"spring": 3, "summer": 6, "autumn": 9, "fall": 9, "winter": 12}
+
+# 'within 2 km of', 'within 500 m of', 'within 3 miles of'
+RADIUS = r"within\s+(\d+(?:\.\d+)?)\s*(km|kilomet(?:er|re)s?|m|met(?:er|re)s?|mi|miles?)\s+of"
+
+# 'near 48.8584,2.2945', 'within 2 km of 48.85, 2.29'
+COORDINATES_PATTERN = re.compile(
+    r"\b(?:near|around|at|%s)\s+(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)" % RADIUS, re.IGNORECASE
+)
+
+# 'near the beach house', 'at grandma's', 'within 5 km of home' (up to five words, resolved against saved places)
+PLACE_PATTERN = re.compile(
+    r"\b((?:near|around|at|%s)\s+(?:(?:the|my|our)\s+)?)([a-z][\w'-]*(?:\s+[a-z][\w'-]*){0,4})" % RADIUS,
+    re.IGNORECASE,
+)
+
+# Kilometres per unit of a radius, by unit prefix ('mi' is checked before 'm')
+RADIUS_UNITS = {"km": 1.0, "kilo": 1.0, "mi": 1.609344, "m": 0.001}
+
+# '"birthday cake"' (must appear in the description)
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+
+@dataclass
+class QueryFilters:
+    """Structured filters extracted from a chat query."""
+
+    tags: List[str] = field(default_factory=list)
+    colors: List[str] = field(default_factory=list)
+    phrases: List[str] = field(default_factory=list)
+    start: Optional[float] = None
+    end: Optional[float] = None
+    # (latitude, longitude, radius in km) and (south, west, north, east) location filters
+    near: Optional[Tuple[float, float, float]] = None
+    area: Optional[Tuple[float, float, float, float]] = None
+    # (matched lead such as 'near the ', following words, radius in km or None) for resolve_place
+    place_mentions: List[Tuple[str, str, Optional[float]]] = field(default_factory=list)
+    semantic_query: str = ""
+
+    def is_empty(self) -> bool:
+        """Return True if no filter was found in the query."""
+        return (
+            not (self.tags or self.colors or self.phrases)
+            and self.start is None and self.end is None
+            and self.near is None and self.area is None
+        )
+
+
+def _radius_km(amount: Optional[str], unit: Optional[str]) -> Optional[float]:
+    """Convert a matched radius ('500', 'metres') to kilometres (None when there was none)."""
+    if not amount:
+        return None
+    unit = unit.lower()
+    factor = next(value for prefix, value in RADIUS_UNITS.items() if unit.startswith(prefix))
+    return float(amount) * factor
+
+
+def _add_months(year: int, month: int, months: int) -> datetime:
+    """Return midnight on the first day of the month `months` after (year, month)."""
+    index = year * 12 + (month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _relative_range(modifier: str, unit: str, now: datetime) -> Tuple[datetime, datetime]:
+    """Resolve expressions like 'last summer' or 'this month' to a [start, end) range."""
+    offset = 0 if modifier == "this" else -1
+    if unit == "year":
+        return datetime(now.year + offset, 1, 1), datetime(now.year + offset + 1, 1, 1)
+    if unit == "month":
+        start = _add_months(now.year, now.month, offset)
+        return start, _add_months(start.year, start.month, 1)
+    if unit == "week":
+        monday = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        start = monday + timedelta(weeks=offset)
+        return start, start + timedelta(weeks=1)
+
+    # Seasons: the season of the current year, or the most recent finished one for 'last'
+    start_month = SEASON_START_MONTHS[unit]
+    start = datetime(now.year, start_month, 1)
+    if start_month == 12 and now.month < 3:
+        start = datetime(now.year - 1, 12, 1)
+    end = _add_months(start.year, start.month, 3)
+    if modifier != "this" and end > now:
+        start, end = datetime(start.year - 1, start.month, 1), datetime(end.year - 1, end.month, 1)
+    return start, end
+
+
+def parse_query_filters(query: str, now: Optional[datetime] = None) -> QueryFilters:
+    """Extract tag, colour, date and phrase filters from a natural language query.
+
+    Args:
+        query: The user's text query.
+        now: Reference time for relative dates like 'last summer' (defaults to now).
+
+    Returns:
+        QueryFilters: The parsed filters; semantic_query holds the query text to embed.
+    """
+    filters = QueryFilters()
+
+    for match in TAG_PATTERN.finditer(query):
+        tag = match.group(1).lower()
+        if tag not in filters.tags:
+            filters.tags.append(tag)
+
+    for match in COLOR_PATTERN.finditer(query):
+        word = (match.group(1) or match.group(2)).lower()
+        color = COLOR_SYNONYMS.get(word, word)
+        if color in COLOR_VOCABULARY and color not in filters.colors:
+            filters.colors.append(color)
+
+    now = now or datetime.now()
+    month_match = MONTH_PATTERN.search(query)
+    year_match = YEAR_PATTERN.search(query)
+    relative_match = RELATIVE_PATTERN.search(query)
+    date_range = None
+    if month_match:
+        month = MONTH_NAMES.index(month_match.group(1).lower()) + 1
+        if month_match.group(2):
+            year = int(month_match.group(2))
+        else:
+            # Without a year, use the most recent occurrence of that month
+            year = now.year if month <= now.month else now.year - 1
+        start = datetime(year, month, 1)
+        date_range = (start, _add_months(year, month, 1))
+    elif year_match:
+        year = int(year_match.group(1))
+        date_range = (datetime(year, 1, 1), datetime(year + 1, 1, 1))
+    elif relative_match:
+        date_range = _relative_range(relative_match.group(1).lower(), relative_match.group(2).lower(), now)
+    if date_range:
+        filters.start, filters.end = date_range[0].timestamp(), date_range[1].timestamp()
+
+    filters.phrases = [phrase.strip() for phrase in PHRASE_PATTERN.findall(query) if phrase.strip()]
+
+    coordinates_match = COORDINATES_PATTERN.search(query)
+    if coordinates_match:
+        amount, unit, latitude, longitude = coordinates_match.groups()
+        latitude, longitude = float(latitude), float(longitude)
+        if valid_coordinates(latitude, longitude):
+            filters.near = (latitude, longitude, _radius_km(amount, unit) or GEO_DEFAULT_RADIUS_KM)
+    else:
+        filters.place_mentions = [
+            (match.group(1), match.group(4), _radius_km(match.group(2), match.group(3)))
+            for match in PLACE_PATTERN.finditer(query)
+        ]
+
+    # Keep the searchable words but drop the filter syntax before embedding
+    semantic_query = TAG_PATTERN.sub(lambda m: m.group(1), query)
+    for pattern in (MONTH_PATTERN, YEAR_PATTERN, RELATIVE_PATTERN, COORDINATES_PATTERN):
+        semantic_query = pattern.sub("", semantic_query)
+    semantic_query = semantic_query.replace('"', "")
+    filters.semantic_query = " ".join(semantic_query.split()) or query
+    return filters
+
+
+def resolve_place(
+    filters: QueryFilters, lookup: Callable[[str], Optional[Tuple[float, float, float]]]
+) -> None:
+    """Turn a 'near <place>' mention into a location filter if it names a saved place.
+
+    The longest run of words after 'near', 'at', ... that names a place wins;
+    its mention is removed from the semantic query. Mentions of unknown places
+    are left in the query as ordinary search words.
+
+    Args:
+        filters: Parsed filters, updated in place.
+        lookup: Returns (latitude, longitude, radius in km) of a saved place name, or None.
+    """
+    if filters.near is not None:
+        return
+    for lead, words, radius in filters.place_mentions:
+        words = words.split()
+        for length in range(len(words), 0, -1):
+            name = " ".join(words[:length])
+            place = lookup(name)
+            if place is None:
+                continue
+            latitude, longitude, place_radius = place
+            filters.near = (latitude, longitude, radius or place_radius)
+            mention = re.compile(r"\s+".join(map(re.escape, lead.split() + words[:length])), re.IGNORECASE)
+            filters.semantic_query = (
+                " ".join(mention.sub("", filters.semantic_query, count=1).split()) or filters.semantic_query
+            )
+            return
@@ -0,0 +1,99 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from conversational_photo_gallery.config import (
+    RERANK_AMBIGUITY_MARGIN,
+    RERANK_KEYWORD_WEIGHT,
+    RERANK_MAX_AMBIGUOUS,
+    RERANK_MIN_SCORE,
+    RERANK_RELATIVE_MARGIN,
+    RERANK_TAG_WEIGHT,
+)
+from conversational_photo_gallery.constants import QUERY_STOPWORDS
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class RankedImage:
+    """A re-ranked retrieval candidate."""
+
+    id: str
+    metadata: Dict[str, str]
+    score: float
+
+
+def query_terms(text: str) -> List[str]:
+    """Lower-cased, de-duplicated query words without stopwords."""
+    terms = []
+    for term in TERM_PATTERN.findall((text or "").lower()):
+        if term not in QUERY_STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _term_matrix(terms: List[str], documents: List[str]) -> np.ndarray:
+    """Binary (documents x terms) matrix of which query terms occur in each document."""
+    matrix = np.zeros((len(documents), len(terms)), dtype=np.float32)
+    index = {term: j for j, term in enumerate(terms)}
+    for i, document in enumerate(documents):
+        for term in set(TERM_PATTERN.findall(document.lower())):
+            j = index.get(term)
+            if j is not None:
+                matrix[i, j] = 1.0
+    return matrix
+
+
+def rerank(
+    query: str,
+    image_ids: List[str],
+    metadatas: List[Dict[str, str]],
+    similarities: np.ndarray,
+    n_results: int,
+) -> Tuple[List[RankedImage], List[RankedImage]]:
+    """Re-score retrieval candidates with CLIP similarity plus keyword and tag overlap.
+
+    The score of each candidate is its cosine similarity plus weighted
+    fractions of query terms found in its description and in its tags.
+    Candidates below RERANK_MIN_SCORE, or more than RERANK_RELATIVE_MARGIN
+    below the best candidate, are dropped. Of the remaining top n_results,
+    those within RERANK_AMBIGUITY_MARGIN of the cut-off (at most
+    RERANK_MAX_AMBIGUOUS) are reported as ambiguous so the caller can confirm
+    them, e.g. with the LLM.
+
+    Args:
+        query: Semantic part of the user's query (empty for image queries).
+        image_ids: Candidate image IDs.
+        metadatas: Candidate metadata, aligned with image_ids.
+        similarities: Cosine similarities to the query embedding, aligned with image_ids.
+        n_results: Maximum number of images to keep.
+
+    Returns:
+        Tuple[List[RankedImage], List[RankedImage]]: Confident and ambiguous images,
+        each ordered best first.
+    """
+    if not image_ids:
+        return [], []
+
+    scores = np.asarray(similarities, dtype=np.float32).copy()
+    terms = query_terms(query)
+    if terms:
+        descriptions = [meta.get("description", "") for meta in metadatas]
+        tags = [f"{meta.get('tags', '')} {meta.get('user_tags', '')}".replace(",", " ") for meta in metadatas]
+        scores += RERANK_KEYWORD_WEIGHT * _term_matrix(terms, descriptions).mean(axis=1)
+        scores += RERANK_TAG_WEIGHT * _term_matrix(terms, tags).mean(axis=1)
+
+    order = np.argsort(-scores, kind="stable")
+    cutoff = max(RERANK_MIN_SCORE, float(scores[order[0]]) - RERANK_RELATIVE_MARGIN)
+    kept = [i for i in order[:n_results] if scores[i] >= cutoff]
+
+    confident = [i for i in kept if scores[i] >= cutoff + RERANK_AMBIGUITY_MARGIN]
+    # Borderline candidates beyond RERANK_MAX_AMBIGUOUS are the weakest ones and are dropped
+    ambiguous = [i for i in kept if scores[i] < cutoff + RERANK_AMBIGUITY_MARGIN][:RERANK_MAX_AMBIGUOUS]
+    return (
+        [RankedImage(id=image_ids[i], metadata=metadatas[i], score=float(scores[i])) for i in confident],
+        [RankedImage(id=image_ids[i], metadata=metadatas[i], score=float(scores[i])) for i in ambiguous],
+    )
@@ -0,0 +1,216 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Optional, TypeVar
+
+from conversational_photo_gallery.services.metrics import CIRCUIT_TRANSITIONS, HEDGED_REQUESTS, RETRIES
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class CallTimeoutError(RuntimeError):
+    """Raised when no attempt of a call finishes within its timeout."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until it has had time to recover.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are rejected for `reset_timeout` seconds. The next call is then let
+    through as a probe (half-open): success closes the circuit, failure opens
+    it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset timeout has passed."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+            return self._state
+
+    def allow(self) -> bool:
+        """Return whether a call may proceed; in half-open state only one probe is allowed."""
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit at the threshold or after a failed probe."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != self.OPEN:
+                    self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        """Change state (caller holds the lock)."""
+        self._state = state
+        CIRCUIT_TRANSITIONS.inc(circuit=self.name, state=state)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one latency sample."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int) -> Optional[float]:
+        """Return the given percentile, or None until min_samples have been recorded."""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class ResilientCaller:
+    """Runs calls to a remote dependency with timeouts, retries, hedging and a circuit breaker.
+
+    Each attempt runs on a worker thread and is abandoned after `timeout`
+    seconds. If an attempt has not finished by the recent p95 latency, one
+    duplicate request is sent and whichever answers first wins. Failed
+    attempts are retried with exponential backoff and full jitter as long as
+    `retryable` accepts the error and the circuit stays closed.
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        timeout: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge_delay: float,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        retryable: Callable[[Exception], bool] = lambda error: True,
+        max_workers: int = 16,
+    ) -> None:
+        self.breaker = breaker
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.latencies = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=breaker.name)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before sending a duplicate request (0 disables hedging)."""
+        if self.default_hedge_delay <= 0:
+            return 0.0
+        observed = self.latencies.percentile(self.hedge_percentile, self.hedge_min_samples)
+        return observed if observed is not None else self.default_hedge_delay
+
+    def call(self, fn: Callable[[], T], name: str = "call") -> T:
+        """Run fn with the configured resilience policy.
+
+        Args:
+            fn: The call to make; it must be safe to run more than once.
+            name: Label for the retry metrics.
+
+        Returns:
+            T: The first successful result.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            Exception: The last error once retries are exhausted or the error is not retryable.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit '{self.breaker.name}' is open")
+            if attempt:
+                RETRIES.inc(call=name)
+            try:
+                result = self._hedged(fn)
+            except Exception as error:
+                if not self.retryable(error):
+                    # The dependency answered, so the request itself is at fault
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _hedged(self, fn: Callable[[], T]) -> T:
+        """Run one attempt, sending a single duplicate request if it is slower than the hedge delay."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        hedge_delay = self.hedge_delay()
+        hedge_at = start + hedge_delay if hedge_delay else None
+        pending = {self._executor.submit(fn)}
+        error: Optional[Exception] = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_until = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latencies.record(time.monotonic() - start)
+                return result
+            if hedge_at is not None and time.monotonic() >= hedge_at and pending:
+                HEDGED_REQUESTS.inc(circuit=self.breaker.name)
+                pending.add(self._executor.submit(fn))
+                hedge_at = None
+
+        if error is not None and not pending:
+            raise error
+        raise CallTimeoutError(f"No response within {self.timeout}s")
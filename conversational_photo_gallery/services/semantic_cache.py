@@ -0,0 +1,193 @@
+"""Semantic cache of chat search responses.
+
+Users phrase the same search many ways ("cake pics", "show me cakes"), so
+responses are cached under the CLIP text embedding of the query and reused
+for any later query whose embedding is close enough (cosine similarity of
+at least SEMANTIC_CACHE_THRESHOLD) and whose structured filters are equal.
+Cached queries are found with random-hyperplane LSH, so a lookup compares
+the query with a few candidates instead of every entry. The whole cache is
+dropped when the metadata index reports a new collection version.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from conversational_photo_gallery.config import (
+    SEMANTIC_CACHE_LSH_BITS,
+    SEMANTIC_CACHE_LSH_TABLES,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from conversational_photo_gallery.services.metrics import record_cache
+from conversational_photo_gallery.services.query_filters import QueryFilters
+
+
+@dataclass
+class CachedResponse:
+    """A chat search response that can be replayed for a similar query."""
+
+    image_ids: List[str]
+    images: List[str]
+    response: str
+
+
+@dataclass
+class _Entry:
+    key: Tuple
+    vector: np.ndarray
+    codes: Tuple[int, ...]
+    value: CachedResponse
+
+
+def filter_key(filters: QueryFilters) -> Tuple:
+    """Return the part of the filters that must match exactly for a cached response to apply."""
+    return (
+        tuple(sorted(filters.tags)),
+        tuple(sorted(filters.colors)),
+        tuple(sorted(filters.phrases)),
+        filters.start,
+        filters.end,
+        filters.near,
+        filters.area,
+    )
+
+
+class SemanticCache:
+    """Bounded LRU cache of chat responses keyed by approximate query embedding."""
+
+    def __init__(
+        self,
+        version_source: Callable[[], int],
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_SIZE,
+        n_tables: int = SEMANTIC_CACHE_LSH_TABLES,
+        n_bits: int = SEMANTIC_CACHE_LSH_BITS,
+        seed: int = 0,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            version_source: Returns the current collection version; entries stored under
+                another version are discarded.
+            threshold: Minimum cosine similarity for a cached query to match.
+            max_entries: Maximum number of cached queries (0 disables the cache).
+            n_tables: Number of LSH hash tables; more tables find more near neighbours.
+            n_bits: Hyperplanes per table; more bits make each bucket more selective.
+            seed: Seed of the random hyperplanes.
+        """
+        self.version_source = version_source
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None
+        self._powers = 1 << np.arange(n_bits, dtype=np.int64)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(n_tables)]
+        self._next_id = 0
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _normalize(self, embedding: List[float]) -> Optional[np.ndarray]:
+        """Return the unit-length embedding, or None for a zero vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _codes(self, vector: np.ndarray) -> Tuple[int, ...]:
+        """Hash a unit vector to one bucket per table (the sign pattern of its hyperplane projections)."""
+        if self._planes is None or self._planes.shape[2] != vector.shape[0]:
+            self._planes = self._rng.standard_normal((self.n_tables, self.n_bits, vector.shape[0])).astype(np.float32)
+            self._clear()
+        signs = (self._planes @ vector) > 0
+        return tuple(int(code) for code in signs.astype(np.int64) @ self._powers)
+
+    def _clear(self) -> None:
+        """Drop every entry; the caller holds the lock."""
+        self._entries.clear()
+        self._buckets = [{} for _ in range(self.n_tables)]
+
+    def _sync_version(self) -> None:
+        """Drop every entry if the collection changed since they were stored; the caller holds the lock."""
+        version = self.version_source()
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def _remove(self, entry_id: int) -> None:
+        """Remove one entry and its bucket memberships; the caller holds the lock."""
+        entry = self._entries.pop(entry_id)
+        for table, code in zip(self._buckets, entry.codes):
+            bucket = table[code]
+            bucket.discard(entry_id)
+            if not bucket:
+                del table[code]
+
+    def lookup(self, embedding: List[float], filters: QueryFilters) -> Optional[CachedResponse]:
+        """Return the cached response of the most similar query, if it is similar enough.
+
+        Args:
+            embedding: CLIP text embedding of the query's semantic part.
+            filters: Structured filters parsed from the query.
+
+        Returns:
+            Optional[CachedResponse]: The cached response, or None on a miss.
+        """
+        if self.max_entries <= 0:
+            return None
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        key = filter_key(filters)
+        with self._lock:
+            self._sync_version()
+            codes = self._codes(vector)
+            candidates: Set[int] = set()
+            for table, code in zip(self._buckets, codes):
+                candidates.update(table.get(code, ()))
+            best_id, best_similarity = None, self.threshold
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.key != key:
+                    continue
+                similarity = float(entry.vector @ vector)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                record_cache("semantic_response", False)
+                return None
+            self._entries.move_to_end(best_id)
+            record_cache("semantic_response", True)
+            return self._entries[best_id].value
+
+    def store(self, embedding: List[float], filters: QueryFilters, value: CachedResponse) -> None:
+        """Cache a response under a query embedding, evicting the least recently used entry if full.
+
+        Args:
+            embedding: CLIP text embedding of the query's semantic part.
+            filters: Structured filters parsed from the query.
+            value: The response to replay for similar queries.
+        """
+        if self.max_entries <= 0:
+            return
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            self._sync_version()
+            codes = self._codes(vector)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(filter_key(filters), vector, codes, value)
+            for table, code in zip(self._buckets, codes):
+                table.setdefault(code, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,268 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from conversational_photo_gallery.config import (
+    SESSION_LOCK_TTL,
+    SESSION_LOCK_WAIT,
+    SESSION_MAX_MESSAGES,
+    SESSION_STORE_PATH,
+    SESSION_TTL,
+)
+
+History = List[Dict[str, str]]
+
+
+class SessionLockTimeout(RuntimeError):
+    """Raised when a session stays locked by another request for too long."""
+
+
+class SessionLeaseLost(RuntimeError):
+    """Raised when a chat turn outlives its session lease, so its history is not saved."""
+
+
+def encode_history(history: History) -> bytes:
+    """Serialize a conversation history as zlib-compressed compact JSON.
+
+    Histories longer than SESSION_MAX_MESSAGES keep the greeting and the most
+    recent messages.
+    """
+    if len(history) > SESSION_MAX_MESSAGES:
+        history = history[:1] + history[-(SESSION_MAX_MESSAGES - 1):]
+    return zlib.compress(json.dumps(history, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def decode_history(data: bytes) -> History:
+    """Inverse of encode_history."""
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class SessionStore(ABC):
+    """Conversation histories shared by every worker process, with per-session locking.
+
+    Implementations only store bytes and leases; `session()` combines them so
+    that one chat turn reads, updates and writes a history atomically with
+    respect to other turns of the same session, in any process or node.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[History]:
+        """Return the stored history of a session, or None if there is none."""
+
+    @abstractmethod
+    def save(self, session_id: str, history: History, owner: Optional[str] = None) -> bool:
+        """Store the history of a session; with `owner`, only while that owner holds the session lease.
+
+        Returns:
+            bool: Whether the history was stored.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Forget a session."""
+
+    @abstractmethod
+    def acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        """Try to take the session lease for `ttl` seconds; return whether it was taken."""
+
+    @abstractmethod
+    def release(self, session_id: str, owner: str) -> None:
+        """Give back a lease taken by `owner`."""
+
+    @contextmanager
+    def lock(self, session_id: str, wait: float = SESSION_LOCK_WAIT, ttl: float = SESSION_LOCK_TTL) -> Iterator[str]:
+        """Hold the session lease, waiting up to `wait` seconds for it, and yield the lease owner.
+
+        The lease expires after `ttl` seconds so a crashed worker cannot block
+        a session forever.
+
+        Raises:
+            SessionLockTimeout: If the lease could not be taken in time.
+        """
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        delay = 0.01
+        while not self.acquire(session_id, owner, ttl):
+            if time.monotonic() >= deadline:
+                raise SessionLockTimeout(f"Session {session_id} is busy")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+        try:
+            yield owner
+        finally:
+            self.release(session_id, owner)
+
+    @contextmanager
+    def session(self, session_id: str, initial: History) -> Iterator[History]:
+        """Lock a session and yield its history; the history is saved if the block succeeds.
+
+        The history is only saved while the lease is still held, so a turn that
+        ran past SESSION_LOCK_TTL cannot overwrite the history of a turn that
+        took the session over in the meantime.
+
+        Args:
+            session_id: ID of the session (from the session cookie).
+            initial: History to start from when the session does not exist yet.
+
+        Raises:
+            SessionLockTimeout: If another request holds the session for too long.
+            SessionLeaseLost: If the lease expired before the block finished.
+        """
+        with self.lock(session_id) as owner:
+            stored = self.load(session_id)
+            history = stored if stored is not None else [dict(message) for message in initial]
+            yield history
+            if not self.save(session_id, history, owner):
+                raise SessionLeaseLost(f"Session {session_id} lease expired before the turn finished")
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a local SQLite file, shared by all workers on one host."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        history BLOB NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+    CREATE TABLE IF NOT EXISTS session_leases (
+        id TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: str = str(SESSION_STORE_PATH)) -> None:
+        """Open (and create if needed) the session database.
+
+        Args:
+            path: Path to the SQLite database file.
+
+        Raises:
+            RuntimeError: If the database cannot be opened.
+        """
+        try:
+            self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(self.SCHEMA)
+            self._db_lock = threading.Lock()
+            self.purge_expired()
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Session store initialization failed: {e}")
+
+    def load(self, session_id: str) -> Optional[History]:
+        with self._db_lock:
+            row = self.connection.execute("SELECT history FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return decode_history(row[0]) if row else None
+
+    def save(self, session_id: str, history: History, owner: Optional[str] = None) -> bool:
+        now = time.time()
+        upsert = "ON CONFLICT(id) DO UPDATE SET history = excluded.history, updated_at = excluded.updated_at"
+        with self._db_lock, self.connection:
+            if owner is None:
+                cursor = self.connection.execute(
+                    f"INSERT INTO sessions (id, history, updated_at) VALUES (?, ?, ?) {upsert}",
+                    (session_id, encode_history(history), now),
+                )
+            else:
+                # The lease check and the write are one statement, so no other worker can take the lease in between
+                cursor = self.connection.execute(
+                    "INSERT INTO sessions (id, history, updated_at) SELECT ?, ?, ? WHERE EXISTS ("
+                    "SELECT 1 FROM session_leases WHERE id = ? AND owner = ? AND expires_at >= ?"
+                    f") {upsert}",
+                    (session_id, encode_history(history), now, session_id, owner, now),
+                )
+            return cursor.rowcount == 1
+
+    def delete(self, session_id: str) -> None:
+        with self._db_lock, self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._db_lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO session_leases (id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE session_leases.expires_at < ?",
+                (session_id, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, session_id: str, owner: str) -> None:
+        with self._db_lock, self.connection:
+            self.connection.execute("DELETE FROM session_leases WHERE id = ? AND owner = ?", (session_id, owner))
+
+    def purge_expired(self, ttl: float = SESSION_TTL) -> int:
+        """Delete sessions idle for longer than `ttl` seconds and expired leases.
+
+        Returns:
+            int: Number of sessions deleted.
+        """
+        now = time.time()
+        with self._db_lock, self.connection:
+            self.connection.execute("DELETE FROM session_leases WHERE expires_at < ?", (now,))
+            return self.connection.execute("DELETE FROM sessions WHERE updated_at < ?", (now - ttl,)).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """Session store in Redis, shared by workers on several hosts (requires the `redis` package)."""
+
+    # Delete the lease only if this owner still holds it
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    # Store the history (KEYS[2]) only if this owner still holds the lease (KEYS[1])
+    SAVE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "redis.call('set', KEYS[2], ARGV[2], 'EX', ARGV[3]) return 1 end return 0"
+    )
+
+    def __init__(self, url: str) -> None:
+        """Connect to Redis.
+
+        Args:
+            url: Redis URL (e.g., 'redis://localhost:6379/0').
+
+        Raises:
+            RuntimeError: If the redis package is missing or the connection fails.
+        """
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RedisSessionStore requires the 'redis' package (pip install redis)")
+        try:
+            self.client = redis.Redis.from_url(url)
+            self.client.ping()
+            self._release = self.client.register_script(self.RELEASE_SCRIPT)
+            self._save = self.client.register_script(self.SAVE_SCRIPT)
+        except Exception as e:
+            raise RuntimeError(f"Session store initialization failed: {e}")
+
+    def load(self, session_id: str) -> Optional[History]:
+        data = self.client.get(f"chat:session:{session_id}")
+        return decode_history(data) if data is not None else None
+
+    def save(self, session_id: str, history: History, owner: Optional[str] = None) -> bool:
+        if owner is None:
+            return bool(self.client.set(f"chat:session:{session_id}", encode_history(history), ex=int(SESSION_TTL)))
+        return bool(self._save(
+            keys=[f"chat:lease:{session_id}", f"chat:session:{session_id}"],
+            args=[owner, encode_history(history), int(SESSION_TTL)],
+        ))
+
+    def delete(self, session_id: str) -> None:
+        self.client.delete(f"chat:session:{session_id}")
+
+    def acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        return bool(self.client.set(f"chat:lease:{session_id}", owner, nx=True, px=int(ttl * 1000)))
+
+    def release(self, session_id: str, owner: str) -> None:
+        self._release(keys=[f"chat:lease:{session_id}"], args=[owner])
@@ -0,0 +1,466 @@
+"""Sharding of the image collection across several ChromaDB collections.
+
+Images are routed to a shard by rendezvous hashing of their owner (the
+SHARD_KEY_FIELD metadata value) or, without one, of their file name, so
+adding a shard only moves the images that now prefer it. Reads fan out to
+the shards in parallel and merge the results, which keeps every image
+reachable while a rebalance is moving it. The shard list lives in a small
+JSON registry next to the ChromaDB files and is re-read by every process
+when it changes, so shards can be added and rebalanced while the app runs:
+
+    python -m conversational_photo_gallery.services.sharding --add-shard --rebalance
+    python -m conversational_photo_gallery.services.sharding --stats
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os.path import basename
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import chromadb
+
+from conversational_photo_gallery.config import (
+    COLLECTION_NAME,
+    DATABASE_PATH,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_M,
+    HNSW_SEARCH_EF,
+    HNSW_SPACE,
+    SHARD_KEY_FIELD,
+    SHARD_QUERY_WORKERS,
+)
+
+# Fan-out pool shared by all sharded collections in the process
+_executor = ThreadPoolExecutor(max_workers=SHARD_QUERY_WORKERS, thread_name_prefix="shard")
+
+
+def _weight(shard: str, key: str) -> int:
+    """Rendezvous hashing weight of a key on a shard."""
+    return int.from_bytes(hashlib.blake2b(f"{shard}\0{key}".encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def hnsw_metadata(
+    space: str = HNSW_SPACE,
+    m: int = HNSW_M,
+    construction_ef: int = HNSW_CONSTRUCTION_EF,
+    search_ef: int = HNSW_SEARCH_EF,
+) -> Dict[str, Any]:
+    """ChromaDB collection metadata that sets the HNSW index parameters."""
+    return {
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+def hnsw_config(collection) -> Dict[str, Any]:
+    """Return the HNSW parameters a collection was actually built with (empty if unknown)."""
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    return {
+        "space": hnsw.get("space"),
+        "M": hnsw.get("max_neighbors"),
+        "construction_ef": hnsw.get("ef_construction"),
+        "search_ef": hnsw.get("ef_search"),
+    } if hnsw else {}
+
+
+# Collections already warned about keeping their search_ef (chromadb < 1.0)
+_search_ef_warned: Set[str] = set()
+
+
+def set_search_ef(collection, search_ef: int) -> None:
+    """Change the search-time candidate list size of an existing collection if it differs.
+
+    M, construction_ef and the distance are fixed when a collection is built,
+    but search_ef can change, so collections created with older settings
+    still follow HNSW_SEARCH_EF. ChromaDB applies it when the index is next
+    loaded, which is why it is set as soon as a shard is opened.
+    """
+    if not hasattr(collection, "configuration"):
+        # chromadb < 1.0 keeps the HNSW settings in the collection metadata, and modify() would replace
+        # all of it (it refuses any 'hnsw:space', and dropping it would change the distance), so the
+        # collection keeps its search_ef
+        metadata = collection.metadata or {}
+        if metadata.get("hnsw:search_ef") != search_ef and collection.name not in _search_ef_warned:
+            _search_ef_warned.add(collection.name)
+            print(
+                f"Collection {collection.name} keeps search_ef {metadata.get('hnsw:search_ef', 'default')} "
+                f"instead of {search_ef}: chromadb < 1.0 cannot change it after creation"
+            )
+        return
+    current = hnsw_config(collection).get("search_ef")
+    if current is not None and current != search_ef:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+
+
+def _empty_result(include: Sequence[str]) -> Dict[str, Any]:
+    """Empty get() result with the requested fields."""
+    return {"ids": [], **{field: [] for field in include}}
+
+
+class ShardRegistry:
+    """Persistent list of the shard collections, shared by all processes through a JSON file."""
+
+    def __init__(self, path: str, base_name: str) -> None:
+        """Load (and create if needed) the registry.
+
+        Args:
+            path: Path to the JSON registry file.
+            base_name: Name of the first shard, i.e. the unsharded collection.
+        """
+        self.path = path
+        self.base_name = base_name
+        self._mtime_ns: Optional[int] = None
+        self._state: Dict[str, Any] = {"shards": [base_name], "rebalancing": False}
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            self._write(self._state)
+
+    def state(self) -> Dict[str, Any]:
+        """Return the current registry, re-reading the file if another process changed it."""
+        with self._lock:
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return dict(self._state)
+            if mtime_ns != self._mtime_ns:
+                with open(self.path, "r", encoding="utf-8") as registry_file:
+                    self._state = json.load(registry_file)
+                self._mtime_ns = mtime_ns
+            return dict(self._state)
+
+    def update(self, **changes: Any) -> Dict[str, Any]:
+        """Change registry fields and persist them atomically."""
+        state = {**self.state(), **changes}
+        with self._lock:
+            self._write(state)
+            self._state = state
+        return state
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        """Replace the registry file in one rename so readers never see a partial file."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as registry_file:
+            json.dump(state, registry_file)
+        os.replace(temporary_path, self.path)
+
+
+class ShardedCollection:
+    """Drop-in stand-in for a ChromaDB collection whose records are spread over several shards.
+
+    Supports the subset of the Collection API used by the app (add, get,
+    update, delete, query, count). Writes go to the shard chosen by
+    rendezvous hashing; reads fan out to all shards in parallel, or only to
+    the owner's shard when a query filters on SHARD_KEY_FIELD and no
+    rebalance is in progress.
+    """
+
+    def __init__(
+        self,
+        db_path: str = str(DATABASE_PATH),
+        base_name: str = COLLECTION_NAME,
+        client: Optional[Any] = None,
+        shard_key_field: str = SHARD_KEY_FIELD,
+        hnsw: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Open the sharded collection.
+
+        Args:
+            db_path: Path to the ChromaDB storage directory (the registry is stored there too).
+            base_name: Name of the first shard; an existing unsharded collection becomes shard 0.
+            client: ChromaDB client (optional, defaults to a persistent client on db_path).
+            shard_key_field: Metadata field whose value routes an image (falls back to the file name).
+            hnsw: HNSW metadata for new shards (optional, defaults to the HNSW_* settings).
+        """
+        self.client = client or chromadb.PersistentClient(path=db_path)
+        self.name = base_name
+        self.shard_key_field = shard_key_field
+        self.hnsw = hnsw or hnsw_metadata()
+        self.registry = ShardRegistry(os.path.join(db_path, f"{base_name}.shards.json"), base_name)
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    # Shard lookup
+
+    def _collection(self, name: str):
+        """Return the ChromaDB collection of a shard, creating it if needed."""
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self.client.get_or_create_collection(name=name, metadata=self.hnsw)
+                set_search_ef(collection, self.hnsw["hnsw:search_ef"])
+                self._collections[name] = collection
+            return collection
+
+    def shard_names(self) -> List[str]:
+        """Names of the current shards."""
+        return list(self.registry.state()["shards"])
+
+    def route(
+        self, image_id: str, metadata: Optional[Dict[str, Any]] = None, shards: Optional[List[str]] = None
+    ) -> str:
+        """Return the shard an image belongs on."""
+        key = (metadata or {}).get(self.shard_key_field) or basename(image_id)
+        shards = shards or self.shard_names()
+        return max(shards, key=lambda shard: _weight(shard, str(key)))
+
+    def _read_shards(self, where: Optional[Dict[str, Any]]) -> List[str]:
+        """Shards a read must visit: the owner's shard when the filter pins one, otherwise all."""
+        state = self.registry.state()
+        owner = (where or {}).get(self.shard_key_field)
+        if isinstance(owner, str) and not state.get("rebalancing"):
+            return [self.route("", {self.shard_key_field: owner}, state["shards"])]
+        return list(state["shards"])
+
+    def _fan_out(self, shards: List[str], call: Callable[[Any], Any]) -> List[Any]:
+        """Run call on every shard's collection in parallel and return the results in shard order."""
+        if len(shards) == 1:
+            return [call(self._collection(shards[0]))]
+        futures = [_executor.submit(call, self._collection(shard)) for shard in shards]
+        return [future.result() for future in futures]
+
+    def _locate(self, ids: List[str]) -> Dict[str, List[str]]:
+        """Map each shard to the given IDs it currently holds."""
+        shards = self.shard_names()
+        found = self._fan_out(shards, lambda collection: collection.get(ids=ids, include=[])["ids"])
+        return {shard: shard_ids for shard, shard_ids in zip(shards, found) if shard_ids}
+
+    # Collection API
+
+    def count(self) -> int:
+        """Total number of records over all shards."""
+        return sum(self._fan_out(self.shard_names(), lambda collection: collection.count()))
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Add records, each to the shard it is routed to."""
+        metadatas = metadatas or [{} for _ in ids]
+        shards = self.shard_names()
+        groups: Dict[str, List[int]] = {}
+        for i, (image_id, metadata) in enumerate(zip(ids, metadatas)):
+            groups.setdefault(self.route(image_id, metadata, shards), []).append(i)
+        for shard, positions in groups.items():
+            self._collection(shard).add(
+                ids=[ids[i] for i in positions],
+                embeddings=[embeddings[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions],
+                **{key: [value[i] for i in positions] for key, value in kwargs.items() if value is not None},
+            )
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict[str, Any]:
+        """Fetch records from all relevant shards.
+
+        Pages (limit/offset) walk the shards in registry order. A record
+        being moved by a rebalance is returned once.
+        """
+        include = list(include)
+        shards = self._read_shards(where)
+        if (limit is None and not offset) or ids is not None or where is not None:
+            parts = self._fan_out(shards, lambda collection: collection.get(ids=ids, where=where, include=include))
+            result = self._merge(parts, include)
+            if limit is None and not offset:
+                return result
+            page = slice(offset or 0, None if limit is None else (offset or 0) + limit)
+            return {field: values[page] for field, values in result.items()}
+
+        # Pages over the whole collection walk the shards in registry order, skipping whole shards by size
+        result, skip = _empty_result(include), offset or 0
+        for shard in shards:
+            collection = self._collection(shard)
+            size = collection.count()
+            if skip >= size:
+                skip -= size
+                continue
+            remaining = None if limit is None else limit - len(result["ids"])
+            result = self._merge([result, collection.get(include=include, limit=remaining, offset=skip)], include)
+            skip = 0
+            if limit is not None and len(result["ids"]) >= limit:
+                break
+        return result
+
+    def update(
+        self,
+        ids: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+    ) -> None:
+        """Update records on whichever shards hold them."""
+        positions = {image_id: i for i, image_id in enumerate(ids)}
+        for shard, shard_ids in self._locate(ids).items():
+            kwargs: Dict[str, Any] = {}
+            if metadatas is not None:
+                kwargs["metadatas"] = [metadatas[positions[image_id]] for image_id in shard_ids]
+            if embeddings is not None:
+                kwargs["embeddings"] = [embeddings[positions[image_id]] for image_id in shard_ids]
+            self._collection(shard).update(ids=shard_ids, **kwargs)
+
+    def delete(self, ids: List[str]) -> None:
+        """Delete records from whichever shards hold them."""
+        for shard, shard_ids in self._locate(ids).items():
+            self._collection(shard).delete(ids=shard_ids)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, Any]:
+        """Query the relevant shards in parallel and merge their hits by distance."""
+        include = list(include)
+        if "distances" not in include:
+            include.append("distances")
+        shards = self._read_shards(where)
+
+        def query_shard(collection):
+            # HNSW cannot return more results than a shard holds
+            size = collection.count()
+            if not size:
+                return None
+            return collection.query(
+                query_embeddings=query_embeddings, n_results=min(n_results, size), where=where, include=include
+            )
+
+        parts = [part for part in self._fan_out(shards, query_shard) if part is not None]
+        fields = ["ids"] + include
+        merged: Dict[str, List[List[Any]]] = {field: [] for field in fields}
+        for q in range(len(query_embeddings)):
+            hits: Dict[str, Dict[str, Any]] = {}
+            for part in parts:
+                for i, image_id in enumerate(part["ids"][q]):
+                    hit = {field: part[field][q][i] for field in fields if part.get(field) is not None}
+                    if image_id not in hits or hit["distances"] < hits[image_id]["distances"]:
+                        hits[image_id] = hit
+            best = sorted(hits.values(), key=lambda hit: hit["distances"])[:n_results]
+            for field in fields:
+                merged[field].append([hit.get(field) for hit in best])
+        return merged
+
+    @staticmethod
+    def _merge(parts: List[Dict[str, Any]], include: Sequence[str]) -> Dict[str, Any]:
+        """Concatenate get() results, keeping the first copy of a duplicated ID."""
+        result = _empty_result(include)
+        seen = set()
+        for part in parts:
+            for i, image_id in enumerate(part["ids"]):
+                if image_id in seen:
+                    continue
+                seen.add(image_id)
+                result["ids"].append(image_id)
+                for field in include:
+                    values = part.get(field)
+                    result[field].append(values[i] if values is not None else None)
+        return result
+
+    # Shard management
+
+    def add_shard(self) -> str:
+        """Create a new empty shard and start routing writes to it.
+
+        Reads keep fanning out to every shard until rebalance() has moved the
+        images that now belong on the new shard.
+
+        Returns:
+            str: Name of the new shard.
+        """
+        shards = self.shard_names()
+        name = f"{self.name}_shard_{len(shards)}"
+        self._collection(name)
+        self.registry.update(shards=shards + [name], rebalancing=True)
+        return name
+
+    def rebalance(self, batch_size: int = 500) -> int:
+        """Move every record to the shard it is routed to, in batches, while the app keeps serving.
+
+        Each record is copied to its new shard before it is deleted from the
+        old one, so it is always reachable by the fan-out reads.
+
+        Args:
+            batch_size: Records read per page.
+
+        Returns:
+            int: Number of records moved.
+
+        Raises:
+            RuntimeError: If reading or writing a shard fails.
+        """
+        self.registry.update(rebalancing=True)
+        shards = self.shard_names()
+        moved = 0
+        try:
+            for shard in shards:
+                source = self._collection(shard)
+                offset = 0
+                while True:
+                    page = source.get(
+                        include=["embeddings", "metadatas", "documents"], limit=batch_size, offset=offset
+                    )
+                    if not len(page["ids"]):
+                        break
+                    moving: Dict[str, List[int]] = {}
+                    for i, (image_id, metadata) in enumerate(zip(page["ids"], page["metadatas"])):
+                        target = self.route(image_id, metadata, shards)
+                        if target != shard:
+                            moving.setdefault(target, []).append(i)
+                    for target, positions in moving.items():
+                        documents = page.get("documents")
+                        self._collection(target).upsert(
+                            ids=[page["ids"][i] for i in positions],
+                            embeddings=[page["embeddings"][i] for i in positions],
+                            metadatas=[page["metadatas"][i] for i in positions],
+                            documents=[documents[i] for i in positions] if documents is not None else None,
+                        )
+                        source.delete(ids=[page["ids"][i] for i in positions])
+                        moved += len(positions)
+                    # Moved records left the page, so only the kept ones advance the offset
+                    offset += len(page["ids"]) - sum(len(positions) for positions in moving.values())
+        except Exception as e:
+            raise RuntimeError(f"Rebalance failed after moving {moved} records: {e}")
+        self.registry.update(rebalancing=False)
+        return moved
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the record count and HNSW parameters of each shard and whether a rebalance is pending."""
+        state = self.registry.state()
+        counts = self._fan_out(list(state["shards"]), lambda collection: collection.count())
+        return {
+            "shards": dict(zip(state["shards"], counts)),
+            "total": sum(counts),
+            "rebalancing": bool(state.get("rebalancing")),
+            "hnsw": {shard: hnsw_config(self._collection(shard)) for shard in state["shards"]},
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the shards of the image collection.")
+    parser.add_argument("--add-shard", action="store_true", help="create a new shard")
+    parser.add_argument("--rebalance", action="store_true", help="move images to the shard they are routed to")
+    parser.add_argument("--stats", action="store_true", help="print the number of images per shard")
+    args = parser.parse_args()
+
+    sharded = ShardedCollection()
+    if args.add_shard:
+        print(f"Added shard {sharded.add_shard()}")
+    if args.rebalance:
+        print(f"Moved {sharded.rebalance()} images")
+    if args.stats or not (args.add_shard or args.rebalance):
+        print(json.dumps(sharded.stats(), indent=2))
@@ -0,0 +1,545 @@
+"""Compact snapshots of the image collection for bootstrapping replicas.
+
+A snapshot is a directory holding
+
+    manifest.json      format, snapshot ID, base snapshot (deltas), counts and SHA-256 of every file
+    ids.json           image IDs relative to IMAGE_DIR, one per embedding row
+    embeddings.npy     contiguous (rows x dimensions) float16 matrix of unit-length CLIP embeddings
+    metadata.json.gz   metadata in columnar form: one list per key, aligned with the ID table
+    deleted.json       IDs removed since the base snapshot (always empty for a full snapshot)
+
+Exports read the live collection page by page and retry when the metadata
+index version moves while they read, so a snapshot never mixes states. A
+delta snapshot only holds the images added or changed since its base plus
+the deleted IDs, and refers to the base by its snapshot ID (the base is
+looked up in a sibling directory).
+
+SnapshotCollection memory-maps a snapshot and its chain of bases and
+serves the read half of the collection API from it, so a new node can
+answer chat and gallery queries seconds after the files arrive; start the
+app with SNAPSHOT_PATH=<snapshot directory> to use it. restore_snapshot
+loads a snapshot into a writable ChromaDB instead:
+
+    python -m conversational_photo_gallery.services.snapshot --export
+    python -m conversational_photo_gallery.services.snapshot --export --base snapshots/<ID>
+    python -m conversational_photo_gallery.services.snapshot --verify snapshots/<ID>
+    python -m conversational_photo_gallery.services.snapshot --restore snapshots/<ID>
+
+Image files are not part of a snapshot and have to be synced separately.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from conversational_photo_gallery.config import (
+    IMAGE_DIR,
+    SNAPSHOT_DIR,
+    SNAPSHOT_EXPORT_ATTEMPTS,
+    SNAPSHOT_INDEX_DIR,
+    SNAPSHOT_QUERY_CHUNK,
+)
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+
+if TYPE_CHECKING:
+    from conversational_photo_gallery.services import database_manager
+
+# Version of the on-disk layout, bumped on incompatible changes
+SNAPSHOT_FORMAT = 1
+
+MANIFEST_FILE = "manifest.json"
+IDS_FILE = "ids.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json.gz"
+DELETED_FILE = "deleted.json"
+
+# Records read per page from the live collection
+EXPORT_PAGE_SIZE = 1000
+
+
+def _sha256(path: Path) -> str:
+    """Return the hex SHA-256 of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _unit_float16(embeddings: Any) -> np.ndarray:
+    """Normalize embeddings to unit length and convert them to float16 rows."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix = matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float16)
+
+
+def read_manifest(path: Union[str, Path]) -> Dict[str, Any]:
+    """Return the manifest of a snapshot directory.
+
+    Raises:
+        ValueError: If the manifest is missing, unreadable or of another format.
+    """
+    try:
+        manifest = json.loads((Path(path) / MANIFEST_FILE).read_text())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read the snapshot manifest in {path}: {e}")
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Snapshot {path} has format {manifest.get('format')}, expected {SNAPSHOT_FORMAT}")
+    return manifest
+
+
+def verify_snapshot(path: Union[str, Path]) -> Dict[str, Any]:
+    """Check the size and SHA-256 of every file listed in a snapshot's manifest.
+
+    Returns:
+        Dict[str, Any]: The manifest.
+
+    Raises:
+        ValueError: If a file is missing or does not match its checksum.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    for name, expected in manifest["files"].items():
+        file_path = path / name
+        if not file_path.is_file() or file_path.stat().st_size != expected["bytes"]:
+            raise ValueError(f"Snapshot file {file_path} is missing or has the wrong size")
+        if _sha256(file_path) != expected["sha256"]:
+            raise ValueError(f"Snapshot file {file_path} does not match its checksum")
+    return manifest
+
+
+@dataclass
+class SnapshotLayer:
+    """One snapshot directory, with its embeddings memory-mapped."""
+
+    path: Path
+    manifest: Dict[str, Any]
+    names: List[str]
+    embeddings: np.ndarray
+    columns: Dict[str, List[Any]]
+    deleted: List[str]
+    alive: np.ndarray = field(init=False)
+    _column_arrays: Dict[str, np.ndarray] = field(default_factory=dict, init=False)
+
+    def __post_init__(self) -> None:
+        self.alive = np.ones(len(self.names), dtype=bool)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], verify: bool = True) -> "SnapshotLayer":
+        """Open a snapshot directory, optionally verifying its checksums first.
+
+        Raises:
+            ValueError: If the snapshot is incomplete or corrupt.
+        """
+        path = Path(path)
+        manifest = verify_snapshot(path) if verify else read_manifest(path)
+        try:
+            names = json.loads((path / IDS_FILE).read_text())
+            embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode="r")
+            with gzip.open(path / METADATA_FILE, "rt", encoding="utf-8") as handle:
+                columns = json.load(handle)["columns"]
+            deleted = json.loads((path / DELETED_FILE).read_text())
+        except (OSError, ValueError, KeyError) as e:
+            raise ValueError(f"Cannot read snapshot {path}: {e}")
+        if len(embeddings) != len(names) or any(len(values) != len(names) for values in columns.values()):
+            raise ValueError(f"Snapshot {path} has tables of different lengths")
+        return cls(path, manifest, names, embeddings, columns, deleted)
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """Return the metadata of one row (keys it has no value for are left out)."""
+        return {key: values[row] for key, values in self.columns.items() if values[row] is not None}
+
+    def column(self, key: str) -> np.ndarray:
+        """Return one metadata column as an object array (None where a row has no value)."""
+        array = self._column_arrays.get(key)
+        if array is None:
+            values = self.columns.get(key)
+            array = np.empty(len(self.names), dtype=object)
+            if values is not None:
+                array[:] = values
+            self._column_arrays[key] = array
+        return array
+
+
+def _where_mask(layer: SnapshotLayer, where: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Rows of a layer that are alive and match an equality filter ({key: value} or {key: {'$eq': value}}).
+
+    Raises:
+        ValueError: If the filter uses another operator.
+    """
+    mask = layer.alive.copy()
+    for key, condition in (where or {}).items():
+        if isinstance(condition, dict):
+            if set(condition) != {"$eq"}:
+                raise ValueError(f"Snapshot collections only support equality filters, got {where}")
+            condition = condition["$eq"]
+        mask &= layer.column(key) == condition
+    return mask
+
+
+class SnapshotCollection:
+    """Read-only stand-in for the image collection, served from a memory-mapped snapshot chain.
+
+    Supports the read half of the Collection API used by the app (get,
+    query, count); writes raise RuntimeError. Queries are exact cosine
+    searches over the float16 embeddings.
+    """
+
+    def __init__(self, path: Union[str, Path], image_dir: str = str(IMAGE_DIR), verify: bool = True) -> None:
+        """Open a snapshot and the chain of bases it is a delta against.
+
+        Args:
+            path: Snapshot directory (full or delta).
+            image_dir: Directory the stored IDs are relative to.
+            verify: Check every file's checksum before serving it.
+
+        Raises:
+            ValueError: If a snapshot of the chain is missing, incomplete or corrupt.
+        """
+        self.image_dir = image_dir
+        self.layers: List[SnapshotLayer] = []
+        current: Optional[Path] = Path(path)
+        while current is not None:
+            layer = SnapshotLayer.load(current, verify)
+            self.layers.insert(0, layer)
+            base = layer.manifest.get("base")
+            current = current.parent / base if base else None
+
+        # Later layers replace the rows of earlier ones and remove deleted IDs
+        self._rows: Dict[str, Tuple[int, int]] = {}
+        for position, layer in enumerate(self.layers):
+            for name in layer.deleted + layer.names:
+                previous = self._rows.pop(name, None)
+                if previous is not None:
+                    self.layers[previous[0]].alive[previous[1]] = False
+            for row, name in enumerate(layer.names):
+                self._rows[name] = (position, row)
+        self.dimensions = next((layer.embeddings.shape[1] for layer in self.layers if len(layer.names)), 0)
+
+    @property
+    def snapshot_id(self) -> str:
+        """ID of the newest snapshot of the chain."""
+        return self.layers[-1].manifest["snapshot_id"]
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        """Manifest of the newest snapshot of the chain."""
+        return self.layers[-1].manifest
+
+    def _id(self, name: str) -> str:
+        return os.path.join(self.image_dir, name)
+
+    def _name(self, image_id: str) -> str:
+        return os.path.relpath(image_id, self.image_dir) if os.path.isabs(image_id) else image_id
+
+    def _positions(self) -> List[Tuple[int, int]]:
+        """(layer, row) of every image in the snapshot, in row order."""
+        return [
+            (position, int(row)) for position, layer in enumerate(self.layers) for row in np.flatnonzero(layer.alive)
+        ]
+
+    def names(self) -> List[str]:
+        """IDs (relative to image_dir) of every image in the snapshot."""
+        return list(self._rows)
+
+    def record(self, name: str) -> Optional[Tuple[Dict[str, Any], np.ndarray]]:
+        """Return the metadata and float16 embedding of an image by relative ID (None if absent)."""
+        position = self._rows.get(name)
+        if position is None:
+            return None
+        layer = self.layers[position[0]]
+        return layer.metadata(position[1]), layer.embeddings[position[1]]
+
+    def _records(self, positions: List[Tuple[int, int]], include: Sequence[str]) -> Dict[str, Any]:
+        """Build a get() result for (layer, row) positions."""
+        result: Dict[str, Any] = {"ids": [self._id(self.layers[layer].names[row]) for layer, row in positions]}
+        if "metadatas" in include:
+            result["metadatas"] = [self.layers[layer].metadata(row) for layer, row in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [
+                np.asarray(self.layers[layer].embeddings[row], dtype=np.float32) for layer, row in positions
+            ]
+        if "documents" in include:
+            result["documents"] = [None] * len(positions)
+        return result
+
+    # Collection API
+
+    def count(self) -> int:
+        """Number of images in the snapshot."""
+        return len(self._rows)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+    ) -> Dict[str, Any]:
+        """Fetch images by ID and/or equality filter; pages walk the snapshot in row order."""
+        if ids is not None:
+            positions = [self._rows[name] for name in map(self._name, ids) if name in self._rows]
+        else:
+            positions = self._positions()
+        if where:
+            masks = [_where_mask(layer, where) for layer in self.layers]
+            positions = [(layer, row) for layer, row in positions if masks[layer][row]]
+        start = offset or 0
+        positions = positions[start:None if limit is None else start + limit]
+        return self._records(positions, include)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, Any]:
+        """Exact cosine search; distances are 1 - cosine similarity, as in a cosine ChromaDB collection."""
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        # Best (score, layer, row) candidates of every layer, per query
+        candidates: List[List[Tuple[float, int, int]]] = [[] for _ in range(len(queries))]
+        for position, layer in enumerate(self.layers):
+            mask = _where_mask(layer, where)
+            if not mask.any():
+                continue
+            scores = np.empty((len(queries), len(layer.names)), dtype=np.float32)
+            for start in range(0, len(layer.names), SNAPSHOT_QUERY_CHUNK):
+                block = np.asarray(layer.embeddings[start:start + SNAPSHOT_QUERY_CHUNK], dtype=np.float32)
+                scores[:, start:start + len(block)] = queries @ block.T
+            scores[:, ~mask] = -np.inf
+            count = min(n_results, int(mask.sum()))
+            top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for q, rows in enumerate(top):
+                candidates[q].extend((float(scores[q, row]), position, int(row)) for row in rows)
+
+        result: Dict[str, List[List[Any]]] = {"ids": [], **{key: [] for key in include}}
+        for hits in candidates:
+            best = sorted(hits, key=lambda hit: -hit[0])[:n_results]
+            records = self._records([(layer, row) for _, layer, row in best], include)
+            for key in result:
+                if key == "distances":
+                    result[key].append([1.0 - score for score, _, _ in best])
+                else:
+                    result[key].append(records[key])
+        return result
+
+    def add(self, *args: Any, **kwargs: Any) -> None:
+        raise RuntimeError("Snapshot collections are read-only")
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        raise RuntimeError("Snapshot collections are read-only")
+
+    def delete(self, *args: Any, **kwargs: Any) -> None:
+        raise RuntimeError("Snapshot collections are read-only")
+
+    def build_metadata_index(self, index_dir: Path = SNAPSHOT_INDEX_DIR) -> MetadataIndex:
+        """Return a SQLite side index of the snapshot, building it on first use.
+
+        Each snapshot ID gets its own index file, so restarting a node on the
+        same snapshot reuses the index it built before.
+
+        Raises:
+            ValueError: If building the index fails.
+        """
+        index_dir.mkdir(parents=True, exist_ok=True)
+        metadata_index = MetadataIndex(str(index_dir / f"{self.snapshot_id}.sqlite3"))
+        if metadata_index.is_empty() and self.count():
+            records = self.get(include=["metadatas"])
+            metadata_index.rebuild(records["ids"], records["metadatas"])
+        return metadata_index
+
+
+def _read_consistent(
+    collection,
+    metadata_index: MetadataIndex,
+    image_dir: str,
+    base: Optional[SnapshotCollection],
+    attempts: int,
+) -> Tuple[int, List[str], List[np.ndarray], List[Dict[str, Any]], List[str]]:
+    """Read the collection (only rows that differ from the base, if any) while no write lands.
+
+    Returns:
+        Tuple: Collection version, relative IDs, float16 embedding blocks, metadatas and deleted IDs.
+
+    Raises:
+        RuntimeError: If the collection changed during every attempt.
+    """
+    for _ in range(attempts):
+        version = metadata_index.version()
+        names: List[str] = []
+        blocks: List[np.ndarray] = []
+        metadatas: List[Dict[str, Any]] = []
+        seen = set()
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                break
+            offset += len(page["ids"])
+            embeddings = _unit_float16(page["embeddings"])
+            keep = []
+            for i, (image_id, metadata) in enumerate(zip(page["ids"], page["metadatas"])):
+                name = os.path.relpath(image_id, image_dir)
+                seen.add(name)
+                previous = base.record(name) if base is not None else None
+                if previous is not None and previous[0] == (metadata or {}) and np.array_equal(
+                    previous[1], embeddings[i]
+                ):
+                    continue
+                keep.append(i)
+                names.append(name)
+                metadatas.append(metadata or {})
+            blocks.append(embeddings[keep])
+        if metadata_index.version() == version:
+            deleted = sorted(set(base.names()) - seen) if base is not None else []
+            return version, names, blocks, metadatas, deleted
+    raise RuntimeError(f"The collection kept changing during {attempts} export attempts")
+
+
+def export_snapshot(
+    collection,
+    metadata_index: MetadataIndex,
+    output_dir: Union[str, Path] = SNAPSHOT_DIR,
+    base: Optional[Union[str, Path]] = None,
+    image_dir: str = str(IMAGE_DIR),
+    attempts: int = SNAPSHOT_EXPORT_ATTEMPTS,
+) -> Dict[str, Any]:
+    """Export a consistent full or delta snapshot of the collection.
+
+    Args:
+        collection: The (sharded) collection to export; it stays writable meanwhile.
+        metadata_index: Side index whose version detects writes during the export.
+        output_dir: Directory the snapshot directory is created in.
+        base: Snapshot to export a delta against (optional; a full snapshot is exported without it).
+            Deltas are written next to their base.
+        image_dir: Directory the stored IDs are made relative to.
+        attempts: Reads to try before giving up when writes keep landing.
+
+    Returns:
+        Dict[str, Any]: The manifest of the new snapshot, plus its 'path'.
+
+    Raises:
+        RuntimeError: If the collection kept changing or writing the snapshot fails.
+        ValueError: If the base snapshot cannot be read.
+    """
+    base_collection = SnapshotCollection(base, image_dir=image_dir) if base else None
+    if base is not None:
+        output_dir = Path(base).parent
+    version, names, blocks, metadatas, deleted = _read_consistent(
+        collection, metadata_index, image_dir, base_collection, attempts
+    )
+    dimensions = next((block.shape[1] for block in blocks if block.size), 0) or (
+        base_collection.dimensions if base_collection else 0
+    )
+    embeddings = np.concatenate([block for block in blocks if len(block)] or [np.zeros((0, dimensions), np.float16)])
+
+    keys = sorted({key for metadata in metadatas for key in metadata})
+    columns = {key: [metadata.get(key) for metadata in metadatas] for key in keys}
+
+    snapshot_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    output_dir = Path(output_dir)
+    target = output_dir / snapshot_id
+    staging = output_dir / f".{snapshot_id}.tmp"
+    try:
+        staging.mkdir(parents=True)
+        np.save(staging / EMBEDDINGS_FILE, embeddings)
+        (staging / IDS_FILE).write_text(json.dumps(names))
+        with gzip.open(staging / METADATA_FILE, "wt", encoding="utf-8") as handle:
+            json.dump({"columns": columns}, handle)
+        (staging / DELETED_FILE).write_text(json.dumps(deleted))
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "snapshot_id": snapshot_id,
+            "kind": "delta" if base_collection else "full",
+            "base": base_collection.snapshot_id if base_collection else None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "collection_version": version,
+            "count": len(names),
+            "deleted": len(deleted),
+            "dimensions": dimensions,
+            "dtype": "float16",
+            "files": {
+                name: {"bytes": (staging / name).stat().st_size, "sha256": _sha256(staging / name)}
+                for name in (IDS_FILE, EMBEDDINGS_FILE, METADATA_FILE, DELETED_FILE)
+            },
+        }
+        # The manifest is written last and the directory renamed into place, so readers never see half a snapshot
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        os.replace(staging, target)
+    except OSError as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise RuntimeError(f"Failed to write snapshot {target}: {e}")
+    return {**manifest, "path": str(target)}
+
+
+def restore_snapshot(
+    path: Union[str, Path],
+    db_manager: "database_manager.DatabaseManager",
+    image_dir: str = str(IMAGE_DIR),
+    batch_size: int = EXPORT_PAGE_SIZE,
+) -> int:
+    """Load a snapshot (and its bases) into a writable ChromaDB collection.
+
+    Images already in the collection are replaced by their snapshot version;
+    images missing from the snapshot are left alone.
+
+    Args:
+        path: Snapshot directory (full or delta).
+        db_manager: Database manager of the target collection and side index.
+        image_dir: Directory the stored IDs are relative to on this node.
+        batch_size: Images written per ChromaDB call.
+
+    Returns:
+        int: Number of images restored.
+
+    Raises:
+        ValueError: If the snapshot is corrupt or a write fails.
+    """
+    snapshot = SnapshotCollection(path, image_dir=image_dir)
+    positions = snapshot._positions()
+    for start in range(0, len(positions), batch_size):
+        records = snapshot._records(positions[start:start + batch_size], ["metadatas", "embeddings"])
+        db_manager.delete_images(records["ids"])
+        db_manager.add_images(
+            records["ids"], [embedding.tolist() for embedding in records["embeddings"]], records["metadatas"]
+        )
+    return len(positions)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from conversational_photo_gallery.services.database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Export, verify and restore collection snapshots.")
+    parser.add_argument("--export", action="store_true", help="export a snapshot of the collection")
+    parser.add_argument("--base", type=Path, default=None, help="export a delta against this snapshot")
+    parser.add_argument("--output", type=Path, default=SNAPSHOT_DIR, help="directory to export full snapshots to")
+    parser.add_argument("--verify", type=Path, default=None, help="check the checksums of a snapshot chain")
+    parser.add_argument("--restore", type=Path, default=None, help="load a snapshot into the local ChromaDB")
+    args = parser.parse_args()
+
+    if args.export:
+        db_manager = DatabaseManager()
+        manifest = export_snapshot(db_manager.collection, db_manager.metadata_index, args.output, args.base)
+        print(f"Exported {manifest['kind']} snapshot {manifest['path']} "
+              f"({manifest['count']} images, {manifest['deleted']} deleted)")
+    if args.verify:
+        snapshot = SnapshotCollection(args.verify)
+        print(f"Snapshot chain of {snapshot.snapshot_id} is intact ({snapshot.count()} images)")
+    if args.restore:
+        print(f"Restored {restore_snapshot(args.restore, DatabaseManager())} images")
@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from conversational_photo_gallery.config import FILTER_OVERFETCH_FACTOR, MAX_PUSHDOWN_CANDIDATES
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+from conversational_photo_gallery.services.query_filters import QueryFilters
+
+
+def score_candidates(
+    collection, query_embedding: List[float], candidate_ids: List[str], n_results: int
+) -> Tuple[List[str], List[Dict[str, str]], np.ndarray]:
+    """Rank a fixed set of images by exact cosine similarity to the query.
+
+    Args:
+        collection: ChromaDB collection holding the candidate embeddings.
+        query_embedding: Embedding vector of the query.
+        candidate_ids: IDs of the images allowed in the result.
+        n_results: Maximum number of results to return.
+
+    Returns:
+        Tuple[List[str], List[Dict[str, str]], np.ndarray]: Ranked image IDs, their
+        metadata and their cosine similarities.
+    """
+    if not candidate_ids:
+        return [], [], np.zeros(0, dtype=np.float32)
+    records = collection.get(ids=candidate_ids, include=["embeddings", "metadatas"])
+    if not len(records["ids"]):
+        return [], [], np.zeros(0, dtype=np.float32)
+
+    embeddings = np.asarray(records["embeddings"], dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+    scores = embeddings @ query / np.maximum(norms, 1e-12)
+
+    top = np.argsort(-scores)[:n_results]
+    return (
+        [records["ids"][i] for i in top],
+        [records["metadatas"][i] for i in top],
+        scores[top],
+    )
+
+
+def rank_candidates(
+    collection, query_embedding: List[float], candidate_ids: List[str], n_results: int
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Rank a fixed set of images by exact cosine similarity to the query.
+
+    Args:
+        collection: ChromaDB collection holding the candidate embeddings.
+        query_embedding: Embedding vector of the query.
+        candidate_ids: IDs of the images allowed in the result.
+        n_results: Maximum number of results to return.
+
+    Returns:
+        Tuple[List[str], List[Dict[str, str]]]: Ranked image IDs and their metadata.
+    """
+    image_ids, metadatas, _ = score_candidates(collection, query_embedding, candidate_ids, n_results)
+    return image_ids, metadatas
+
+
+def search_images(
+    collection,
+    query_embedding: List[float],
+    n_results: int,
+    filters: Optional[QueryFilters] = None,
+    metadata_index: Optional[MetadataIndex] = None,
+) -> Tuple[List[str], List[Dict[str, str]], np.ndarray]:
+    """Run a vector search, pushing structured filters down to the metadata index.
+
+    Selective filters are resolved to candidate IDs first so that only those
+    images are ranked. Filters matching too many images fall back to an
+    over-fetched vector query whose results are then filtered.
+
+    Args:
+        collection: ChromaDB collection instance (cosine space).
+        query_embedding: Embedding vector of the query.
+        n_results: Maximum number of results to return.
+        filters: Structured filters parsed from the query (optional).
+        metadata_index: Side index used to resolve the filters (optional).
+
+    Returns:
+        Tuple[List[str], List[Dict[str, str]], np.ndarray]: Matching image IDs, their
+        metadata and their cosine similarities, best first.
+    """
+    filtered = filters is not None and not filters.is_empty() and metadata_index is not None
+    if filtered:
+        candidate_ids = metadata_index.candidate_ids(filters, limit=MAX_PUSHDOWN_CANDIDATES + 1)
+        if len(candidate_ids) <= MAX_PUSHDOWN_CANDIDATES:
+            return score_candidates(collection, query_embedding, candidate_ids, n_results)
+        n_fetch = n_results * FILTER_OVERFETCH_FACTOR
+    else:
+        n_fetch = n_results
+
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_fetch,
+        include=["metadatas", "distances"],
+    )
+    image_ids, metadatas = results["ids"][0], results["metadatas"][0]
+    # Distances returned for the hits are exact cosine distances
+    scores = 1.0 - np.asarray(results["distances"][0], dtype=np.float32)
+    if not filtered:
+        return image_ids, metadatas, scores
+
+    matching = metadata_index.matching_ids(image_ids, filters)
+    kept = [i for i, img_id in enumerate(image_ids) if img_id in matching][:n_results]
+    return [image_ids[i] for i in kept], [metadatas[i] for i in kept], scores[kept]
+
+
+def query_images(
+    collection,
+    query_embedding: List[float],
+    n_results: int,
+    filters: Optional[QueryFilters] = None,
+    metadata_index: Optional[MetadataIndex] = None,
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Run a vector search with optional structured filters (see search_images).
+
+    Returns:
+        Tuple[List[str], List[Dict[str, str]]]: Matching image IDs and their metadata.
+    """
+    image_ids, metadatas, _ = search_images(collection, query_embedding, n_results, filters, metadata_index)
+    return image_ids, metadatas
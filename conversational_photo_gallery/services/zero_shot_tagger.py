@@ -0,0 +1,158 @@
+"""Local zero-shot tagging of images against a controlled tag vocabulary.
+
+Every TAG_VOCABULARY entry is phrased with TAG_PROMPT_TEMPLATE ('a photo of
+a beach') and embedded once with the CLIP text encoder. The unit-length
+embeddings form a (vocabulary x dimensions) matrix cached in TAG_MATRIX_PATH
+under a fingerprint of the vocabulary, template, model and CLIP precision, so
+it is only recomputed when one of them changes. Tagging an image is then one product of
+that matrix with the image's existing CLIP embedding followed by a top-k and
+a similarity threshold; no extra model pass is needed, and re-tagging the
+whole gallery is a single matrix product per page of stored embeddings.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from conversational_photo_gallery.config import (
+    CLIP_MODEL_NAME,
+    TAG_MATRIX_PATH,
+    TAG_MIN_SIMILARITY,
+    TAG_PROMPT_TEMPLATE,
+    TAG_TOP_K,
+)
+from conversational_photo_gallery.constants import TAG_VOCABULARY
+from conversational_photo_gallery.services.embedding_generator import EmbeddingGenerator, clip_precision
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (zero rows are left as they are)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class ZeroShotTagger:
+    """Assigns vocabulary tags to images from their CLIP embeddings."""
+
+    def __init__(
+        self,
+        embedding_generator: Optional[EmbeddingGenerator] = None,
+        vocabulary: Sequence[str] = TAG_VOCABULARY,
+        prompt_template: str = TAG_PROMPT_TEMPLATE,
+        top_k: int = TAG_TOP_K,
+        min_similarity: float = TAG_MIN_SIMILARITY,
+        cache_path: Optional[Path] = TAG_MATRIX_PATH,
+    ) -> None:
+        """Initialize the tagger; the vocabulary matrix is loaded or computed on first use.
+
+        Args:
+            embedding_generator: CLIP encoder for the vocabulary (optional, created only if
+                the matrix is not cached).
+            vocabulary: Tags to choose from.
+            prompt_template: Phrase each tag is embedded as, with '{}' standing for the tag.
+            top_k: Maximum number of tags per image.
+            min_similarity: Minimum cosine similarity between an image and a tag's phrase.
+            cache_path: File the matrix is cached in (None keeps it in memory only).
+
+        Raises:
+            ValueError: If the vocabulary is empty.
+        """
+        if not vocabulary:
+            raise ValueError("The tag vocabulary is empty")
+        self.embedding_generator = embedding_generator
+        self.vocabulary = list(dict.fromkeys(tag.strip().lower() for tag in vocabulary))
+        self.prompt_template = prompt_template
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.cache_path = cache_path
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self) -> str:
+        """Return a hash of everything the vocabulary matrix depends on."""
+        payload = json.dumps([CLIP_MODEL_NAME, clip_precision(), self.prompt_template, self.vocabulary])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Unit-length text embeddings of the vocabulary, one row per tag.
+
+        Raises:
+            ValueError: If the vocabulary cannot be embedded.
+        """
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = self._load() if self.cache_path else None
+                if self._matrix is None:
+                    self._matrix = self._compute()
+                    if self.cache_path:
+                        self._save(self._matrix)
+            return self._matrix
+
+    def _load(self) -> Optional[np.ndarray]:
+        """Return the cached matrix if it was computed for the current fingerprint."""
+        try:
+            with np.load(self.cache_path) as cached:
+                if str(cached["fingerprint"]) == self.fingerprint():
+                    return cached["matrix"]
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    def _compute(self) -> np.ndarray:
+        """Embed every tag's phrase with the CLIP text encoder."""
+        generator = self.embedding_generator or EmbeddingGenerator()
+        phrases = [self.prompt_template.format(tag) for tag in self.vocabulary]
+        embeddings = np.asarray(generator.generate_text_embeddings(phrases), dtype=np.float32)
+        return _normalize_rows(embeddings)
+
+    def _save(self, matrix: np.ndarray) -> None:
+        """Write the matrix to the cache file; a failed write only costs a recomputation later."""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.cache_path.with_name(f"{self.cache_path.stem}.{os.getpid()}.tmp.npz")
+            np.savez(temporary, matrix=matrix, fingerprint=np.array(self.fingerprint()))
+            # Replace atomically so concurrent workers never read a partial file
+            os.replace(temporary, self.cache_path)
+        except OSError as e:
+            print(f"Could not cache the tag matrix in {self.cache_path}: {e}")
+
+    def tag(self, embedding: Sequence[float]) -> List[str]:
+        """Return the tags of one image embedding, most similar first."""
+        return self.tag_many([embedding])[0]
+
+    def tag_many(self, embeddings: Sequence[Sequence[float]]) -> List[List[str]]:
+        """Tag several image embeddings with one matrix product.
+
+        Args:
+            embeddings: CLIP image embeddings.
+
+        Returns:
+            List[List[str]]: Up to top_k tags per embedding, most similar first; tags below
+            min_similarity are left out.
+
+        Raises:
+            ValueError: If the vocabulary cannot be embedded or the dimensions do not match.
+        """
+        if not len(embeddings):
+            return []
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        matrix = self.matrix
+        if vectors.shape[1] != matrix.shape[1]:
+            raise ValueError(
+                f"Image embeddings have {vectors.shape[1]} dimensions, the tag matrix {matrix.shape[1]}"
+            )
+        similarities = vectors @ matrix.T
+        count = min(self.top_k, len(self.vocabulary))
+        if count <= 0:
+            return [[] for _ in range(len(vectors))]
+        top = np.argpartition(-similarities, count - 1, axis=1)[:, :count]
+        tags = []
+        for row, candidates in zip(similarities, top):
+            ranked = candidates[np.argsort(-row[candidates], kind="stable")]
+            tags.append([self.vocabulary[i] for i in ranked if row[i] >= self.min_similarity])
+        return tags
@@ -106,7 +106,8 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     // New Chat button
-    newChatButton.addEventListener("click", () => {
+    newChatButton.addEventListener("click", async () => {
+        await fetch("/chat/reset", { method: "POST" });
         chatMessages.innerHTML = `
             <div class="message bot-message">
                 Hello! I'm your AI assistant. How can I help you today?
@@ -0,0 +1,29 @@
+import time
+
+from conversational_photo_gallery.services.job_lease import JobLeases
+
+
+def test_only_the_holder_runs_the_job_until_its_lease_expires(tmp_path):
+    path = str(tmp_path / "job_leases.sqlite3")
+    worker, other = JobLeases(path), JobLeases(path)
+
+    assert worker.acquire("consistency_scan", "worker", 0.1)
+    assert not other.acquire("consistency_scan", "other", 0.1)
+    # The holder renews its own lease, and other jobs have their own leases
+    assert worker.acquire("consistency_scan", "worker", 0.1)
+    assert other.acquire("deferred_annotations", "other", 0.1)
+
+    time.sleep(0.15)
+    assert other.acquire("consistency_scan", "other", 0.1)
+    assert not worker.acquire("consistency_scan", "worker", 0.1)
+
+
+def test_released_lease_can_be_taken_right_away(tmp_path):
+    path = str(tmp_path / "job_leases.sqlite3")
+    worker, other = JobLeases(path), JobLeases(path)
+
+    assert worker.acquire("consistency_scan", "worker", 60)
+    other.release("consistency_scan", "other")
+    assert not other.acquire("consistency_scan", "other", 60)
+    worker.release("consistency_scan", "worker")
+    assert other.acquire("consistency_scan", "other", 60)
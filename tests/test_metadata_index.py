@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from conversational_photo_gallery.services.metadata_index import MetadataIndex
+
+
+def facet_counts(index):
+    facets = index.facets()
+    return dict(facets["tags"]), dict(facets["colors"])
+
+
+def test_counts_follow_upsert_delete_and_rebuild(tmp_path):
+    index = MetadataIndex(str(tmp_path / "index.sqlite3"))
+    index.upsert_many(
+        ["a.jpg", "b.jpg", "c.jpg"],
+        [
+            {"tags": "beach, sunset", "user_tags": "beach", "dominant_color": "blue", "date": "2023:07:14 18:32:05"},
+            {"tags": "beach", "dominant_color": "blue", "date": "2023:07:20 10:00:00"},
+            {"tags": "dog", "dominant_color": "red", "date": "2024:01:02 09:00:00"},
+        ],
+    )
+    assert facet_counts(index) == ({"beach": 2, "sunset": 1, "dog": 1}, {"blue": 2, "red": 1})
+    assert index.month_buckets() == [("2024-01", 1), ("2023-07", 2)]
+
+    # Retagging and recolouring an image moves its counts
+    index.upsert("b.jpg", {"tags": "dog", "dominant_color": "red", "date": "2023:07:20 10:00:00"})
+    assert facet_counts(index) == ({"beach": 1, "sunset": 1, "dog": 2}, {"blue": 1, "red": 2})
+
+    index.delete(["a.jpg", "c.jpg"])
+    assert facet_counts(index) == ({"dog": 1}, {"red": 1})
+    assert index.month_buckets() == [("2023-07", 1)]
+
+    index.connection.execute("UPDATE tag_counts SET count = 99")
+    index.connection.commit()
+    index.rebuild_facets()
+    assert facet_counts(index) == ({"dog": 1}, {"red": 1})
+
+
+def test_counts_are_rebuilt_once_when_workers_open_an_upgraded_index(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = MetadataIndex(path)
+    index.upsert_many(
+        ["a.jpg", "b.jpg"],
+        [
+            {"tags": "beach", "dominant_color": "blue", "date": "2023:07:14 18:32:05"},
+            {"tags": "beach, dog", "dominant_color": "blue", "date": "2023:08:01 12:00:00"},
+        ],
+    )
+    # An index created before the count tables existed has them empty
+    for table in ("tag_counts", "color_counts", "month_counts"):
+        index.connection.execute(f"DELETE FROM {table}")
+    index.connection.commit()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        workers = list(pool.map(lambda _: MetadataIndex(path), range(8)))
+
+    for worker in workers:
+        assert facet_counts(worker) == ({"beach": 2, "dog": 1}, {"blue": 2})
+        assert worker.month_buckets() == [("2023-08", 1), ("2023-07", 1)]
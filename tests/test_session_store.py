@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from conversational_photo_gallery.services.session_store import SessionLeaseLost, SQLiteSessionStore
+
+INITIAL = [{"role": "assistant", "content": "Hello"}]
+
+
+def test_turn_saves_its_history(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    with store.session("chat", INITIAL) as history:
+        history.append({"role": "user", "content": "beach photos"})
+    assert store.load("chat") == INITIAL + [{"role": "user", "content": "beach photos"}]
+
+
+def test_turn_that_outlived_its_lease_does_not_overwrite_the_next_turn(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    acquire = store.acquire
+    monkeypatch.setattr(store, "acquire", lambda session_id, owner, ttl: acquire(session_id, owner, 0.05))
+
+    with pytest.raises(SessionLeaseLost):
+        with store.session("chat", INITIAL) as history:
+            time.sleep(0.1)
+            # Another worker takes the expired lease and saves its turn first
+            with store.session("chat", INITIAL) as other:
+                other.append({"role": "user", "content": "second turn"})
+            history.append({"role": "user", "content": "first turn"})
+
+    assert store.load("chat") == INITIAL + [{"role": "user", "content": "second turn"}]
+
+
+def test_save_without_owner_is_unconditional(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    assert store.save("chat", INITIAL)
+    assert not store.save("other", INITIAL, owner="nobody")
+    assert store.load("other") is None
@@ -0,0 +1,52 @@
+from conversational_photo_gallery.services.sharding import set_search_ef
+
+
+class LegacyCollection:
+    """Collection as returned by chromadb < 1.0: HNSW settings live in the metadata, no configuration."""
+
+    def __init__(self, metadata):
+        self.name = "legacy_collection"
+        self.metadata = metadata
+        self.modified = []
+
+    def modify(self, metadata=None, **kwargs):
+        if metadata is not None and "hnsw:space" in metadata:
+            raise ValueError("Changing the distance function of a collection once it is created is not supported")
+        self.modified.append(metadata)
+
+
+class Collection:
+    """Collection as returned by chromadb >= 1.0."""
+
+    def __init__(self, ef_search):
+        self.name = "collection"
+        self.configuration = {"hnsw": {"space": "cosine", "ef_search": ef_search}}
+        self.modified = []
+
+    def modify(self, configuration=None, **kwargs):
+        self.modified.append(configuration)
+
+
+def test_legacy_collection_is_left_unchanged():
+    collection = LegacyCollection({"hnsw:space": "cosine"})
+    set_search_ef(collection, 100)
+    assert collection.modified == []
+    assert collection.metadata == {"hnsw:space": "cosine"}
+
+
+def test_legacy_collection_without_metadata():
+    collection = LegacyCollection(None)
+    set_search_ef(collection, 100)
+    assert collection.modified == []
+
+
+def test_configuration_is_updated_when_search_ef_differs():
+    collection = Collection(ef_search=10)
+    set_search_ef(collection, 100)
+    assert collection.modified == [{"hnsw": {"ef_search": 100}}]
+
+
+def test_configuration_is_not_touched_when_search_ef_matches():
+    collection = Collection(ef_search=100)
+    set_search_ef(collection, 100)
+    assert collection.modified == []